@@ -0,0 +1,282 @@
+"""
+Micro-benchmarks for the pure parsing helpers in trademe_scraper.
+
+Runs every helper over a fixed corpus (the real collected sale URLs plus
+generated price, date, estimate and description strings), reports ops/sec and
+memory allocated per call, and optionally compares against a saved baseline.
+
+With --batch, also times the vectorized normalization stage (trademe_normalize)
+on synthetic raw-capture rows against the row-by-row helpers on the same rows.
+
+Usage:
+    python bench_parsing.py --save-baseline bench_baseline.json
+    python bench_parsing.py --baseline bench_baseline.json   # exits 1 on regression
+    python bench_parsing.py --batch --batch-rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import trademe_scraper as ts
+from trademe_normalize import normalize_listings
+
+URLS_FILE = os.path.join("scraping_output", "collected_sale_listing_urls.txt")
+SEED = 20250729
+DESCRIPTION_POOL = 10000
+
+# --- Corpus generation ---
+def load_urls(path=URLS_FILE):
+    """Loads the collected listing URLs used as the URL corpus."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def generate_rent_prices(rng, n):
+    templates = ["${} per week", "${} pw", "Rent ${} per week", "${} per week, available now", "Contact agent"]
+    return [rng.choice(templates).format(f"{rng.randint(250, 2500):,}") for _ in range(n)]
+
+def generate_sale_prices(rng, n):
+    templates = ["Asking price ${}", "Enquiries over ${}", "Auction", "Auction on Sat, 16 Aug",
+                 "Tender", "Deadline sale", "Price by negotiation", "Negotiation over ${}", "${}"]
+    return [rng.choice(templates).format(f"{rng.randint(250_000, 4_000_000):,}") for _ in range(n)]
+
+def generate_list_dates(rng, n):
+    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    out = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.1:
+            out.append("Listed: Today")
+        elif roll < 0.2:
+            out.append("Listed: Yesterday")
+        else:
+            out.append(f"Listed: {rng.choice(days)}, {rng.randint(1, 28)} {rng.choice(months)}")
+    return out
+
+def generate_estimates(rng, n):
+    out = []
+    for _ in range(n):
+        low = rng.randint(300, 3000)
+        high = low + rng.randint(20, 400)
+        style = rng.randrange(3)
+        if style == 0:
+            out.append(f"${low * 1000:,} - ${high * 1000:,}")
+        elif style == 1:
+            out.append(f"${low}K - ${high}K")
+        else:
+            out.append(f"${low / 1000:.2f}M – ${high / 1000:.2f}M")
+    return out
+
+def generate_estimate_values(rng, n):
+    values = []
+    for low, high in (ts.re.search(ts.ESTIMATE_RANGE_PATTERN, e).groups() for e in generate_estimates(rng, n)):
+        values.append(low)
+        values.append(high)
+    return values[:n]
+
+def generate_descriptions(rng, n):
+    filler = ("sunny spacious living with heat pump double glazing close to schools shops and "
+              "public transport modern kitchen separate laundry fully fenced garden off street parking").split()
+    keywords = [k.lower() for k in ts.PROPERTY_TYPE_KEYWORDS]
+    out = []
+    for _ in range(n):
+        words = [rng.choice(filler) for _ in range(rng.randint(60, 300))]
+        # Roughly a third of descriptions never match, so the full keyword loop is exercised.
+        if rng.random() > 0.33:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        out.append(" ".join(words).capitalize() + ".")
+    return out
+
+def build_corpus(n):
+    rng = random.Random(SEED)
+    return {
+        "urls": load_urls(),
+        "rent_prices": generate_rent_prices(rng, n),
+        "sale_prices": generate_sale_prices(rng, n),
+        "list_dates": generate_list_dates(rng, n),
+        "estimates": generate_estimates(rng, n),
+        "estimate_values": generate_estimate_values(rng, n),
+        "descriptions": generate_descriptions(rng, n),
+    }
+# --- End corpus generation ---
+
+# --- Benchmarks: name -> (helper, corpus key) ---
+BENCHMARKS = {
+    "normalize_trademe_url": (ts.normalize_trademe_url, "urls"),
+    "parse_list_date": (ts.parse_list_date, "list_dates"),
+    "parse_rent_price": (ts.parse_rent_price, "rent_prices"),
+    "parse_sale_price": (ts.parse_sale_price, "sale_prices"),
+    "parse_estimate_value": (ts.parse_estimate_value, "estimate_values"),
+    "parse_estimate_range": (ts.parse_estimate_range, "estimates"),
+    "detect_property_type": (ts.detect_property_type, "descriptions"),
+}
+
+def time_helper(func, inputs, repeat):
+    """Returns the best ops/sec over `repeat` passes of func over inputs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return len(inputs) / best if best > 0 else float("inf")
+
+def measure_allocations(func, inputs):
+    """Returns (average transient bytes per call, peak traced bytes) for one pass of func over inputs."""
+    transient = 0
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            func(item)
+            _, call_peak = tracemalloc.get_traced_memory()
+            transient += call_peak - current
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return transient / len(inputs), peak
+
+def run_benchmarks(n, repeat, only=None):
+    corpus = build_corpus(n)
+    results = {}
+    for name, (func, key) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        inputs = corpus[key]
+        func(inputs[0])  # Warm up caches (regex compilation, strptime locale)
+        ops_per_sec = time_helper(func, inputs, repeat)
+        bytes_per_call, peak = measure_allocations(func, inputs)
+        results[name] = {
+            "inputs": len(inputs),
+            "ops_per_sec": round(ops_per_sec, 1),
+            "bytes_per_call": round(bytes_per_call, 1),
+            "peak_bytes": peak,
+        }
+        print(f"{name:<24} {ops_per_sec:>14,.0f} ops/s {bytes_per_call:>10,.1f} B/call  peak {peak / 1024:>8,.1f} KiB  ({len(inputs)} inputs)")
+    return results
+# --- End benchmarks ---
+
+# --- Batch normalization benchmark ---
+def build_raw_rows(n, listing_type):
+    """Synthetic raw-capture records as the scraper stores them with --batch-normalize."""
+    rng = random.Random(SEED)
+    prices = generate_rent_prices(rng, n) if listing_type == "rental" else generate_sale_prices(rng, n)
+    dates = generate_list_dates(rng, n)
+    # Descriptions are the slow part to generate, so cycle a smaller pool (each row is still parsed in full)
+    descriptions = generate_descriptions(rng, min(n, DESCRIPTION_POOL))
+    scraped_at = ts.datetime.now(ts.timezone.utc).isoformat()
+    return [{"listing_id": str(i), "price_raw": prices[i], "list_date_raw": dates[i], "Full Description": descriptions[i % len(descriptions)],
+             "property_type": None, "status": "active", "Scraped At": scraped_at} for i in range(n)]
+
+def normalize_row_by_row(rows, listing_type):
+    """The per-listing parsing the scraper does without --batch-normalize, plus the final DataFrame, for comparison."""
+    out = []
+    for row in rows:
+        parsed = {"list_date": ts.parse_list_date(row["list_date_raw"]), "property_type": ts.detect_property_type(row["Full Description"])}
+        if listing_type == "rental":
+            parsed["rent_nzd"] = ts.parse_rent_price(row["price_raw"])
+        else:
+            parsed["sale_type"], parsed["ask_price_nzd"] = ts.parse_sale_price(row["price_raw"])
+        out.append(parsed)
+    return pd.DataFrame(out)
+
+def check_batch_matches_rows(rows, listing_type, sample=2000):
+    """Raises if the batch stage disagrees with the row helpers (outside the year-rollover fix)."""
+    batch = normalize_listings(rows[:sample], listing_type)
+    for i, expected in enumerate(normalize_row_by_row(rows[:sample], listing_type).to_dict("records")):
+        for column, value in expected.items():
+            if column == "list_date":
+                continue # Row parsing assumes the current year; the batch stage rolls future dates back
+            got = batch.at[i, column]
+            got = None if pd.isna(got) else str(got)
+            if got != (None if pd.isna(value) else str(value)):
+                raise AssertionError(f"row {i} {column}: batch {got!r} != row {value!r}")
+
+def run_batch_benchmark(n, repeat):
+    results = {}
+    for listing_type in ("rental", "sale"):
+        rows = build_raw_rows(n, listing_type)
+        check_batch_matches_rows(rows, listing_type)
+        timings = {}
+        for name, func in (("batch", normalize_listings), ("row_by_row", normalize_row_by_row)):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(rows, listing_type)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        tracemalloc.start()
+        try:
+            normalize_listings(rows, listing_type)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        key = f"normalize_listings[{listing_type}]"
+        results[key] = {
+            "inputs": n,
+            "ops_per_sec": round(n / timings["batch"], 1),
+            "bytes_per_call": round(peak / n, 1),
+            "peak_bytes": peak,
+            "row_by_row_ops_per_sec": round(n / timings["row_by_row"], 1),
+        }
+        print(f"{key:<28} {n / timings['batch']:>12,.0f} rows/s (row by row {n / timings['row_by_row']:>10,.0f} rows/s, "
+              f"{timings['row_by_row'] / timings['batch']:.1f}x)  peak {peak / 1048576:,.1f} MiB  ({n} rows)")
+    return results
+# --- End batch normalization benchmark ---
+
+def compare_to_baseline(results, baseline, max_regression):
+    """Returns a list of human-readable regressions beyond the allowed tolerance."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current["ops_per_sec"] < previous["ops_per_sec"] * (1 - max_regression):
+            regressions.append(f"{name}: {current['ops_per_sec']:,.0f} ops/s vs baseline {previous['ops_per_sec']:,.0f}")
+        # Allow a small absolute slack so tiny helpers don't flap on a few bytes.
+        if current["bytes_per_call"] > previous["bytes_per_call"] * (1 + max_regression) + 16:
+            regressions.append(f"{name}: {current['bytes_per_call']:,.1f} B/call vs baseline {previous['bytes_per_call']:,.1f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Trade Me scraper parsing helpers.")
+    parser.add_argument("--n", type=int, default=20000, help="Number of generated strings per helper (default: 20000).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes per helper; the best is kept (default: 5).")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="Run only these benchmarks.")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against; exits 1 on regression.")
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file.")
+    parser.add_argument("--batch", action="store_true", help="Also benchmark the vectorized batch normalization stage.")
+    parser.add_argument("--batch-rows", type=int, default=100000, help="Synthetic rows per listing type for --batch (default: 100000).")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="Allowed fractional slowdown / allocation growth before failing (default: 0.15).")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.n, args.repeat, args.only)
+    if args.batch:
+        results.update(run_batch_benchmark(args.batch_rows, min(args.repeat, 3)))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n💾 Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   -> {line}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
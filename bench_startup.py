@@ -0,0 +1,143 @@
+"""
+Import-time and startup benchmark for the scraper's core runtime.
+
+Short jobs (e.g. scheduler-fired `--skip-url-collection` runs over a few URLs)
+pay the interpreter and import cost every time. The core runtime (collection,
+scraping, checkpointing, resume) uses the standard library plus Playwright.
+pandas / NumPy are imported only by --batch-normalize and the optional
+comparison tools. Measured:
+
+    import      `import trademe_scraper` in a fresh interpreter (median of --runs),
+                and whether pandas / NumPy were loaded by it
+    startup     `python trademe_scraper.py --help`: interpreter, imports and argument parsing
+    checkpoint  writing and resuming a temp file of --records synthetic listings with the
+                csv-module writers, and with pandas when it is installed
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --baseline HEAD~1   # the same numbers for another revision (git worktree)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ["pandas", "numpy"]
+IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "started = time.perf_counter()\n"
+    "import trademe_scraper\n"
+    "print(json.dumps({'import_ms': (time.perf_counter() - started) * 1000,\n"
+    "                  'heavy': [name for name in %r if name in sys.modules]}))\n" % (HEAVY_MODULES,)
+)
+
+def median_ms(values) -> float:
+    return round(statistics.median(values), 1)
+
+def measure_import(directory: str, runs: int) -> dict:
+    """Median import time of trademe_scraper (fresh interpreter per run) from `directory`."""
+    samples, heavy = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=directory, capture_output=True, text=True, check=True).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        samples.append(probe["import_ms"])
+        heavy = probe["heavy"]
+    return {"import_ms": median_ms(samples), "heavy_modules": heavy}
+
+def measure_startup(directory: str, runs: int) -> dict:
+    """Median wall time of `trademe_scraper.py --help` (interpreter start, imports and argparse)."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "trademe_scraper.py", "--help"], cwd=directory, capture_output=True, check=True)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"startup_ms": median_ms(samples)}
+
+def synthetic_records(count: int) -> list:
+    return [{
+        "URL": f"https://www.trademe.co.nz/a/property/residential/rent/auckland/auckland-city/ponsonby/listing/{4000000000 + i}",
+        "listing_id": str(4000000000 + i),
+        "source_site": "trademe",
+        "title": f"Sunny two bedroom unit, {i} Example Street",
+        "rent_nzd": 550 + i % 300 if i % 7 else None,
+        "bedrooms": 1 + i % 4,
+        "agent_name": ["Jo Bloggs", "Sam Lee"] if i % 2 else "Jo Bloggs",
+        "Full Description": "Close to shops, schools and transport. " * 20,
+        "status": "active",
+    } for i in range(count)]
+
+def measure_checkpoint(records: int) -> dict:
+    """Temp-file save + resume round trip with the csv-module writers, and with pandas for comparison."""
+    import trademe_scraper
+
+    data = synthetic_records(records)
+    results = {"records": records}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "temp.csv")
+        started = time.perf_counter()
+        trademe_scraper.write_records_csv(path, data)
+        results["csv_write_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        started = time.perf_counter()
+        trademe_scraper.read_records_csv(path)
+        results["csv_read_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            started = time.perf_counter()
+            import pandas as pd
+            results["pandas_import_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        except ImportError:
+            return results
+        started = time.perf_counter()
+        pd.DataFrame(data).to_csv(path, index=False)
+        results["pandas_write_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        started = time.perf_counter()
+        pd.read_csv(path).to_dict("records")
+        results["pandas_read_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return results
+
+def measure_revision(revision: str, runs: int) -> dict:
+    """Import and startup numbers for another git revision, checked out in a temporary worktree."""
+    worktree = tempfile.mkdtemp(prefix="trademe_bench_")
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, revision], check=True, capture_output=True)
+    try:
+        return {**measure_import(worktree, runs), **measure_startup(worktree, runs)}
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", worktree], check=False, capture_output=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup benchmark for trademe_scraper.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement (median is reported).")
+    parser.add_argument("--records", type=int, default=5000, help="Synthetic listings for the checkpoint round trip.")
+    parser.add_argument("--baseline", help="Git revision to compare import / startup times against (e.g. HEAD~1).")
+    parser.add_argument("--json", action="store_true", help="Print the results as one JSON object.")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {"current": {**measure_import(here, args.runs), **measure_startup(here, args.runs)},
+               "checkpoint": measure_checkpoint(args.records)}
+    if args.baseline:
+        results["baseline"] = {"revision": args.baseline, **measure_revision(args.baseline, args.runs)}
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    current = results["current"]
+    print(f"⏱️ import trademe_scraper: {current['import_ms']} ms (heavy modules loaded: {', '.join(current['heavy_modules']) or 'none'})")
+    print(f"⏱️ trademe_scraper.py --help: {current['startup_ms']} ms")
+    if "baseline" in results:
+        baseline = results["baseline"]
+        print(f"⏱️ {baseline['revision']}: import {baseline['import_ms']} ms "
+              f"(heavy: {', '.join(baseline['heavy_modules']) or 'none'}), --help {baseline['startup_ms']} ms "
+              f"-> {baseline['startup_ms'] / current['startup_ms']:.1f}x faster startup now")
+    checkpoint = results["checkpoint"]
+    line = f"💾 checkpoint of {checkpoint['records']} listings: csv write {checkpoint['csv_write_ms']} ms, read {checkpoint['csv_read_ms']} ms"
+    if "pandas_write_ms" in checkpoint:
+        line += (f"; pandas write {checkpoint['pandas_write_ms']} ms, read {checkpoint['pandas_read_ms']} ms "
+                 f"(+{checkpoint['pandas_import_ms']} ms to import it)")
+    print(line)
+
+if __name__ == "__main__":
+    main()
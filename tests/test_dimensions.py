@@ -0,0 +1,62 @@
+"""Tests for the agent / agency dimension tables (trademe_dimensions)."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import trademe_dimensions  # noqa: E402
+from trademe_dimensions import LINKS_FILE, DimensionTables, read_rows  # noqa: E402
+
+URL = "https://www.trademe.co.nz/a/property/residential/rent/auckland/listing/4123456789"
+
+
+def record(agents):
+    return {"URL": URL, "agency_name": "Acme Realty, (Licensed: REAA 2008)", "agent_name": agents}
+
+
+class FixedClock:
+    def __init__(self, stamp):
+        self.stamp = stamp
+
+    def now(self, tz=None):
+        return self
+
+    def strftime(self, fmt):
+        return self.stamp
+
+
+def run(directory, agents, seen_at, monkeypatch):
+    """One run that interns the listing with `agents` and flushes without compacting."""
+    monkeypatch.setattr(trademe_dimensions, "datetime", FixedClock(seen_at))
+    tables = DimensionTables(directory).load()
+    interned = tables.intern_record(record(agents))
+    tables.flush()
+    return tables, interned
+
+
+def test_agents_removed_stay_removed(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    _, interned = run(directory, ["Jo Bloggs", "Sam Smith"], "2024-01-01T00:00:00Z", monkeypatch)
+    assert interned["agent_count"] == 2 and interned["agency_id"] == 1
+    _, interned = run(directory, [], "2024-01-02T00:00:00Z", monkeypatch)
+    assert interned["agent_count"] == 0 and interned["primary_agent_id"] is None
+    tombstone = read_rows(os.path.join(directory, LINKS_FILE))[-1]
+    assert tombstone["agent_id"] == "" and tombstone["position"] == "-1"
+
+    tables = DimensionTables(directory).load()
+    assert tables.links["4123456789"] == ("2024-01-02T00:00:00Z", ())
+    tables.intern_record(record([])) # Unchanged: nothing more to append
+    assert tables.pending_links == []
+    tables.close()
+    assert read_rows(os.path.join(directory, LINKS_FILE)) == [] # Compacted to a header-only table
+    assert DimensionTables(directory).load().links == {}
+
+
+def test_agents_return_after_tombstone(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    run(directory, ["Jo Bloggs"], "2024-01-01T00:00:00Z", monkeypatch)
+    run(directory, [], "2024-01-02T00:00:00Z", monkeypatch)
+    run(directory, "['Sam Smith']", "2024-01-03T00:00:00Z", monkeypatch)
+    tables = DimensionTables(directory).load()
+    assert tables.links["4123456789"] == ("2024-01-03T00:00:00Z", (2,))
@@ -0,0 +1,36 @@
+"""Property type detection: case-insensitive keywords, and row-by-row and batch modes agree.
+
+detect_property_type lowercases its keywords since the batch normalizer was added. Before,
+mixed-case keywords ('Apartment', 'Condo', 'Victorian', ...) never matched the lowercased
+description, so the default row-by-row output changed too, not only --batch-normalize.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("playwright") # trademe_scraper imports Playwright at module level
+import trademe_scraper as ts  # noqa: E402
+from trademe_normalize import detect_property_types  # noqa: E402
+
+DESCRIPTIONS = [
+    ("Modern APARTMENT close to the CBD", "Apartment"),
+    ("Spacious family home with garden", "Home"),
+    ("Renovated Victorian villa", "Victorian"),
+    ("A condo with a Tudor-style facade", "Condo"), # First keyword in list order wins, not first in the text
+    ("Three bedroom TOWNHOUSE", "Townhouse"),
+    ("Sunny section, no dwelling", "Other"),
+    ("", "Other"),
+]
+
+@pytest.mark.parametrize("description, expected", DESCRIPTIONS)
+def test_row_detection_ignores_case(description, expected):
+    assert ts.detect_property_type(description) == expected
+
+def test_batch_matches_row_by_row():
+    texts = pd.Series([description for description, _ in DESCRIPTIONS] + [None])
+    batch = detect_property_types(texts).astype("object").tolist()
+    assert batch == [ts.detect_property_type(text if isinstance(text, str) else "") for text in texts]
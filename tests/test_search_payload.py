@@ -0,0 +1,71 @@
+"""Fixture-payload tests for search result parsing (trademe_search_payload)."""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from trademe_search_payload import extract_search_results, has_next_page, parse_server_state  # noqa: E402
+
+ITEM = {
+    "ListingId": 4123456789,
+    "CanonicalPath": "/property/residential/rent/auckland/auckland-city/grey-lynn/listing/4123456789",
+    "Title": "Sunny villa",
+    "PriceDisplay": "$750 per week",
+    "Bedrooms": 3,
+    "Suburb": "Grey Lynn",
+    "District": "Auckland City",
+    "Region": "Auckland",
+    "Agency": {"Name": "Acme Realty", "Agents": [{"FullName": "Jo Bloggs"}]},
+    "StartDate": "/Date(1691100000000)/",
+    "GeographicLocation": {"Latitude": -36.86, "Longitude": 174.74},
+}
+LISTING_URL = "https://www.trademe.co.nz/a/property/residential/rent/auckland/auckland-city/grey-lynn/listing/4123456789"
+
+
+def result_set(items, page=1, total=44, page_size=22):
+    return {"TotalCount": total, "Page": page, "PageSize": page_size, "List": items}
+
+
+def test_escaped_transfer_state():
+    state = json.dumps({"search": result_set([ITEM])})
+    for escaped, plain in (("&a;", "&"), ("&q;", '"')): # & first, as Angular does
+        state = state.replace(plain, escaped)
+    results = extract_search_results([parse_server_state(state)], 1)
+    card, = results["cards"]
+    assert card["listing_id"] == "4123456789"
+    assert card["url"] == LISTING_URL
+    assert card["agency_name"] == "Acme Realty" and card["agent_names"] == ["Jo Bloggs"]
+    assert card["list_date"] == "04/08/2023"
+    assert results["total_count"] == 44 and results["page_size"] == 22
+
+
+def test_nested_json_string_and_camel_case():
+    item = {key[0].lower() + key[1:]: value for key, value in ITEM.items()}
+    payload = {"cache": {"G.https://api.trademe.co.nz/v1/search": {"body": json.dumps({"totalCount": 23, "page": 2, "pageSize": 22, "list": [item]})}}}
+    results = extract_search_results([payload], 2)
+    assert [card["url"] for card in results["cards"]] == [LISTING_URL]
+    assert not has_next_page(results, 2)
+    assert has_next_page(results, 1)
+
+
+def test_only_the_requested_page_is_used():
+    other = dict(ITEM, ListingId=1, CanonicalPath="/property/residential/rent/wellington/listing/1")
+    payload = {"first": result_set([other], page=1), "second": result_set([ITEM], page=2)}
+    results = extract_search_results([payload], 2)
+    assert [card["listing_id"] for card in results["cards"]] == ["4123456789"]
+
+
+def test_items_without_a_path_have_no_url():
+    item = {key: value for key, value in ITEM.items() if key != "CanonicalPath"}
+    card, = extract_search_results([result_set([item])], 1)["cards"]
+    assert card["url"] is None # The scraper reads such a page from the card links
+
+
+def test_unparseable_numbers_do_not_raise():
+    results = extract_search_results([{"list": [{"listingId": "2", "canonicalPath": "/a/property/listing/2"}], "page": "x"}], 1)
+    assert results["cards"] == [] # A set whose page number does not parse is skipped
+    results = extract_search_results([result_set([ITEM], page="1", total="many", page_size="22")], 1)
+    assert len(results["cards"]) == 1 and results["total_count"] is None and results["page_size"] == 22
+    assert has_next_page(results, 1) # Unknown total: continue while pages have results
@@ -0,0 +1,63 @@
+"""Multi-process tests for the lease-based work queue (trademe_work_queue)."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from trademe_work_queue import SQLiteWorkQueue  # noqa: E402
+
+# Each worker process opens its own queue (its own connections), claims until the queue is
+# drained and prints the URLs it committed.
+WORKER = """
+import json, sys
+from trademe_work_queue import SQLiteWorkQueue
+queue = SQLiteWorkQueue(sys.argv[1], wal=sys.argv[3] == "wal")
+worker_id, done = sys.argv[2], []
+while True:
+    batch = queue.claim(worker_id, 7, lease_seconds=60)
+    if not batch:
+        if queue.is_drained():
+            break
+        continue
+    for url, listing_type in batch:
+        queue.complete(worker_id, url, listing_type, {"URL": url})
+        done.append(url)
+print(json.dumps(done))
+"""
+
+def urls(count):
+    return [f"https://www.trademe.co.nz/a/property/residential/rent/x/y/z/listing/{5000000 + i}" for i in range(count)]
+
+@pytest.mark.parametrize("journal", ["wal", "rollback"])
+def test_processes_claim_each_url_once(tmp_path, journal):
+    path = str(tmp_path / "queue.db")
+    queue = SQLiteWorkQueue(path, wal=journal == "wal")
+    queue.enqueue(urls(300), "rental")
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, path, f"w{i}", journal], cwd=ROOT,
+                                stdout=subprocess.PIPE, text=True) for i in range(4)]
+    committed = []
+    for worker in workers:
+        out, _ = worker.communicate(timeout=120)
+        assert worker.returncode == 0
+        committed.extend(json.loads(out))
+    assert sorted(committed) == sorted(urls(300)) # Every URL exactly once across the processes
+    stats = queue.stats()
+    assert stats["done"] == 300 and stats["results"] == 300 and stats["pending"] == stats["leased"] == 0
+
+def test_expired_leases_fail_after_max_attempts(tmp_path):
+    path = str(tmp_path / "queue.db")
+    SQLiteWorkQueue(path).enqueue(urls(1), "rental")
+    # A worker that crashes mid-lease: each claim comes from a fresh process and its lease just expires
+    claim = ("import sys, json; from trademe_work_queue import SQLiteWorkQueue; "
+             "print(json.dumps(SQLiteWorkQueue(sys.argv[1]).claim(sys.argv[2], 5, lease_seconds=-1, max_attempts=3)))")
+    claimed = [json.loads(subprocess.run([sys.executable, "-c", claim, path, f"crash{i}"], cwd=ROOT, capture_output=True,
+                                         text=True, check=True).stdout) for i in range(5)]
+    assert [len(batch) for batch in claimed] == [1, 1, 1, 0, 0]
+    queue = SQLiteWorkQueue(path)
+    assert queue.failed_urls() == urls(1)
+    assert queue.is_drained()
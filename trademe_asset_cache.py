@@ -0,0 +1,277 @@
+"""
+Shared, size-bounded disk cache for immutable static assets (JS bundles, CSS,
+fonts, images).
+
+Every browser context starts with an empty HTTP cache, so without this each
+listing re-downloads the same Angular bundles. `AssetCache.route` is a
+Playwright route handler that serves cached assets to every context and
+stores new cacheable ones:
+
+    <dir>/index.db          SQLite: url -> sha, size, status, headers, last_used
+    <dir>/blobs/<sha256>    asset bodies (shared when several URLs have the same content)
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+
+# Requests matching this are routed through the cache; everything else goes straight to the network.
+STATIC_ASSET_URL_PATTERN = re.compile(r"\.(?:js|mjs|css|woff2?|ttf|otf|eot|png|jpe?g|gif|svg|webp|avif|ico)(?:[?#]|$)", re.IGNORECASE)
+STATIC_RESOURCE_TYPES = {"script", "stylesheet", "font", "image"}
+# Fingerprinted file names like main.3f9a1c2e.js or styles-5ZQW2K3L.css never change content.
+FINGERPRINT_PATTERN = re.compile(r"[.-][0-9a-zA-Z]{8,}\.[a-z0-9]+(?:[?#]|$)")
+MIN_CACHEABLE_MAX_AGE = 86400
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+TOUCH_FLUSH_EVERY = 200 # Cache hits whose last-use time is buffered before it is written to the index
+ORPHAN_GRACE_SECONDS = 300 # Untracked blobs younger than this may still be indexed by another process
+INDEX_BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    url TEXT PRIMARY KEY,
+    sha TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_last_used ON assets (last_used);
+CREATE INDEX IF NOT EXISTS assets_sha ON assets (sha);
+"""
+
+def is_immutable_response(url: str, status: int, headers: dict) -> bool:
+    """True if a response is safe to serve to later contexts without revalidation."""
+    if status != 200:
+        return False
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    if "immutable" in cache_control:
+        return True
+    max_age = re.search(r"max-age=(\d+)", cache_control)
+    if max_age and int(max_age.group(1)) >= MIN_CACHEABLE_MAX_AGE:
+        return True
+    return bool(FINGERPRINT_PATTERN.search(url))
+
+class AssetCache:
+    """LRU disk cache for static assets, keyed by URL with content-hashed blobs.
+
+    The index is a SQLite table, so every put is persisted as it happens and
+    several processes (coordinator workers) can share one cache directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.index_file = os.path.join(directory, "index.db")
+        self.max_bytes = max_bytes
+        self.conn = None
+        self.refs = Counter() # sha -> number of indexed URLs using that blob
+        self.touched = {} # url -> last use time not yet written to the index
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        self.orphans_removed = 0
+
+    # --- Index persistence ---
+    def load(self):
+        """Opens the index, removes blobs it does not track and evicts down to the size bound."""
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.index_file, timeout=INDEX_BUSY_TIMEOUT, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._import_json_index()
+        self._reconcile()
+        self._evict()
+        count = self.conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+        orphans = f", removed {self.orphans_removed} untracked blobs" if self.orphans_removed else ""
+        print(f"\n🗄️ Asset cache: {count} assets ({self.total_bytes / 1048576:.1f} MiB) in {self.directory}{orphans}")
+        return self
+
+    def _import_json_index(self):
+        """Moves entries from an index.json written by older versions into the SQLite index."""
+        json_index = os.path.join(self.directory, "index.json")
+        if not os.path.exists(json_index):
+            return
+        try:
+            with open(json_index, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            now = time.time()
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO assets (url, sha, size, status, headers, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(url, entry["sha"], entry["size"], entry["status"], json.dumps(entry["headers"]), now + position / 1e6)
+                     for position, (url, entry) in enumerate(saved)])
+        except Exception as e:
+            print(f"\n⚠️ Could not import asset cache index {json_index}: {e}")
+        os.remove(json_index)
+
+    def _reconcile(self):
+        """Drops index rows whose blob is missing and deletes blobs that no row references.
+
+        A crash between writing a blob and indexing it leaves an untracked blob;
+        those are removed here so the directory stays within the size bound.
+        Files younger than ORPHAN_GRACE_SECONDS are skipped, as another process
+        may be about to index them.
+        """
+        on_disk = set(os.listdir(self.blob_dir))
+        indexed = {sha for (sha,) in self.conn.execute("SELECT DISTINCT sha FROM assets")}
+        missing = indexed - on_disk
+        if missing:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany("DELETE FROM assets WHERE sha = ?", [(sha,) for sha in missing])
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        for name in on_disk - indexed:
+            path = os.path.join(self.blob_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    self.orphans_removed += 1
+            except OSError:
+                pass
+        self._reload_refs()
+
+    def _reload_refs(self):
+        self.refs = Counter()
+        self.total_bytes = 0
+        for sha, count, size in self.conn.execute("SELECT sha, COUNT(*), SUM(size) FROM assets GROUP BY sha"):
+            self.refs[sha] = count
+            self.total_bytes += size
+
+    def save(self):
+        """Writes pending last-use times so the next run evicts in LRU order."""
+        if not self.touched or self.conn is None:
+            return
+        touched, self.touched = self.touched, {}
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("UPDATE assets SET last_used = ? WHERE url = ?",
+                                  [(last_used, url) for url, last_used in touched.items()])
+    # --- End index persistence ---
+
+    # --- Cache operations ---
+    def _remove_blob(self, sha):
+        """Drops one reference to a blob and deletes the file once no URL, in any process, uses it."""
+        self.refs[sha] -= 1
+        if self.refs[sha] > 0:
+            return
+        del self.refs[sha]
+        if self.conn.execute("SELECT 1 FROM assets WHERE sha = ? LIMIT 1", (sha,)).fetchone() is None:
+            try:
+                os.remove(os.path.join(self.blob_dir, sha))
+            except OSError:
+                pass
+
+    def _forget(self, url, sha, size):
+        """Removes one URL from the index, deleting its blob when no other URL uses it."""
+        self.conn.execute("DELETE FROM assets WHERE url = ?", (url,))
+        self.touched.pop(url, None)
+        self.total_bytes -= size
+        self._remove_blob(sha)
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        self.save() # So other processes' recent uses count
+        self._reload_refs() # Other processes may have added assets
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for url, sha, size in self.conn.execute(
+                    "SELECT url, sha, size FROM assets ORDER BY last_used").fetchall():
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self._forget(url, sha, size)
+                self.evictions += 1
+
+    def get(self, url: str):
+        """Returns (entry, body) for a cached URL and marks it recently used, or (None, None)."""
+        row = self.conn.execute("SELECT sha, size, status, headers FROM assets WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None, None
+        sha, size, status, headers = row
+        try:
+            with open(os.path.join(self.blob_dir, sha), "rb") as f:
+                body = f.read()
+        except OSError:
+            body = None
+        if body is None or len(body) != size:
+            self._forget(url, sha, size)
+            return None, None
+        self.touched[url] = time.time()
+        if len(self.touched) >= TOUCH_FLUSH_EVERY:
+            self.save()
+        return {"sha": sha, "size": size, "status": status, "headers": json.loads(headers)}, body
+
+    def put(self, url: str, status: int, headers: dict, body: bytes):
+        """Stores an asset body (deduplicated by content hash) and evicts down to the size bound."""
+        if len(body) > self.max_bytes:
+            return
+        sha = hashlib.sha256(body).hexdigest()
+        blob_path = os.path.join(self.blob_dir, sha)
+        if not os.path.exists(blob_path):
+            tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, blob_path)
+        headers = {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS}
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            old = self.conn.execute("SELECT sha, size FROM assets WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO assets (url, sha, size, status, headers, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, sha, len(body), status, json.dumps(headers), time.time()))
+        self.refs[sha] += 1
+        self.total_bytes += len(body)
+        if old is not None:
+            self.total_bytes -= old[1]
+            if old[0] != sha:
+                self._remove_blob(old[0])
+            else:
+                self.refs[sha] -= 1
+        self._evict()
+    # --- End cache operations ---
+
+    # --- Playwright route handler ---
+    async def route(self, route):
+        """Serves static assets from the cache, fetching and storing them on a miss."""
+        request = route.request
+        if request.method != "GET" or request.resource_type not in STATIC_RESOURCE_TYPES:
+            await route.fallback()
+            return
+        entry, body = self.get(request.url)
+        if entry is not None:
+            self.hits += 1
+            self.bytes_saved += entry["size"]
+            await route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+            return
+        self.misses += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception: # Timeout or closed context: let the browser load it uncached rather than leave it hanging
+            try:
+                await route.continue_()
+            except Exception:
+                pass # The page / context is already gone
+            return
+        if is_immutable_response(request.url, response.status, response.headers):
+            try:
+                self.put(request.url, response.status, response.headers, body)
+            except Exception as e:
+                print(f"\n⚠️ Failed to cache asset {request.url}: {e}")
+        await route.fulfill(response=response, body=body)
+    # --- End route handler ---
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_ratio = self.hits / lookups if lookups else 0.0
+        return (f"hits={self.hits} misses={self.misses} hit_ratio={hit_ratio:.1%} "
+                f"saved={self.bytes_saved / 1048576:.1f} MiB evictions={self.evictions} "
+                f"size={self.total_bytes / 1048576:.1f}/{self.max_bytes / 1048576:.0f} MiB")
@@ -0,0 +1,11 @@
+"""
+Parsing constants shared by row-by-row parsing (trademe_scraper) and batch
+normalization (trademe_normalize), so both modes produce the same values.
+"""
+
+PRICE_PATTERN = r"\$([0-9,]+)" # First dollar amount in a price / rent string
+PROPERTY_TYPE_KEYWORDS = ["Apartment", "Condo", "Co-op", "home", "townhouse", "Cape Cod", "Colonial",
+                          "Contemporary", "Federal", "Craftsman", "Greek Revival", "Farmhouse",
+                          "French country", "Mediterranean", "Midcentury modern", "Ranch",
+                          "Split-level", "Tudor", "Victorian"] # Checked in order: the first one found wins
+PROPERTY_TYPE_KEYWORDS_LOWER = [keyword.lower() for keyword in PROPERTY_TYPE_KEYWORDS]
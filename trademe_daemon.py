@@ -0,0 +1,179 @@
+"""
+Local job API for the long-running (warm browser) daemon mode.
+
+A tiny HTTP/1.1 server on the loopback interface:
+
+    POST /jobs     JSON job spec -> newline-delimited JSON event stream
+    GET  /status   queue depth, running jobs and per-job latency
+
+Jobs are queued and run by a fixed number of job workers. Results are streamed
+back to the client as each listing finishes; the connection closes after the
+final "done" event. The scraping itself is supplied by the caller as
+`run_job(job, emit)`, so this module knows nothing about Playwright.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+RECENT_JOBS_KEPT = 100
+
+# --- Minimal HTTP helpers ---
+async def read_http_request(reader):
+    """Reads one HTTP request; returns (method, path, body bytes)."""
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        raise ValueError("empty request")
+    method, path, _ = request_line.split(" ", 2)
+    content_length = 0
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value.strip())
+    if content_length > MAX_REQUEST_BYTES:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(content_length) if content_length else b""
+    return method.upper(), path.split("?", 1)[0], body
+
+async def write_http_head(writer, status: str, content_type: str):
+    """Writes a response head; the body is delimited by closing the connection."""
+    writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                  f"Cache-Control: no-store\r\nConnection: close\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+async def write_json_response(writer, status: str, payload):
+    await write_http_head(writer, status, "application/json")
+    writer.write(json.dumps(payload).encode("utf-8"))
+    await writer.drain()
+# --- End HTTP helpers ---
+
+class JobDaemon:
+    """Queues scrape jobs from the local HTTP API and streams their results back."""
+
+    def __init__(self, run_job, host: str = "127.0.0.1", port: int = 8765, workers: int = 2, status_extra=None):
+        self.run_job = run_job # async (job: dict, emit: async callable(dict)) -> None
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.status_extra = status_extra # Optional callable returning extra fields for /status
+        self.queue = asyncio.Queue()
+        self.job_ids = itertools.count(1)
+        self.running = {}
+        self.completed = 0
+        self.failed = 0
+        self.listings_streamed = 0
+        self.recent = deque(maxlen=RECENT_JOBS_KEPT)
+        self.started_at = time.monotonic()
+
+    # --- Job execution ---
+    async def _worker(self):
+        while True:
+            job, events = await self.queue.get()
+            job["started_at"] = time.monotonic()
+            self.running[job["job_id"]] = job
+
+            async def emit(event, events=events):
+                if event.get("event") == "listing":
+                    self.listings_streamed += 1
+                await events.put(event)
+
+            try:
+                await self.run_job(job["spec"], emit)
+                self.completed += 1
+                status = "ok"
+            except Exception as e:
+                self.failed += 1
+                status = "error"
+                await events.put({"event": "error", "job_id": job["job_id"], "error": str(e)})
+            finally:
+                del self.running[job["job_id"]]
+                finished = time.monotonic()
+                timing = {
+                    "job_id": job["job_id"],
+                    "status": status,
+                    "queue_wait_s": round(job["started_at"] - job["accepted_at"], 3),
+                    "run_s": round(finished - job["started_at"], 3),
+                    "latency_s": round(finished - job["accepted_at"], 3),
+                }
+                self.recent.append(timing)
+                await events.put({"event": "done", **timing})
+                await events.put(None)
+                self.queue.task_done()
+
+    def status(self) -> dict:
+        latencies = sorted(item["latency_s"] for item in self.recent)
+        status = {
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "queue_depth": self.queue.qsize(),
+            "running_jobs": len(self.running),
+            "completed_jobs": self.completed,
+            "failed_jobs": self.failed,
+            "listings_streamed": self.listings_streamed,
+            "job_latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "job_latency_max_s": latencies[-1] if latencies else None,
+            "recent_jobs": list(self.recent)[-10:],
+        }
+        if self.status_extra is not None:
+            status.update(self.status_extra())
+        return status
+    # --- End job execution ---
+
+    # --- HTTP handling ---
+    async def _handle(self, reader, writer):
+        try:
+            method, path, body = await read_http_request(reader)
+            if method == "GET" and path == "/status":
+                await write_json_response(writer, "200 OK", self.status())
+            elif method == "POST" and path == "/jobs":
+                try:
+                    spec = json.loads(body or b"{}")
+                    if not isinstance(spec, dict):
+                        raise ValueError("job spec must be a JSON object")
+                except ValueError as e:
+                    await write_json_response(writer, "400 Bad Request", {"error": f"invalid job spec: {e}"})
+                    return
+                await self._stream_job(spec, writer)
+            else:
+                await write_json_response(writer, "404 Not Found", {"error": f"no route for {method} {path}"})
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await write_json_response(writer, "400 Bad Request", {"error": str(e)})
+        except ConnectionError:
+            pass # Client went away; its job keeps running and results are dropped
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _stream_job(self, spec, writer):
+        events = asyncio.Queue()
+        job = {"job_id": next(self.job_ids), "spec": spec, "accepted_at": time.monotonic()}
+        await self.queue.put((job, events))
+        await write_http_head(writer, "200 OK", "application/x-ndjson")
+        accepted = {"event": "accepted", "job_id": job["job_id"], "queue_depth": self.queue.qsize()}
+        writer.write((json.dumps(accepted) + "\n").encode("utf-8"))
+        await writer.drain()
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            writer.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+            await writer.drain()
+    # --- End HTTP handling ---
+
+    async def serve_forever(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"\n🛰️ Daemon listening on http://{self.host}:{self.port} (POST /jobs, GET /status) with {self.workers} job workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
@@ -0,0 +1,242 @@
+"""
+Content-addressed, compressed store for listing descriptions (--description-store).
+
+`Full Description` is by far the largest field in a row, and it used to be
+rewritten into every temp, chunk and final CSV, and again for every re-scrape
+of an unchanged listing. With the store, each distinct description is
+compressed once into a SQLite file keyed by its SHA-256. Rows carry only
+`description_sha`, so an unchanged description costs nothing extra across
+saves, re-scrapes and runs.
+
+    descriptions(sha TEXT PRIMARY KEY, codec, raw_size, data BLOB, first_seen)
+
+Compression uses zstandard when it is installed and zlib otherwise; each row
+records its codec, so a store can mix both.
+
+Command line:
+    python trademe_descriptions.py stats   STORE
+    python trademe_descriptions.py export  STORE IN_CSV OUT_CSV    # put Full Description back
+    python trademe_descriptions.py compare CSV                     # size / write time vs plain CSV
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError: # Optional; zlib is used instead
+    zstandard = None
+
+DESCRIPTION_FIELD = "Full Description"
+HASH_FIELD = "description_sha"
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 6
+LOOKUP_BATCH = 500 # Hashes per SELECT ... IN (...)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS descriptions (
+    sha TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    raw_size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    first_seen REAL NOT NULL
+);
+"""
+
+class DescriptionStore:
+    """Deduplicated, compressed description blobs keyed by content hash."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.known = {row[0] for row in self.conn.execute("SELECT sha FROM descriptions")}
+        self.pending = {} # sha -> row not yet committed
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard is not None else None
+        self.puts = 0
+        self.new = 0
+        self.new_raw_bytes = 0
+        self.new_stored_bytes = 0
+        self.write_s = 0.0
+
+    # --- Writing ---
+    def _compress(self, raw: bytes):
+        if self._compressor is not None:
+            return "zstd", self._compressor.compress(raw)
+        return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+    def put(self, text):
+        """Stores a description (if it is new) and returns its hash; None for a missing description."""
+        if text is None or text != text: # None or NaN from a CSV round-trip
+            return None
+        started = time.perf_counter()
+        raw = text.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        self.puts += 1
+        if sha not in self.known:
+            codec, data = self._compress(raw)
+            self.pending[sha] = (sha, codec, len(raw), data, time.time())
+            self.known.add(sha)
+            self.new += 1
+            self.new_raw_bytes += len(raw)
+            self.new_stored_bytes += len(data)
+        self.write_s += time.perf_counter() - started
+        return sha
+
+    def externalize(self, record: dict) -> dict:
+        """Moves a record's Full Description into the store, leaving description_sha in its place."""
+        if DESCRIPTION_FIELD in record:
+            record[HASH_FIELD] = self.put(record.pop(DESCRIPTION_FIELD))
+        return record
+
+    def flush(self):
+        """Commits pending descriptions in one transaction."""
+        if not self.pending:
+            return
+        started = time.perf_counter()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO descriptions (sha, codec, raw_size, data, first_seen) VALUES (?, ?, ?, ?, ?)",
+                list(self.pending.values()))
+        self.pending.clear()
+        self.write_s += time.perf_counter() - started
+    # --- End writing ---
+
+    # --- Reading ---
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> str:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("this store has zstd-compressed descriptions; pip install zstandard to read them")
+            return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+        return zlib.decompress(data).decode("utf-8")
+
+    def get_many(self, shas) -> dict:
+        """Returns {sha: description} for the given hashes (missing ones are left out)."""
+        wanted = {sha for sha in shas if isinstance(sha, str)}
+        found = {}
+        for sha in wanted & self.pending.keys():
+            _, codec, _, data, _ = self.pending[sha]
+            found[sha] = self._decompress(codec, data)
+        remaining = list(wanted - found.keys())
+        for start in range(0, len(remaining), LOOKUP_BATCH):
+            batch = remaining[start:start + LOOKUP_BATCH]
+            rows = self.conn.execute(
+                f"SELECT sha, codec, data FROM descriptions WHERE sha IN ({','.join('?' * len(batch))})", batch)
+            for sha, codec, data in rows:
+                found[sha] = self._decompress(codec, data)
+        return found
+
+    def get(self, sha: str):
+        return self.get_many([sha]).get(sha)
+
+    def inflate(self, df):
+        """Returns a copy of a DataFrame with Full Description restored from description_sha."""
+        df = df.copy()
+        if HASH_FIELD in df.columns:
+            texts = self.get_many(df[HASH_FIELD].dropna().unique())
+            df[DESCRIPTION_FIELD] = df[HASH_FIELD].map(texts)
+        return df
+    # --- End reading ---
+
+    def stats(self) -> dict:
+        count, raw_bytes, stored_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM descriptions").fetchone()
+        return {
+            "descriptions": count,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "this_run_puts": self.puts,
+            "this_run_new": self.new,
+            "this_run_write_s": round(self.write_s, 3),
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        ratio = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0.0
+        return (f"{stats['descriptions']} descriptions, {stats['raw_bytes'] / 1048576:.1f} MiB raw -> "
+                f"{stats['stored_bytes'] / 1048576:.1f} MiB stored ({ratio:.1f}x); this run {self.new} new of "
+                f"{self.puts} ({self.puts - self.new} unchanged), {self.write_s:.2f}s writing")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# --- Command line ---
+def compare_with_csv(csv_path: str):
+    """Writes the CSV's rows twice, with inline descriptions and with hashes plus a store, and prints sizes and times."""
+    import pandas as pd # Only needed for this comparison
+
+    df = pd.read_csv(csv_path)
+    if DESCRIPTION_FIELD not in df.columns:
+        raise SystemExit(f"{csv_path} has no '{DESCRIPTION_FIELD}' column")
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        plain_path = os.path.join(tmp, "plain.csv")
+        df.to_csv(plain_path, index=False)
+        plain_s = time.perf_counter() - started
+
+        store = DescriptionStore(os.path.join(tmp, "descriptions.db"))
+        started = time.perf_counter()
+        records = [store.externalize(record) for record in df.to_dict("records")]
+        store.flush()
+        hashed_path = os.path.join(tmp, "hashed.csv")
+        pd.DataFrame(records).to_csv(hashed_path, index=False)
+        first_s = time.perf_counter() - started
+
+        # A second save of the same rows, like the next save_temp_data or a re-scrape of unchanged listings
+        started = time.perf_counter()
+        records = [store.externalize(record) for record in df.to_dict("records")]
+        store.flush()
+        pd.DataFrame(records).to_csv(hashed_path, index=False)
+        repeat_s = time.perf_counter() - started
+        stats = store.stats()
+        store.close()
+        plain_bytes = os.path.getsize(plain_path)
+        hashed_bytes = os.path.getsize(hashed_path)
+        store_bytes = os.path.getsize(store.path)
+        print(f"rows: {len(df)}, distinct descriptions: {stats['descriptions']}, codec: {'zstd' if zstandard else 'zlib'}")
+        print(f"plain CSV            {plain_bytes / 1048576:>9.2f} MiB  written in {plain_s:.3f}s (every save)")
+        print(f"hashed CSV + store   {(hashed_bytes + store_bytes) / 1048576:>9.2f} MiB  "
+              f"(CSV {hashed_bytes / 1048576:.2f} MiB, store {store_bytes / 1048576:.2f} MiB)")
+        print(f"  first save         {first_s:.3f}s")
+        print(f"  repeat save        {repeat_s:.3f}s (descriptions already stored; CSV {hashed_bytes / 1048576:.2f} MiB per save)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or export a Trade Me description store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = commands.add_parser("stats", help="Print store size and compression ratio.")
+    stats_parser.add_argument("store")
+    export_parser = commands.add_parser("export", help="Write a CSV with Full Description restored from description_sha.")
+    export_parser.add_argument("store")
+    export_parser.add_argument("in_csv")
+    export_parser.add_argument("out_csv")
+    compare_parser = commands.add_parser("compare", help="Compare size and write time against a plain CSV.")
+    compare_parser.add_argument("csv")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        compare_with_csv(args.csv)
+        return
+    store = DescriptionStore(args.store)
+    try:
+        if args.command == "stats":
+            print(store.summary())
+        else:
+            import pandas as pd
+            started = time.perf_counter()
+            df = store.inflate(pd.read_csv(args.in_csv))
+            df.to_csv(args.out_csv, index=False)
+            print(f"✅ Exported {len(df)} rows with descriptions to {args.out_csv} in {time.perf_counter() - started:.2f}s")
+    finally:
+        store.close()
+# --- End command line ---
+
+if __name__ == "__main__":
+    main()
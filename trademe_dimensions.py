@@ -0,0 +1,198 @@
+"""
+Agent and agency dimension tables (--dimensions).
+
+Listing rows used to carry `agency_name` as a long string on every row
+("Barfoot & Thompson Mt Roskill Rentals, (Licensed: REAA 2008)"). They also
+carried `agent_name`, which is a string for rentals but a Python list for
+sales, so it reached the CSV as its repr. With dimension tables, names are
+interned in memory as records stream in, and each listing row keeps only
+integer keys:
+
+    agency_id, primary_agent_id, agent_count           on the listing row
+    agencies.csv        agency_id, agency_name, licence, full_name
+    agents.csv          agent_id, agent_name, agency_id
+    listing_agents.csv  listing_id, agent_id, position, seen_at
+
+An agent is keyed by name and agency, so two people with the same name at
+different agencies get different ids. Ids are stable across runs: the tables
+are loaded on start. Agencies and agents are append-only. Link rows are
+appended on every flush, and on close the link table is compacted to each
+listing's latest agents. A listing whose agents change to none gets a
+tombstone link row (empty agent_id, position -1), so loading the appended
+table does not bring its earlier agents back.
+"""
+import ast
+import csv
+import os
+import re
+from datetime import datetime, timezone
+
+from trademe_history import listing_id_of
+
+AGENCIES_FILE = "agencies.csv"
+AGENTS_FILE = "agents.csv"
+LINKS_FILE = "listing_agents.csv"
+AGENCY_COLUMNS = ["agency_id", "agency_name", "licence", "full_name"]
+AGENT_COLUMNS = ["agent_id", "agent_name", "agency_id"]
+LINK_COLUMNS = ["listing_id", "agent_id", "position", "seen_at"]
+ID_COLUMNS = ["agency_id", "primary_agent_id", "agent_count"] # Integer columns added to listing rows
+TOMBSTONE_POSITION = -1 # Link row position meaning "no agents from seen_at on"
+LICENCE_PATTERN = re.compile(r",?\s*\(\s*Licen[cs]ed:?\s*([^)]*)\)\s*$", re.IGNORECASE)
+
+def split_licence(full_name: str):
+    """'Acme Realty, (Licensed: REAA 2008)' -> ('Acme Realty', 'REAA 2008')."""
+    match = LICENCE_PATTERN.search(full_name)
+    if not match:
+        return full_name, None
+    return full_name[:match.start()].strip(), match.group(1).strip() or None
+
+def agent_names(value) -> list:
+    """Agent names from a row: a string, a list, or a list's repr read back from a CSV."""
+    if value is None or value != value: # None or NaN
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            try:
+                value = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                return [text]
+        else:
+            return [text] if text else []
+    return [str(name).strip() for name in value if name is not None and str(name).strip()]
+
+def read_rows(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def append_rows(path: str, columns, rows):
+    """Appends dict rows to a CSV, writing the header when the file is new."""
+    if not rows:
+        return
+    new_file = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+class DimensionTables:
+    """In-memory interning of agencies and agents, persisted as CSV dimension and link tables."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.agencies = {} # full agency text -> agency_id
+        self.agents = {} # (agent name, agency_id) -> agent_id
+        self.links = {} # listing_id -> (seen_at, tuple of agent_ids)
+        self.pending_agencies = []
+        self.pending_agents = []
+        self.pending_links = []
+        self.interned_rows = 0
+        self.removed_chars = 0 # Name text no longer repeated on listing rows
+
+    # --- Persistence ---
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for row in read_rows(self.path(AGENCIES_FILE)):
+            self.agencies[row["full_name"]] = int(row["agency_id"])
+        for row in read_rows(self.path(AGENTS_FILE)):
+            agency_id = int(row["agency_id"]) if row["agency_id"] else None
+            self.agents[(row["agent_name"], agency_id)] = int(row["agent_id"])
+        latest = {} # listing_id -> (seen_at, {position: agent_id})
+        for row in read_rows(self.path(LINKS_FILE)): # Appended in order, so later rows win
+            seen_at, agents = latest.get(row["listing_id"], ("", {}))
+            if row["seen_at"] > seen_at:
+                seen_at, agents = row["seen_at"], {}
+            if row["seen_at"] == seen_at:
+                position = int(row["position"])
+                if position == TOMBSTONE_POSITION:
+                    agents = {}
+                else:
+                    agents[position] = int(row["agent_id"])
+            latest[row["listing_id"]] = (seen_at, agents)
+        self.links = {listing_id: (seen_at, tuple(agent_id for _, agent_id in sorted(agents.items())))
+                      for listing_id, (seen_at, agents) in latest.items()}
+        return self
+
+    def flush(self):
+        """Appends the agencies, agents and links interned since the last flush."""
+        append_rows(self.path(AGENCIES_FILE), AGENCY_COLUMNS, self.pending_agencies)
+        append_rows(self.path(AGENTS_FILE), AGENT_COLUMNS, self.pending_agents)
+        append_rows(self.path(LINKS_FILE), LINK_COLUMNS, self.pending_links)
+        self.pending_agencies, self.pending_agents, self.pending_links = [], [], []
+
+    def close(self):
+        """Flushes, then rewrites the link table with only each listing's latest agents."""
+        self.flush()
+        rows = [{"listing_id": listing_id, "agent_id": agent_id, "position": position, "seen_at": seen_at}
+                for listing_id, (seen_at, agent_ids) in self.links.items()
+                for position, agent_id in enumerate(agent_ids)]
+        # Listings without agents need no rows (or tombstones) once their older rows are gone
+        temp_path = self.path(LINKS_FILE) + ".tmp"
+        with open(temp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=LINK_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_path, self.path(LINKS_FILE))
+    # --- End persistence ---
+
+    # --- Interning ---
+    def agency_id(self, full_name):
+        if full_name is None or full_name != full_name or not str(full_name).strip():
+            return None
+        full_name = str(full_name).strip()
+        agency_id = self.agencies.get(full_name)
+        if agency_id is None:
+            agency_id = self.agencies[full_name] = len(self.agencies) + 1
+            name, licence = split_licence(full_name)
+            self.pending_agencies.append({"agency_id": agency_id, "agency_name": name, "licence": licence, "full_name": full_name})
+        return agency_id
+
+    def agent_id(self, name: str, agency_id):
+        key = (name, agency_id)
+        agent_id = self.agents.get(key)
+        if agent_id is None:
+            agent_id = self.agents[key] = len(self.agents) + 1
+            self.pending_agents.append({"agent_id": agent_id, "agent_name": name, "agency_id": agency_id})
+        return agent_id
+
+    def intern_record(self, record: dict) -> dict:
+        """Replaces a record's agency_name / agent_name with integer ids and records its agent links.
+
+        Records that were interned already (e.g. resumed from a temp file) are left alone.
+        """
+        if "agency_name" not in record and "agent_name" not in record:
+            return record
+        agency_name, agent_value = record.pop("agency_name", None), record.pop("agent_name", None)
+        self.removed_chars += sum(len(str(value)) for value in (agency_name, agent_value) if value is not None and value == value)
+        agency_id = self.agency_id(agency_name)
+        agent_ids = tuple(dict.fromkeys(self.agent_id(name, agency_id) for name in agent_names(agent_value)))
+        record["agency_id"] = agency_id
+        record["primary_agent_id"] = agent_ids[0] if agent_ids else None
+        record["agent_count"] = len(agent_ids)
+        listing_id = listing_id_of(record)
+        if listing_id is not None:
+            seen_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            previous = self.links.get(listing_id, (None, None))[1]
+            if previous != agent_ids and agent_ids:
+                self.pending_links.extend({"listing_id": listing_id, "agent_id": agent_id, "position": position, "seen_at": seen_at}
+                                          for position, agent_id in enumerate(agent_ids))
+            elif previous and not agent_ids: # Agents changed to none
+                self.pending_links.append({"listing_id": listing_id, "agent_id": "", "position": TOMBSTONE_POSITION, "seen_at": seen_at})
+            self.links[listing_id] = (seen_at, agent_ids)
+        self.interned_rows += 1
+        return record
+    # --- End interning ---
+
+    def stats(self) -> dict:
+        return {"agencies": len(self.agencies), "agents": len(self.agents), "linked_listings": len(self.links),
+                "interned_rows": self.interned_rows, "removed_chars": self.removed_chars}
+
+    def summary(self) -> str:
+        return (f"{len(self.agencies)} agencies, {len(self.agents)} agents, {len(self.links)} listings linked; "
+                f"{self.interned_rows} rows interned this run ({self.removed_chars / 1024:.0f} KiB of names off the rows)")
@@ -0,0 +1,341 @@
+"""
+Price and status history for listings (--history).
+
+Each run's final CSV is a full snapshot. Tracking a rent or ask-price change
+across snapshots means joining them all. This module keeps one SQLite file
+keyed by listing_id and records only the fields that changed since the
+previous observation (a missing value, e.g. a failed extraction, is not a change):
+
+    changes(listing_id, field, observed_at, value, previous)   one row per change
+    current(listing_id, field, value)                          latest value, for change detection
+    listings(listing_id, listing_type, url, first_seen, last_seen, status, missed_runs)
+    runs(run_at, listing_type, seen, complete, withdrawn, removed, reactivated)
+
+`status` is derived from the search results instead of being hard-coded:
+
+    active      seen in the latest complete crawl of its listing type
+    withdrawn   missing from the last 1..REMOVED_AFTER_RUNS-1 complete crawls
+    removed     missing from REMOVED_AFTER_RUNS complete crawls in a row
+
+A crawl counts as complete only if it reached the last search page from page
+1. Status changes are recorded in `changes` like any other field.
+
+Queries use the indexes on `changes` rather than reading snapshots:
+
+    python trademe_history.py as-of   HISTORY 2025-08-01 [--listing-type sale] [--out FILE]
+    python trademe_history.py changes HISTORY --since 2025-07-01 [--field ask_price_nzd] [--out FILE]
+    python trademe_history.py listing HISTORY 5412345678
+    python trademe_history.py status  HISTORY [--listing-type rental]
+"""
+import argparse
+import csv
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+
+TRACKED_FIELDS = { # history field -> record column
+    "rent_nzd": "rent_nzd",
+    "rent_period": "rent_period",
+    "ask_price_nzd": "ask_price_nzd",
+    "sale_type": "sale_type",
+    "cv_nzd": "cv_nzd",
+    "estimate_low_nzd": "estimate_low_nzd",
+    "estimate_high_nzd": "estimate_high_nzd",
+    "page_views": "Page Views",
+}
+REMOVED_AFTER_RUNS = 3
+MIN_SEEN_FRACTION = 0.5 # A "complete" crawl seeing fewer than this share of active listings is treated as partial
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT PRIMARY KEY,
+    listing_type TEXT NOT NULL,
+    url TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    status TEXT NOT NULL,
+    missed_runs INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS listings_type_status ON listings (listing_type, status);
+CREATE TABLE IF NOT EXISTS current (
+    listing_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (listing_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    listing_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    observed_at TEXT NOT NULL,
+    value TEXT,
+    previous TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_listing ON changes (listing_id, field, observed_at);
+CREATE INDEX IF NOT EXISTS changes_time ON changes (observed_at);
+CREATE TABLE IF NOT EXISTS runs (
+    run_at TEXT NOT NULL,
+    listing_type TEXT NOT NULL,
+    seen INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    withdrawn INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    reactivated INTEGER NOT NULL
+);
+"""
+
+# --- Values and timestamps ---
+def format_time(moment: datetime) -> str:
+    """UTC timestamp text that sorts in time order."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def parse_time(text) -> datetime:
+    """'2025-08-04', '2025-08-04T10:00' or a full ISO timestamp; naive times are UTC."""
+    moment = datetime.fromisoformat(str(text).replace("Z", "+00:00"))
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+def query_bound(text: str, end_of_day: bool) -> str:
+    """A date alone means the whole day: as-of a date includes it, since a date starts at its midnight."""
+    moment = parse_time(text)
+    if end_of_day and re.fullmatch(r"\d{4}-\d{2}-\d{2}", str(text)):
+        moment += timedelta(days=1)
+    return format_time(moment)
+
+def value_text(value):
+    """Stored form of a field value: None for missing, integers (and integer text) without a trailing '.0'."""
+    if value is None:
+        return None
+    try:
+        if value != value: # NaN
+            return None
+    except TypeError: # pandas.NA
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value).strip()
+    if re.fullmatch(r"-?\d+\.0+", text): # Read back from a CSV that pandas wrote with float columns
+        text = text[:text.index(".")]
+    return text or None
+
+def listing_id_of(record: dict):
+    listing_id = value_text(record.get("listing_id"))
+    if listing_id is None:
+        match = re.search(r"/listing/(\d+)", str(record.get("URL") or ""))
+        listing_id = match.group(1) if match else None
+    return listing_id
+# --- End values and timestamps ---
+
+class ListingHistory:
+    """Change-only history of tracked listing fields plus derived listing status."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.last_run = {} # listing_type -> counts from the latest record_run / finish_run
+
+    # --- Recording ---
+    def record_run(self, records, listing_type: str) -> dict:
+        """Records the tracked fields of one run's records in a single transaction. Returns counts."""
+        counts = {"observed": 0, "new_listings": 0, "changes": 0, "stale": 0}
+        last_seen = dict(self.conn.execute("SELECT listing_id, last_seen FROM listings"))
+        latest = {} # listing_id -> {field: value}, read once instead of per record
+        for listing_id, field, value in self.conn.execute("SELECT listing_id, field, value FROM current"):
+            latest.setdefault(listing_id, {})[field] = value
+        with self.conn:
+            for record in records:
+                listing_id = listing_id_of(record)
+                if listing_id is None:
+                    continue
+                scraped_at = record.get("Scraped At")
+                observed_at = format_time(parse_time(scraped_at)) if value_text(scraped_at) else format_time(datetime.now(timezone.utc))
+                previous_seen = last_seen.get(listing_id)
+                if previous_seen is not None and observed_at < previous_seen:
+                    counts["stale"] += 1 # e.g. a resumed row older than what is already recorded
+                    continue
+                counts["observed"] += 1
+                last_seen[listing_id] = observed_at
+                current = latest.setdefault(listing_id, {})
+                if previous_seen is None:
+                    counts["new_listings"] += 1
+                    self.conn.execute(
+                        "INSERT INTO listings (listing_id, listing_type, url, first_seen, last_seen, status) VALUES (?, ?, ?, ?, ?, 'active')",
+                        (listing_id, listing_type, record.get("URL"), observed_at, observed_at))
+                    self._set(listing_id, "status", "active", observed_at)
+                    current["status"] = "active"
+                else:
+                    self.conn.execute("UPDATE listings SET last_seen = ?, url = COALESCE(?, url) WHERE listing_id = ?",
+                                      (observed_at, record.get("URL"), listing_id))
+                for field, column in TRACKED_FIELDS.items():
+                    value = value_text(record.get(column))
+                    if value is None:
+                        continue # Not captured (type, mode or a failed extraction); not a change
+                    if current.get(field) != value:
+                        self._set(listing_id, field, value, observed_at, current.get(field))
+                        current[field] = value
+                        counts["changes"] += 1
+        self.last_run[listing_type] = counts
+        return counts
+
+    def _set(self, listing_id, field, value, observed_at, previous=None):
+        self.conn.execute("INSERT INTO changes (listing_id, field, observed_at, value, previous) VALUES (?, ?, ?, ?, ?)",
+                          (listing_id, field, observed_at, value, previous))
+        self.conn.execute("INSERT OR REPLACE INTO current (listing_id, field, value) VALUES (?, ?, ?)", (listing_id, field, value))
+
+    def finish_run(self, listing_type: str, seen_ids, complete: bool) -> dict:
+        """Updates statuses after a crawl of listing_type that found `seen_ids` in the search results.
+
+        Listings that reappear become active again. Missing listings only change status
+        after a complete crawl, since a --max-pages run does not see everything.
+        """
+        seen_ids = {str(listing_id) for listing_id in seen_ids if listing_id is not None}
+        run_at = format_time(datetime.now(timezone.utc))
+        result = {"seen": len(seen_ids), "complete": complete, "withdrawn": 0, "removed": 0, "reactivated": 0}
+        with self.conn:
+            rows = self.conn.execute("SELECT listing_id, status, missed_runs FROM listings WHERE listing_type = ?", (listing_type,)).fetchall()
+            active = sum(1 for _, status, _ in rows if status == "active")
+            if complete and active and len(seen_ids) < MIN_SEEN_FRACTION * active:
+                print(f"\n⚠️ History: crawl saw {len(seen_ids)} of {active} active {listing_type} listings; "
+                      f"treating it as partial and not marking missing listings.")
+                complete = result["complete"] = False
+            for listing_id, status, missed_runs in rows:
+                if listing_id in seen_ids:
+                    if status != "active":
+                        self._set(listing_id, "status", "active", run_at, status)
+                        result["reactivated"] += 1
+                    if status != "active" or missed_runs:
+                        self.conn.execute("UPDATE listings SET status = 'active', missed_runs = 0 WHERE listing_id = ?", (listing_id,))
+                elif complete and status != "removed":
+                    missed_runs += 1
+                    new_status = "removed" if missed_runs >= REMOVED_AFTER_RUNS else "withdrawn"
+                    if new_status != status:
+                        self._set(listing_id, "status", new_status, run_at, status)
+                        result[new_status] += 1
+                    self.conn.execute("UPDATE listings SET status = ?, missed_runs = ? WHERE listing_id = ?", (new_status, missed_runs, listing_id))
+            self.conn.execute("INSERT INTO runs (run_at, listing_type, seen, complete, withdrawn, removed, reactivated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (run_at, listing_type, len(seen_ids), int(complete), result["withdrawn"], result["removed"], result["reactivated"]))
+        self.last_run.setdefault(listing_type, {}).update(result)
+        return result
+    # --- End recording ---
+
+    # --- Queries ---
+    def statuses(self, listing_ids=None) -> dict:
+        """{listing_id: status} for the given ids (all listings if None)."""
+        if listing_ids is None:
+            return dict(self.conn.execute("SELECT listing_id, status FROM listings"))
+        wanted = [str(listing_id) for listing_id in listing_ids if listing_id is not None]
+        found = {}
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            found.update(self.conn.execute(
+                f"SELECT listing_id, status FROM listings WHERE listing_id IN ({','.join('?' * len(batch))})", batch))
+        return found
+
+    def as_of(self, when: str, listing_type: str = None) -> list:
+        """Every listing's tracked fields as they were at `when` (a date includes that whole day)."""
+        bound = query_bound(when, end_of_day=True)
+        # SQLite returns the other columns from the row holding MAX(observed_at) in each group
+        rows = self.conn.execute(
+            """SELECT c.listing_id, l.listing_type, l.url, c.field, c.value, MAX(c.observed_at)
+               FROM changes c JOIN listings l ON l.listing_id = c.listing_id
+               WHERE c.observed_at < ? AND (? IS NULL OR l.listing_type = ?)
+               GROUP BY c.listing_id, c.field""", (bound, listing_type, listing_type))
+        listings = {}
+        for listing_id, row_type, url, field, value, _ in rows:
+            listings.setdefault(listing_id, {"listing_id": listing_id, "listing_type": row_type, "url": url})[field] = value
+        return list(listings.values())
+
+    def changes_since(self, when: str, field: str = None, listing_type: str = None) -> list:
+        """Changes recorded at or after `when`, oldest first."""
+        bound = query_bound(when, end_of_day=False)
+        rows = self.conn.execute(
+            """SELECT c.observed_at, c.listing_id, l.listing_type, c.field, c.previous, c.value
+               FROM changes c JOIN listings l ON l.listing_id = c.listing_id
+               WHERE c.observed_at >= ? AND (? IS NULL OR c.field = ?) AND (? IS NULL OR l.listing_type = ?)
+               ORDER BY c.observed_at""", (bound, field, field, listing_type, listing_type))
+        keys = ("observed_at", "listing_id", "listing_type", "field", "previous", "value")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def listing(self, listing_id: str) -> list:
+        rows = self.conn.execute("SELECT observed_at, field, previous, value FROM changes WHERE listing_id = ? ORDER BY observed_at, field",
+                                 (str(listing_id),))
+        return [dict(zip(("observed_at", "field", "previous", "value"), row)) for row in rows]
+
+    def last_seen_times(self, listing_type: str = None) -> dict:
+        """{listing_id: epoch seconds it was last scraped}, e.g. for the crawl scheduler."""
+        rows = self.conn.execute("SELECT listing_id, last_seen FROM listings WHERE (? IS NULL OR listing_type = ?)",
+                                 (listing_type, listing_type))
+        return {listing_id: parse_time(last_seen).timestamp() for listing_id, last_seen in rows}
+
+    def status_counts(self, listing_type: str = None) -> dict:
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM listings WHERE (? IS NULL OR listing_type = ?) GROUP BY status",
+                                 (listing_type, listing_type))
+        return dict(rows)
+    # --- End queries ---
+
+    def summary(self) -> str:
+        counts = self.status_counts()
+        changes = self.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+        runs = ", ".join(f"{listing_type}: {c.get('changes', 0)} changes, {c.get('withdrawn', 0)} withdrawn, {c.get('removed', 0)} removed"
+                         for listing_type, c in self.last_run.items())
+        return (f"{sum(counts.values())} listings ({', '.join(f'{n} {s}' for s, n in sorted(counts.items())) or 'none'}), "
+                f"{changes} changes stored" + (f"; this run {runs}" if runs else ""))
+
+    def close(self):
+        self.conn.close()
+
+# --- Command line ---
+def write_rows(rows, out_path=None):
+    """Writes dict rows as CSV to out_path or stdout."""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    out = open(out_path, "w", newline="", encoding="utf-8") if out_path else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if out_path:
+            out.close()
+            print(f"✅ Wrote {len(rows)} rows to {out_path}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a Trade Me listing history file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    as_of_parser = commands.add_parser("as-of", help="Tracked fields of every listing as of a date or time.")
+    as_of_parser.add_argument("history")
+    as_of_parser.add_argument("when")
+    changes_parser = commands.add_parser("changes", help="Changes recorded since a date or time.")
+    changes_parser.add_argument("history")
+    changes_parser.add_argument("--since", required=True)
+    changes_parser.add_argument("--field", choices=list(TRACKED_FIELDS) + ["status"])
+    listing_parser = commands.add_parser("listing", help="Full change history of one listing.")
+    listing_parser.add_argument("history")
+    listing_parser.add_argument("listing_id")
+    status_parser = commands.add_parser("status", help="Listing counts per status.")
+    status_parser.add_argument("history")
+    for sub in (as_of_parser, changes_parser, status_parser):
+        sub.add_argument("--listing-type", choices=["rental", "sale"])
+    for sub in (as_of_parser, changes_parser, listing_parser):
+        sub.add_argument("--out", help="CSV file to write (default: stdout).")
+    args = parser.parse_args()
+
+    history = ListingHistory(args.history)
+    try:
+        if args.command == "as-of":
+            write_rows(history.as_of(args.when, args.listing_type), args.out)
+        elif args.command == "changes":
+            write_rows(history.changes_since(args.since, args.field, args.listing_type), args.out)
+        elif args.command == "listing":
+            write_rows(history.listing(args.listing_id), args.out)
+        else:
+            for status, count in sorted(history.status_counts(args.listing_type).items()):
+                print(f"{status:<10} {count}")
+    finally:
+        history.close()
+# --- End command line ---
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Profiling mode (--profile): where does a slow run spend its time?
+
+Three views of the Python side, plus optional browser traces:
+
+    cpu.pstats / cpu_top.txt   CPU profile of the run. Uses yappi when it is installed
+                               (coroutine-aware, all threads); otherwise cProfile on the
+                               event-loop thread.
+    loop_lag.json              Event-loop lag: how late a short periodic timer fires.
+                               Lag means some callback held the loop.
+    blocking_sites.txt         Stack samples of the loop thread, taken by a helper thread
+                               whenever the loop has been stuck longer than a threshold,
+                               aggregated by call site.
+    traces/<listing>.zip       Playwright traces for a random sample of listings
+                               (open with `playwright show-trace`).
+
+Everything is written to one directory per run, next to the other run outputs.
+"""
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+try:
+    import yappi
+except ImportError: # Optional; cProfile is used instead
+    yappi = None
+
+LAG_INTERVAL = 0.05 # Seconds between loop-lag probes
+BLOCKING_THRESHOLD = 0.1 # Loop stalls longer than this get their stack sampled
+STACK_SAMPLE_INTERVAL = 0.01
+TOP_FUNCTIONS = 40
+TOP_SITES = 25
+STACK_DEPTH = 8 # Innermost frames kept per blocking sample
+
+class RunProfiler:
+    """Collects a CPU profile, event-loop lag and blocking call sites, and samples listings for Playwright tracing."""
+
+    def __init__(self, directory: str, trace_sample: float = 0.0, blocking_threshold: float = BLOCKING_THRESHOLD):
+        self.directory = directory
+        self.trace_dir = os.path.join(directory, "traces")
+        self.trace_sample = trace_sample # Fraction of listing attempts to record a Playwright trace for
+        self.blocking_threshold = blocking_threshold
+        self.lags = []
+        self.blocking_sites = Counter() # stack (tuple of frames) -> samples
+        self.blocked_samples = 0
+        self.traces_written = 0
+        self._cprofile = None
+        self._lag_task = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._loop_thread_id = None
+        self._last_tick = None
+        self.started_at = None
+
+    # --- Start / stop ---
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.started_at = time.monotonic()
+        if yappi is not None:
+            yappi.set_clock_type("cpu")
+            yappi.start()
+        else:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._lag_task = asyncio.create_task(self._measure_lag())
+        self._sampler = threading.Thread(target=self._sample_blocked_loop, name="loop-stall-sampler", daemon=True)
+        self._sampler.start()
+        print(f"\n🔬 Profiling ({'yappi' if yappi is not None else 'cProfile'}); artifacts go to {self.directory}")
+        return self
+
+    async def stop(self):
+        """Stops collection and writes every artifact. Returns the summary dict."""
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+        summary = self.write()
+        print(f"\n🔬 Profile written to {self.directory}: loop lag p99 {summary['loop_lag_ms']['p99']} ms, "
+              f"{self.blocked_samples} stalled-loop samples, {self.traces_written} traces")
+        return summary
+    # --- End start / stop ---
+
+    # --- Event-loop lag and blocking call sites ---
+    async def _measure_lag(self):
+        while True:
+            expected = time.monotonic() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            now = time.monotonic()
+            self._last_tick = now
+            self.lags.append(max(0.0, now - expected))
+
+    def _sample_blocked_loop(self):
+        """Runs in a helper thread: while the loop hasn't ticked for a while, sample what it is executing."""
+        while not self._stop.wait(STACK_SAMPLE_INTERVAL):
+            if time.monotonic() - self._last_tick < LAG_INTERVAL + self.blocking_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)[-STACK_DEPTH:]
+            self.blocking_sites[tuple(f"{os.path.basename(f.filename)}:{f.lineno} {f.name}" for f in stack)] += 1
+            self.blocked_samples += 1
+    # --- End event-loop lag ---
+
+    # --- Playwright tracing ---
+    def should_trace(self) -> bool:
+        return self.trace_sample > 0 and random.random() < self.trace_sample
+
+    async def start_trace(self, context):
+        await context.tracing.start(screenshots=True, snapshots=True, sources=False)
+
+    async def stop_trace(self, context, name: str):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        try:
+            await context.tracing.stop(path=os.path.join(self.trace_dir, f"{safe_name}.zip"))
+            self.traces_written += 1
+        except Exception as e:
+            print(f"\n⚠️ Could not save trace for {name}: {e}")
+    # --- End Playwright tracing ---
+
+    # --- Artifacts ---
+    def _write_cpu_profile(self):
+        path = os.path.join(self.directory, "cpu.pstats")
+        if yappi is not None:
+            yappi.stop()
+            stats = yappi.get_func_stats()
+            stats.save(path, type="pstat")
+            yappi.clear_stats()
+        else:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        out.write("\n")
+        pstats.Stats(path, stream=out).sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+        with open(os.path.join(self.directory, "cpu_top.txt"), "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+    def lag_stats(self) -> dict:
+        lags = sorted(self.lags)
+        if not lags:
+            return {"samples": 0, "p50": None, "p99": None, "max": None, "over_threshold": 0}
+        pick = lambda q: round(1000 * lags[min(len(lags) - 1, int(q * len(lags)))], 1)
+        return {
+            "samples": len(lags),
+            "p50": pick(0.5),
+            "p99": pick(0.99),
+            "max": round(1000 * lags[-1], 1),
+            "over_threshold": sum(1 for lag in lags if lag > self.blocking_threshold),
+        }
+
+    def top_blocking_sites(self, limit: int = TOP_SITES):
+        """Most sampled stalled-loop stacks, innermost frame last."""
+        return [{"samples": count, "approx_ms": round(count * STACK_SAMPLE_INTERVAL * 1000), "stack": list(stack)}
+                for stack, count in self.blocking_sites.most_common(limit)]
+
+    def write(self) -> dict:
+        self._write_cpu_profile()
+        summary = {
+            "directory": self.directory,
+            "profiler": "yappi" if yappi is not None else "cProfile",
+            "wall_s": round(time.monotonic() - self.started_at, 1),
+            "loop_lag_ms": self.lag_stats(),
+            "blocked_samples": self.blocked_samples,
+            "top_blocking_sites": self.top_blocking_sites(10),
+            "traces_written": self.traces_written,
+        }
+        with open(os.path.join(self.directory, "loop_lag.json"), "w", encoding="utf-8") as f:
+            json.dump({**summary["loop_lag_ms"], "interval_s": LAG_INTERVAL, "lags_ms": [round(1000 * lag, 1) for lag in self.lags]}, f)
+        with open(os.path.join(self.directory, "blocking_sites.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Loop stalls > {self.blocking_threshold * 1000:.0f} ms, sampled every {STACK_SAMPLE_INTERVAL * 1000:.0f} ms\n\n")
+            for site in self.top_blocking_sites():
+                f.write(f"{site['samples']} samples (~{site['approx_ms']} ms)\n")
+                for frame in site["stack"]:
+                    f.write(f"    {frame}\n")
+                f.write("\n")
+        with open(os.path.join(self.directory, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+    # --- End artifacts ---
@@ -0,0 +1,132 @@
+"""
+Record-and-replay store for crawl responses.
+
+Responses are saved in a content-addressed layout so repeated bodies (Angular
+bundles, fonts, CSS) are stored once:
+
+    <dir>/index.jsonl       one JSON line per recorded request (last one wins)
+    <dir>/blobs/<sha256>    raw response bodies
+
+`ResponseStore.record_route` and `ResponseStore.replay_route` are Playwright
+route handlers; install them with `context.route("**/*", handler)`.
+"""
+import hashlib
+import json
+import os
+import urllib.parse
+
+# Headers that describe the wire encoding rather than the (already decoded) body.
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+def request_key(method: str, url: str, post_data=None) -> str:
+    """Builds the lookup key for a request: method, URL without fragment and a hash of any body."""
+    url = urllib.parse.urldefrag(url)[0]
+    key = f"{method.upper()} {url}"
+    if post_data:
+        if isinstance(post_data, str):
+            post_data = post_data.encode("utf-8")
+        key += " " + hashlib.sha256(post_data).hexdigest()[:16]
+    return key
+
+def _strip_query(url: str) -> str:
+    parsed = urllib.parse.urlparse(url)
+    return urllib.parse.urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, "", ""))
+
+class ResponseStore:
+    """Content-addressed response store used by --record and --replay."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.index_file = os.path.join(directory, "index.jsonl")
+        self.entries = {}
+        self.loose_entries = {}  # Same as entries but keyed without the query string
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+
+    # --- Storage ---
+    def load(self):
+        """Loads the index written by a previous --record run."""
+        if not os.path.exists(self.index_file):
+            raise FileNotFoundError(f"No recorded responses found at {self.index_file}")
+        with open(self.index_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.entries[entry["key"]] = entry
+                self.loose_entries[request_key(entry["method"], _strip_query(entry["url"]))] = entry
+        print(f"\n📼 Loaded {len(self.entries)} recorded responses from {self.directory}")
+        return self
+
+    def put(self, method: str, url: str, post_data, status: int, headers: dict, body: bytes):
+        """Stores one response; the body is written only if its hash is new."""
+        os.makedirs(self.blob_dir, exist_ok=True)
+        body_sha = hashlib.sha256(body).hexdigest()
+        blob_path = os.path.join(self.blob_dir, body_sha)
+        if not os.path.exists(blob_path):
+            tmp_path = blob_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, blob_path)
+        entry = {
+            "key": request_key(method, url, post_data),
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS},
+            "body_sha": body_sha,
+        }
+        with open(self.index_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.entries[entry["key"]] = entry
+        self.recorded += 1
+
+    def get(self, method: str, url: str, post_data=None):
+        """Returns (entry, body) for a recorded request, or (None, None) if it was never recorded."""
+        entry = self.entries.get(request_key(method, url, post_data))
+        if entry is None:
+            # Fall back to ignoring volatile query params (search ids, cache busters)
+            entry = self.loose_entries.get(request_key(method, _strip_query(url)))
+        if entry is None:
+            return None, None
+        with open(os.path.join(self.blob_dir, entry["body_sha"]), "rb") as f:
+            return entry, f.read()
+    # --- End storage ---
+
+    # --- Playwright route handlers ---
+    async def record_route(self, route):
+        """Fetches the request over the network, stores the response and passes it on."""
+        request = route.request
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            # Nothing is recorded for a failed fetch; the page sees the failure, as it would on replay
+            print(f"\n⚠️ Fetch failed while recording {request.url}: {e}")
+            try:
+                await route.abort("failed")
+            except Exception:
+                pass # The page / context is already gone
+            return
+        try:
+            self.put(request.method, request.url, request.post_data_buffer, response.status, response.headers, body)
+        except Exception as e:
+            print(f"\n⚠️ Failed to record response for {request.url}: {e}")
+        await route.fulfill(response=response, body=body)
+
+    async def replay_route(self, route):
+        """Serves a recorded response, or aborts the request if nothing was recorded for it."""
+        request = route.request
+        entry, body = self.get(request.method, request.url, request.post_data_buffer)
+        if entry is None:
+            self.missed += 1
+            await route.abort("internetdisconnected")
+            return
+        self.replayed += 1
+        await route.fulfill(status=entry["status"], headers=entry["headers"], body=body)
+    # --- End route handlers ---
+
+    def summary(self) -> str:
+        return f"recorded={self.recorded} replayed={self.replayed} missed={self.missed}"
@@ -0,0 +1,153 @@
+"""
+Priority order for the scrape frontier (--priority), with an optional deadline.
+
+Without a scheduler, listings are scraped in the order the search pages list
+them, so a crawl that is cut short may never reach the newest listings. The
+scheduler puts each URL in a tier and scrapes tiers in the configured order:
+
+    new        listing id not seen in earlier runs; newest list date first
+    refresh    seen before, but not for refresh_after_s; least recently seen first
+    premium    featured / premium cards
+    rest       the long tail, in search order
+
+A deadline ("the top N within T minutes") is tracked and reported: how many
+of each tier and of the N highest-priority listings were done by then.
+Ordering is what serves the deadline. The scraper can also stop at the
+deadline (--deadline-stop) and leave the tail for the next run.
+
+Inputs are plain data, so this module needs neither Playwright nor the history:
+
+    last_seen   {listing_id: epoch seconds} from earlier runs (empty = everything is new)
+    cards       {url: card dict} from search payload harvesting ('list_date', 'is_featured')
+"""
+import re
+import time
+from datetime import datetime
+
+PRIORITY_TIERS = ["new", "refresh", "premium", "rest"]
+DEFAULT_REFRESH_AFTER_S = 3 * 86400
+
+def listing_id_from_url(url: str):
+    match = re.search(r"/listing/(\d+)", url)
+    return match.group(1) if match else None
+
+def list_date_ordinal(card) -> int:
+    """Days since year 1 of a card's dd/mm/yyyy list date; 0 when unknown."""
+    try:
+        return datetime.strptime(card["list_date"], "%d/%m/%Y").toordinal()
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+def parse_priority(text: str) -> list:
+    """'new,premium' -> ['new', 'premium', 'rest']: the given tiers in order, then the long tail."""
+    tiers = [tier.strip() for tier in text.split(",") if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in PRIORITY_TIERS]
+    if unknown:
+        raise ValueError(f"unknown priority tiers {unknown}; choose from {PRIORITY_TIERS}")
+    return list(dict.fromkeys([tier for tier in tiers if tier != "rest"] + ["rest"]))
+
+class CrawlScheduler:
+    """Orders listing URLs by priority tier and tracks coverage against a deadline."""
+
+    def __init__(self, tiers=None, last_seen: dict = None, cards: dict = None,
+                 refresh_after_s: float = DEFAULT_REFRESH_AFTER_S, deadline_s: float = None, top_n: int = None):
+        self.tiers = tiers or list(PRIORITY_TIERS)
+        self.last_seen = last_seen or {}
+        self.cards = cards if cards is not None else {} # The scraper swaps in its search_cards and keeps adding to it
+        self.refresh_after_s = refresh_after_s
+        self.deadline_s = deadline_s
+        self.top_n = top_n
+        self.entries = {} # url -> (sort key, tier)
+        self.done = {} # url -> (seconds since start, ok)
+        self.started_at = time.monotonic()
+        self.stopped_at_deadline = False
+
+    def start(self):
+        """Starts the deadline clock (at the start of the crawl rather than at browser launch)."""
+        self.started_at = time.monotonic()
+        return self
+
+    # --- Ordering ---
+    def classify(self, url: str, now: float = None):
+        """Returns (tier, key within the tier); lower keys go first."""
+        now = time.time() if now is None else now
+        card = self.cards.get(url) or {}
+        seen_at = self.last_seen.get(listing_id_from_url(url))
+        candidates = {
+            "new": seen_at is None,
+            "refresh": seen_at is not None and now - seen_at >= self.refresh_after_s,
+            "premium": bool(card.get("is_featured")),
+        }
+        for tier in self.tiers:
+            if tier == "rest" or candidates[tier]:
+                break
+        if tier == "new":
+            return tier, -list_date_ordinal(card) # Newest first; unknown dates last
+        if tier == "refresh":
+            return tier, seen_at or 0 # Least recently seen first
+        return tier, 0
+
+    def order(self, urls) -> list:
+        """URLs sorted by tier, then by the tier's own key, then by their original order."""
+        now = time.time()
+        keyed = []
+        for position, url in enumerate(urls):
+            tier, key = self.classify(url, now)
+            sort_key = (self.tiers.index(tier), key, len(self.entries) + position)
+            keyed.append((sort_key, url, tier))
+        keyed.sort()
+        for sort_key, url, tier in keyed:
+            self.entries.setdefault(url, (sort_key, tier))
+        return [url for _, url, _ in keyed]
+    # --- End ordering ---
+
+    # --- Deadline and coverage ---
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def past_deadline(self) -> bool:
+        return self.deadline_s is not None and self.elapsed() > self.deadline_s
+
+    def mark_done(self, url: str, ok: bool):
+        self.done.setdefault(url, (self.elapsed(), ok))
+
+    def _coverage(self, urls) -> dict:
+        urls = list(urls)
+        finished = [self.done[url] for url in urls if url in self.done]
+        succeeded = [at for at, ok in finished if ok]
+        coverage = {"scheduled": len(urls), "done": len(succeeded), "failed": len(finished) - len(succeeded)}
+        if self.deadline_s is not None:
+            coverage["done_by_deadline"] = sum(1 for at in succeeded if at <= self.deadline_s)
+        if urls and len(succeeded) == len(urls):
+            coverage["all_done_at_s"] = round(max(succeeded), 1)
+        return coverage
+
+    def report(self) -> dict:
+        by_tier = {tier: [] for tier in self.tiers}
+        for url, (_, tier) in self.entries.items():
+            by_tier[tier].append(url)
+        report = {
+            "tiers": self.tiers,
+            "deadline_s": self.deadline_s,
+            "stopped_at_deadline": self.stopped_at_deadline,
+            "per_tier": {tier: self._coverage(urls) for tier, urls in by_tier.items()},
+        }
+        if self.top_n:
+            top = sorted(self.entries, key=lambda url: self.entries[url][0])[:self.top_n]
+            report["top_n"] = {"n": len(top), **self._coverage(top)}
+        return report
+
+    def summary(self) -> str:
+        report = self.report()
+        parts = []
+        for tier, coverage in report["per_tier"].items():
+            if coverage["scheduled"]:
+                by_deadline = f", {coverage['done_by_deadline']} by deadline" if "done_by_deadline" in coverage else ""
+                parts.append(f"{tier} {coverage['done']}/{coverage['scheduled']}{by_deadline}")
+        if "top_n" in report:
+            top = report["top_n"]
+            done = top.get("done_by_deadline", top["done"])
+            parts.append(f"top {top['n']}: {done} done{' by deadline' if self.deadline_s is not None else ''}"
+                         f" ({100 * done / top['n']:.0f}%)" if top["n"] else "top 0")
+        return "; ".join(parts) or "nothing scheduled"
+    # --- End deadline and coverage ---
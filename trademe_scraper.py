@@ -1,44 +1,71 @@
 import asyncio
+import csv
 import re
 import os
-import pandas as pd
 import random
 from datetime import datetime, timedelta, timezone
 from playwright.async_api import async_playwright
 from urllib.parse import urljoin  # Import for robust URL joining
 import argparse # Import for command-line arguments
 import urllib.parse
+import json
+import time
+import socket
+import sys
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from trademe_replay import ResponseStore
+from trademe_asset_cache import AssetCache, STATIC_ASSET_URL_PATTERN
+from trademe_constants import PRICE_PATTERN, PROPERTY_TYPE_KEYWORDS, PROPERTY_TYPE_KEYWORDS_LOWER
+from trademe_daemon import JobDaemon
+from trademe_descriptions import DescriptionStore
+from trademe_dimensions import DimensionTables, ID_COLUMNS as DIMENSION_ID_COLUMNS
+from trademe_history import ListingHistory, listing_id_of
+from trademe_egress import EgressPool, DEFAULT_RATE as DEFAULT_EGRESS_RATE
+from trademe_profiler import RunProfiler
+from trademe_scheduler import CrawlScheduler, parse_priority, DEFAULT_REFRESH_AFTER_S, PRIORITY_TIERS
+from trademe_search_payload import extract_search_results, has_next_page, parse_server_state
+from trademe_sessions import SessionManager, navigation_summary, DEFAULT_POOL_SIZE as DEFAULT_SESSION_POOL, DEFAULT_MAX_AGE_S as DEFAULT_SESSION_MAX_AGE_S, DEFAULT_COLD_SAMPLE
+from trademe_status import ProgressTracker, StatusReporter, STATUS_INTERVAL
+from trademe_watchdog import BrowserWatchdog, DEFAULT_MAX_BROWSER_RSS_MB, DEFAULT_MAX_CONTEXTS, DEFAULT_MAX_CRASHES
+from trademe_work_queue import SQLiteWorkQueue, listing_id_for, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
 
 # --- Define Base URLs for different listing types ---
 BASE_URL_RENTAL = "https://www.trademe.co.nz/a/property/residential/rent/search"
 BASE_URL_SALE = "https://www.trademe.co.nz/a/property/residential/sale/search"
+LISTING_BASE_URLS = {"rental": BASE_URL_RENTAL, "sale": BASE_URL_SALE}
 # --- End Base URLs ---
 
-# --- Global variable to hold the current BASE_URL based on listing type ---
-CURRENT_BASE_URL = BASE_URL_RENTAL # Default, will be changed based on argument
-# --- End Global variable ---
-
-DATA = []
-FAILED = []
 MAX_CONCURRENT = 10
-MAX_PAGES = 5 # Consider if this should also be configurable per type if needed
-OUTPUT_DIR = "scraping_output"  # Updated output directory
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+OUTPUT_DIR = "scraping_output"  # Updated output directory (created by main(), not at import)
 TASK_START_DELAY = 0.5  # Delay in seconds between starting tasks (e.g., 0.2 = 200ms)
+MAX_RETRIES = 2 # Extra attempts per listing after the first one fails
 
 # --- New constants for features ---
-PROGRESS_LOCK = asyncio.Lock()
-PROCESSED_COUNT = 0
-TOTAL_LISTINGS_TO_SCRAPE = 0
 SAVE_INTERVAL = 110  # Save every 110 listings
-TEMP_SAVE_FILE = os.path.join(OUTPUT_DIR, "temp_scraped_data.csv") # Will be updated based on listing type
-RESUME_FILE = TEMP_SAVE_FILE  # Resume from the temp file if it exists
+PAGES_PER_BATCH = 5 # Collect and scrape in batches of 5 pages
+RUN_REPORTS_FILE = os.path.join(OUTPUT_DIR, "run_reports.jsonl") # One JSON line per CLI run
 # --- End new constants ---
 
-# Add new constants for URL saving/loading
-COLLECTED_URLS_FILE = os.path.join(OUTPUT_DIR, "collected_listing_urls.txt") # Will be updated based on listing type
-
-semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+ASSET_CACHE_MB = 512 # Default size bound for the on-disk asset cache
+
+# --- Sale enrichment (estimates / CV) ---
+SALE_ENRICHMENT_MODES = ["deferred", "inline", "off"]
+ENRICHMENT_CONCURRENCY = 2 # Pages the deferred enrichment pass may hold at once
+ENRICHMENT_INTERVAL = 1.0 # Minimum seconds between enrichment page loads
+ENRICHMENT_RETRIES = 1
+# --- End sale enrichment constants ---
+CONTEXT_POOL_SIZE = 4 # Pre-created contexts kept warm in daemon mode
+BLOCK_STATUSES = {403, 429} # Listing responses that mean this egress point is being blocked
+RECYCLE_DRAIN_TIMEOUT = 120 # Seconds to let in-flight pages finish before a browser restart closes them
+MAX_TIMING_SAMPLES = 10000 # Latest search-page timings / navigation samples kept per kind (a daemon runs indefinitely)
+CONTEXT_OPTIONS = {
+    "locale": "en-US", # Consider if en-NZ is better?
+    "timezone_id": "Pacific/Auckland",
+    "viewport": {"width": 1280, "height": 800},
+}
+CONSENT_BUTTON_SELECTOR = "#onetrust-accept-btn-handler, button:has-text('Accept all'), button:has-text('Accept')"
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36",
@@ -117,7 +144,7 @@ def parse_list_date(date_text: str) -> str:
             return datetime.now(timezone(timedelta(hours=12))).astimezone(timezone.utc).strftime("%d/%m/%Y")
         elif "yesterday" in date_text.lower():
              # Return yesterday's date formatted as dd/mm/yyyy
-             return (datetime.now(timezone(timedelta(hours=12))).astimezone(timezone.utc) - pd.Timedelta(days=1)).strftime("%d/%m/%Y")
+             return (datetime.now(timezone(timedelta(hours=12))).astimezone(timezone.utc) - timedelta(days=1)).strftime("%d/%m/%Y")
         else:
             # Assume format like "Listed: Mon, 4 Aug"
             # Remove "Listed:" prefix
@@ -133,580 +160,871 @@ def parse_list_date(date_text: str) -> str:
         return None
 # --- End helper function ---
 
-# --- Update scrape_listing function ---
-async def scrape_listing(browser, listing_url: str, retry: int = 2):
-    global DATA, BASE_URL # Access the global DATA list and BASE_URL to determine type
-    # Normalize the incoming URL (now also removes query params)
-    listing_url = normalize_trademe_url(listing_url)
-
-    # --- Determine listing type based on URL or global BASE_URL ---
-    # This is a basic heuristic, might need refinement later
-    is_rental = "/rent/" in listing_url or CURRENT_BASE_URL == BASE_URL_RENTAL
-    is_sale = "/sale/" in listing_url or CURRENT_BASE_URL == BASE_URL_SALE
-    listing_type = "rental" if is_rental else "sale" if is_sale else "unknown"
-    # --- End determination ---
+# --- Helper functions for price, estimate and property type parsing ---
+# PRICE_PATTERN and PROPERTY_TYPE_KEYWORDS(_LOWER) live in trademe_constants, shared with trademe_normalize
+ESTIMATE_RANGE_PATTERN = r"\$([0-9,.KkMm]+)\s*[-–—]\s*\$([0-9,.KkMm]+)"
+
+def parse_rent_price(price_text: str):
+    """Extracts the numeric rent from a price string like '$600 per week'."""
+    rent_match = re.search(PRICE_PATTERN, price_text)
+    if rent_match:
+        return rent_match.group(1).replace(",", "")
+    return None
+
+def parse_sale_price(price_text: str):
+    """Parses a sale price string into (sale_type, ask_price_nzd)."""
+    price_text_lower = price_text.lower()
+    sale_type = ask_price_nzd = None
+
+    # Determine Sale Type
+    if "auction" in price_text_lower:
+        sale_type = "Auction"
+    elif "tender" in price_text_lower:
+        sale_type = "Tender"
+    elif "deadline sale" in price_text_lower:
+        sale_type = "Deadline Sale"
+    elif "price by negotiation" in price_text_lower or "negotiation" in price_text_lower:
+        sale_type = "Price by Negotiation"
+    else:
+        # If none of the above keywords are found, assume Fixed Price if there's a price number
+        price_match = re.search(PRICE_PATTERN, price_text)
+        if price_match:
+            sale_type = "Fixed Price"
+            ask_price_nzd = price_match.group(1).replace(",", "")
+        # If no price number and no keywords, sale_type remains None
+    # If sale type was determined by keyword, also try to extract the price number
+    if sale_type and sale_type != "Fixed Price":
+        price_match = re.search(PRICE_PATTERN, price_text)
+        if price_match:
+            ask_price_nzd = price_match.group(1).replace(",", "")
+    return sale_type, ask_price_nzd
+
+def parse_estimate_value(val_str: str) -> str:
+    """Converts '$325K' / '$1.03M' / '$1,425,000' style values (without '$') to a plain number string."""
+    val_str = val_str.upper().replace(',', '')
+    if val_str.endswith('K'):
+        return str(int(float(val_str[:-1]) * 1000))
+    elif val_str.endswith('M'):
+        return str(int(float(val_str[:-1]) * 1000000))
+    else:
+        return val_str
+
+def parse_estimate_range(estimate_text: str):
+    """Parses '$1.03M - $1.16M' into (low, high), or (None, None) if no range is found."""
+    range_match = re.search(ESTIMATE_RANGE_PATTERN, estimate_text)
+    if not range_match:
+        return None, None
+    low_str, high_str = range_match.groups()
+    return parse_estimate_value(low_str), parse_estimate_value(high_str)
+
+def detect_property_type(desc: str) -> str:
+    """Returns the first PROPERTY_TYPE_KEYWORDS entry found in the description (case-insensitive), or 'Other'."""
+    lowered = desc.lower()
+    for typ in PROPERTY_TYPE_KEYWORDS_LOWER:
+        if typ in lowered:
+            return typ.capitalize()
+    return "Other"
+# --- End price/estimate/property type helpers ---
+
+class BlockedError(Exception):
+    """Raised when a listing response looks like a block (HTTP 403/429) rather than a page error."""
+
+def listing_type_from_url(listing_url: str) -> str:
+    """Guesses 'rental' / 'sale' from a listing URL when the caller doesn't know the type."""
+    if "/rent/" in listing_url:
+        return "rental"
+    if "/sale/" in listing_url:
+        return "sale"
+    return "unknown"
+
+# --- Warm context pool ---
+class ContextPool:
+    """Keeps a few listing contexts pre-created so a job doesn't wait on new_context.
+
+    Each context is still used for exactly one listing and then closed; the pool only
+    moves creation off the critical path.
+    """
 
-    async with semaphore:
-        user_agent = random.choice(USER_AGENTS)
-        extra_headers = random.choice(HEADERS_LIST).copy()
-        extra_headers["user-agent"] = user_agent
-
-        context = await browser.new_context(
-            user_agent=user_agent,
-            extra_http_headers=extra_headers,
-            locale="en-US", # Consider if en-NZ is better?
-            timezone_id="Pacific/Auckland",
-            viewport={"width": 1280, "height": 800},
-        )
-        # Consider adding a slightly longer initial delay if needed
-        await asyncio.sleep(random.uniform(2, 3))
-        page = await context.new_page()
-        try:
-            await page.goto(listing_url, timeout=20000)
-            # Wait for a key element that signifies the listing content has loaded
-            # Using a more general selector that should exist on both types
-            await page.wait_for_selector("h1[class*='tm-property-listing-body__location']", timeout=20000)
+    def __init__(self, create_context, size: int = CONTEXT_POOL_SIZE):
+        self.create_context = create_context
+        self.ready = asyncio.Queue(maxsize=size)
+        self.refill_task = None
 
+    async def _refill(self):
+        while True:
             try:
-                show_more = page.locator("span.tm-property-listing-description__show-more-button-content")
-                if await show_more.count() > 0:
-                    await show_more.click()
-                    await page.wait_for_timeout(500) # Wait a bit after click
+                context = await self.create_context()
             except Exception as e:
-                print(f"\n⚠️ Show More click failed for {listing_url}: {e}")
+                print(f"\n⚠️ Context pool failed to create a context: {e}")
+                await asyncio.sleep(5)
+                continue
+            await self.ready.put(context) # Blocks while the pool is full
 
-            # --- Extract common fields ---
-            address = await page.locator("h1[class*='tm-property-listing-body__location']").text_content(timeout=10000)
-            
-            # --- Extract price based on listing type ---
-            price_text = ""
-            price_locator = page.locator("h2[class*='tm-property-listing-body__price']")
-            if await price_locator.count() > 0:
-                 price_text = await price_locator.text_content(timeout=10000)
-            # print(f"Debug Price Text ({listing_type}): {repr(price_text)}") # Debug print
-
-            weekly_rent = None
-            ask_price_nzd = None
-            sale_type = None # For-sale specific
-            
-            if listing_type == "rental":
-                 # --- Rental Price Parsing ---
-                 # Basic extraction of numeric part
-                 rent_match = re.search(r"\$([0-9,]+)", price_text)
-                 if rent_match:
-                     weekly_rent = rent_match.group(1).replace(",", "")
-                 # TODO: Determine rent period if needed (weekly assumed for now based on field name)
-                 # --- End Rental Price Parsing ---
-            elif listing_type == "sale":
-                 # --- Sales Price and Sale Type Parsing ---
-                 price_text_lower = price_text.lower()
-                 
-                 # Determine Sale Type
-                 if "auction" in price_text_lower:
-                     sale_type = "Auction"
-                 elif "tender" in price_text_lower:
-                     sale_type = "Tender"
-                 elif "deadline sale" in price_text_lower:
-                     sale_type = "Deadline Sale"
-                 elif "price by negotiation" in price_text_lower or "negotiation" in price_text_lower:
-                     sale_type = "Price by Negotiation"
-                 else:
-                     # If none of the above keywords are found, assume Fixed Price if there's a price number
-                     price_match = re.search(r"\$([0-9,]+)", price_text)
-                     if price_match:
-                         sale_type = "Fixed Price"
-                         ask_price_nzd = price_match.group(1).replace(",", "")
-                     # If no price number and no keywords, sale_type remains None or could be set to 'Unknown'
-                 # If sale type was determined by keyword, also try to extract the price number
-                 if sale_type and sale_type != "Fixed Price":
-                     price_match = re.search(r"\$([0-9,]+)", price_text)
-                     if price_match:
-                         ask_price_nzd = price_match.group(1).replace(",", "")
-                 # --- End Sales Price and Sale Type Parsing ---
-            
-            bedrooms = bathrooms = parking_spaces = 0 # Using parking_spaces as per schema
-            try:
-                features = await page.locator("ul.tm-property-listing-attributes__tag-list li").all_inner_texts()
-                for item in features:
-                    item = item.lower().strip()
-                    num_match = re.search(r"\d+", item)
-                    num = int(num_match.group()) if num_match else 0
-                    if "bed" in item:
-                        bedrooms = num
-                    elif "bath" in item:
-                        bathrooms = num
-                    elif "parking" in item or "car" in item: # Sometimes it's "car space"
-                        parking_spaces += num
-            except Exception as e:
-                # Optional: Log parsing errors if needed
-                print(f"\n⚠️ Error parsing features for {listing_url}: {e}")
-                pass
+    def start(self):
+        self.refill_task = asyncio.create_task(self._refill())
+        return self
 
-            property_type = "Other"
-            try:
-                desc_locator = page.locator("div.tm-markdown")
-                # Check if the description element exists before trying to get text
-                if await desc_locator.count() > 0:
-                    desc = await desc_locator.text_content(timeout=10000)
-                    lowered = desc.lower()
-                    for typ in ["Apartment", "Condo", "Co-op", "home", "townhouse", "Cape Cod", "Colonial", 
-                                "Contemporary", "Federal", "Craftsman", "Greek Revival", "Farmhouse", 
-                                "French country", "Mediterranean", "Midcentury modern", "Ranch", 
-                                "Split-level", "Tudor", "Victorian"]:
-                        if typ in lowered:
-                            property_type = typ.capitalize()
-                            break
-            except Exception as e:
-                desc = None # Ensure desc is defined even if extraction fails
-                # Optional: Log parsing errors if needed
-                print(f"\n⚠️ Error parsing description for {listing_url}: {e}")
-                pass
+    async def acquire(self):
+        try:
+            return self.ready.get_nowait()
+        except asyncio.QueueEmpty:
+            return await self.create_context()
+
+    async def close(self):
+        if self.refill_task:
+            self.refill_task.cancel()
+        while not self.ready.empty():
+            await self.ready.get_nowait().close()
+# --- End warm context pool ---
+
+# --- Scraper ---
+class TradeMeScraper:
+    """Scrapes Trade Me listings with its own browser, concurrency limit and counters.
+
+    Usage:
+        async with TradeMeScraper(max_concurrent=5) as scraper:
+            async for listing in scraper.iter_search("rental", start_page=1, max_pages=2):
+                ...
+            async for listing in scraper.iter_listings(urls, "sale"):
+                ...
+
+    Listings are yielded as soon as they are scraped. Pass `browser` to share an
+    already launched Playwright browser; otherwise one is launched on enter.
+    """
 
-            # --- Extract NEW specific fields for Project Brief ---
-            
-            # --- listing_id ---
-            listing_id_match = re.search(r"/listing/(\d+)", listing_url)
-            listing_id = listing_id_match.group(1) if listing_id_match else None
+    def __init__(self, browser=None, *, max_concurrent: int = MAX_CONCURRENT, task_start_delay: float = TASK_START_DELAY,
+                 retries: int = MAX_RETRIES, network_mode: str = None, response_store=None, asset_cache=None,
+                 context_pool_size: int = 0, headless: bool = True, output_dir: str = OUTPUT_DIR,
+                 sale_enrichment: str = "deferred", enrichment_concurrency: int = ENRICHMENT_CONCURRENCY,
+                 enrichment_interval: float = ENRICHMENT_INTERVAL, type_shares: dict = None, egress_pool=None,
+                 watchdog_limits: dict = None, status_interval: float = 0, status_port: int = None, profiler=None,
+                 batch_normalize: bool = False, search_source: str = "dom", sessions=None, scheduler=None):
+        self.browser = browser
+        self.max_concurrent = max_concurrent
+        self.task_start_delay = task_start_delay
+        self.retries = retries
+        self.network_mode = network_mode # None, "record" or "replay"
+        self.response_store = response_store # ResponseStore for --record / --replay
+        self.asset_cache = asset_cache # AssetCache shared by every context of this scraper
+        self.egress_pool = egress_pool # EgressPool assigning a proxy endpoint to each context
+        self.context_pool_size = context_pool_size
+        self.headless = headless
+        self.output_dir = output_dir
+        self.sale_enrichment = sale_enrichment # "deferred", "inline" or "off"
+        self.enrichment_concurrency = enrichment_concurrency
+        self.enrichment_interval = enrichment_interval
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        # Optional per-type caps inside the shared pool, e.g. {"rental": 0.5, "sale": 0.5} of max_concurrent
+        self.type_limits = {
+            listing_type: asyncio.Semaphore(max(1, round(share * max_concurrent)))
+            for listing_type, share in (type_shares or {}).items()
+        }
+        self.enrichment_queue = asyncio.Queue()
+        self._enrichment_workers = []
+        self._enrichment_rate_lock = asyncio.Lock()
+        self._next_enrichment_at = 0.0
+        self.context_pool = None
+        self.failed = [] # URLs that failed after all retries
+        self.collected_urls = {} # listing_type -> every URL seen on search pages, in collection order
+        self.search_exhausted = {} # listing_type -> True once a search from page 1 reached its last page
+        self.search_source = search_source # "payload" (frontend JSON, DOM fallback) or "dom"
+        self.payload_fallback_types = set() # Listing types whose payload missed this run; they read card links instead
+        self.search_cards = {} # listing URL -> card fields from the search payload
+        self.search_totals = {} # listing_type -> result count reported by the search payload
+        self.search_timings = {} # "payload" / "dom" / "dom_fallback" -> deque of seconds per search page
+        self.daemon_jobs_active = 0 # Daemon jobs in flight; per-run state is reset when a job starts on an idle daemon
+        self.scheduler = scheduler # CrawlScheduler ordering each batch of URLs by priority (None = search order)
+        if scheduler is not None:
+            scheduler.cards = self.search_cards # Card fields (list date, premium) feed the priority tiers
+        self.progress = ProgressTracker() # Per-type counters and rolling rate behind the status line / endpoint
+        self.status_interval = status_interval # Seconds between terminal status lines (0 = none)
+        self.status_port = status_port # Local port for GET /status (None = no endpoint)
+        self.status_reporter = None
+        self.profiler = profiler # RunProfiler that samples listings for Playwright tracing (--profile)
+        self.batch_normalize = batch_normalize # Capture raw text only; trademe_normalize parses the whole batch later
+        self._playwright = None
+        self._owns_browser = False
+        # --- Reusable sessions (see trademe_sessions.py) ---
+        self.sessions = sessions # SessionManager with warm storage states; None = every context starts cold
+        self.context_sessions = weakref.WeakKeyDictionary() # listing context -> SessionIdentity it was created from
+        self.search_page_egress = {} # search page -> {"endpoint", "blocked"} until close_search_page() reports it
+        self._session_refreshes = set()
+        self.navigation_samples = {kind: deque(maxlen=MAX_TIMING_SAMPLES) for kind in ("cold", "warm")} # (seconds to listing content, requests)
+        # --- Browser health (see trademe_watchdog.py) ---
+        self.watchdog_limits = watchdog_limits # BrowserWatchdog keyword arguments; None disables the watchdog
+        self.watchdog = None
+        self._browser_ready = asyncio.Event() # Cleared while the browser is being recycled
+        self._browser_ready.set()
+        self._browser_idle = asyncio.Event() # Set when no page is using the browser
+        self._browser_idle.set()
+        self.browser_in_use = 0
+        self.contexts_since_launch = 0
+        self.crashes_since_launch = 0
+        self.browser_recycles = 0
+
+    # --- Lifecycle ---
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Launches the browser (unless one was passed in) and the context pool."""
+        if self.browser is None:
+            self._playwright = await async_playwright().start()
+            self.browser = await self._playwright.chromium.launch(headless=self.headless) # Set headless=False for debugging if needed
+            self._owns_browser = True
+        if self.sessions is not None:
+            warmed = await self.sessions.warm(self.bootstrap_session)
+            print(f"\n🍪 Sessions: {self.sessions.summary()} ({warmed} bootstrapped now)")
+        if self.context_pool_size:
+            self.context_pool = ContextPool(self.create_listing_context, self.context_pool_size).start()
+        if self.watchdog_limits is not None and self._owns_browser:
+            # Only a browser launched here can be relaunched
+            self.watchdog = BrowserWatchdog(self.browser_counters, self.recycle_browser, **self.watchdog_limits).start()
+        if self.status_interval or self.status_port is not None:
+            self.status_reporter = await StatusReporter(self.status, self.status_interval, port=self.status_port).start()
+        return self
+
+    async def close(self):
+        if self.status_reporter is not None:
+            await self.status_reporter.stop()
+            self.status_reporter = None
+        if self.watchdog is not None:
+            await self.watchdog.stop()
+        for task in self._session_refreshes:
+            task.cancel()
+        for worker in self._enrichment_workers:
+            worker.cancel()
+        self._enrichment_workers = []
+        if self.context_pool is not None:
+            await self.context_pool.close()
+            self.context_pool = None
+        if self._owns_browser:
+            await self.browser.close()
+            await self._playwright.stop()
+            self.browser = None
+            self._owns_browser = False
+
+    async def warm_up(self):
+        """Loads one search page so the browser and asset cache are warm before the first job."""
+        context = await self.create_listing_context()
+        try:
+            page = await context.new_page()
+            await page.goto(BASE_URL_RENTAL, timeout=20000)
+            print("\n🔥 Browser warmed up.")
+        except Exception as e:
+            print(f"\n⚠️ Warm-up page load failed (continuing): {e}")
+        finally:
+            await context.close()
+    # --- End lifecycle ---
+
+    # --- Browser recycling ---
+    async def acquire_browser(self):
+        """Marks one page as using the browser, waiting first if the browser is being recycled."""
+        while not self._browser_ready.is_set():
+            await self._browser_ready.wait()
+        self.browser_in_use += 1
+        self._browser_idle.clear()
+
+    def release_browser(self):
+        self.browser_in_use -= 1
+        if self.browser_in_use == 0:
+            self._browser_idle.set()
+
+    @asynccontextmanager
+    async def browser_lease(self):
+        """Holds the browser for one unit of page work so a recycle waits for it to finish."""
+        await self.acquire_browser()
+        try:
+            yield
+        finally:
+            self.release_browser()
 
-            # --- list_date ---
-            list_date_raw = None
-            list_date = None
-            try:
-                list_date_raw = await page.locator("div[class*='tm-property-listing-body__date']").text_content(timeout=10000)
-                if list_date_raw:
-                    list_date = parse_list_date(list_date_raw)
-            except Exception as e:
-                 print(f"\n⚠️ Error extracting or parsing list_date for {listing_url}: {e}")
-                 pass # list_date remains None
+    def browser_counters(self) -> dict:
+        return {"contexts": self.contexts_since_launch, "crashes": self.crashes_since_launch, "in_flight": self.browser_in_use}
+
+    def note_browser_crash(self, *_):
+        """Counts a page crash or a failed new_context towards the watchdog's crash limit."""
+        self.crashes_since_launch += 1
 
-            # --- page_views ---
-            page_views = None
+    async def recycle_browser(self, reason: str):
+        """Stops handing out pages, drains the in-flight ones and relaunches the browser."""
+        print(f"\n♻️ Recycling browser ({reason}); draining {self.browser_in_use} in-flight pages...")
+        self._browser_ready.clear()
+        try:
+            try:
+                await asyncio.wait_for(self._browser_idle.wait(), timeout=RECYCLE_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"\n⚠️ {self.browser_in_use} pages still open after {RECYCLE_DRAIN_TIMEOUT}s; closing the browser anyway.")
+            if self.context_pool is not None:
+                await self.context_pool.close()
             try:
-                page_views_text = await page.locator("div.tm-property-listing__listing-metadata-page-views").text_content(timeout=10000)
-                if page_views_text:
-                    # Extract the number using regex
-                    views_match = re.search(r"(\d+)", page_views_text)
-                    page_views = int(views_match.group(1)) if views_match else None
+                await self.browser.close()
             except Exception as e:
-                 print(f"\n⚠️ Error extracting page_views for {listing_url}: {e}")
-                 pass # page_views remains None
-
-            # --- status ---
-            # As requested, hardcode to "active" for now.
-            # Future implementation would need to detect "sold", "withdrawn", "inactive"
-            status = "active" # Default status
+                print(f"\n⚠️ Closing the old browser failed (it may have crashed): {e}")
+            self.browser = await self._playwright.chromium.launch(headless=self.headless)
+            self.contexts_since_launch = 0
+            self.crashes_since_launch = 0
+            self.browser_recycles += 1
+            if self.context_pool_size:
+                self.context_pool = ContextPool(self.create_listing_context, self.context_pool_size).start()
+            print(f"\n♻️ Browser relaunched (recycle #{self.browser_recycles}).")
+        finally:
+            self._browser_ready.set() # Waiters get errors from a failed relaunch instead of hanging
+    # --- End browser recycling ---
+
+    # --- Network routing and delays ---
+    async def install_network_routes(self, target):
+        """Installs request routing on a browser context (or page): record/replay, or the shared static asset cache."""
+        if self.network_mode == "record":
+            await target.route("**/*", self.response_store.record_route)
+        elif self.network_mode == "replay":
+            await target.route("**/*", self.response_store.replay_route)
+        elif self.asset_cache is not None:
+            # Only static asset URLs are routed, so documents and XHR keep going straight to the network
+            await target.route(STATIC_ASSET_URL_PATTERN, self.asset_cache.route)
+
+    async def polite_sleep(self, low: float, high: float):
+        """Random politeness delay; skipped when replaying since no request reaches Trade Me."""
+        if self.network_mode == "replay":
+            return
+        await asyncio.sleep(random.uniform(low, high))
+
+    async def task_start_pause(self):
+        """Staggers task starts to be more human-like; skipped when replaying."""
+        if self.network_mode != "replay":
+            await asyncio.sleep(self.task_start_delay)
+    # --- End network routing ---
+
+    # --- Listing contexts ---
+    async def create_listing_context(self, endpoint=None, cold: bool = False):
+        """Creates a browser context with the active request routing and the egress endpoint's proxy.
+
+        With sessions, the context starts from a warm identity's storage state and headers
+        (unless `cold`); otherwise headers are randomized and the context starts empty.
+        """
+        identity = self.sessions.pick() if self.sessions is not None and not cold else None
+        if identity is not None:
+            user_agent = identity.user_agent
+            extra_headers = identity.headers.copy()
+        else:
+            user_agent = random.choice(USER_AGENTS)
+            extra_headers = random.choice(HEADERS_LIST).copy()
+        extra_headers["user-agent"] = user_agent
 
-            # --- suburb, city, region from URL ---
-            suburb = city = region = None
+        try:
+            context = await self.browser.new_context(
+                user_agent=user_agent,
+                extra_http_headers=extra_headers,
+                proxy=endpoint.playwright_proxy() if endpoint is not None else None,
+                storage_state=identity.state_path if identity is not None else None,
+                **CONTEXT_OPTIONS,
+            )
+        except Exception:
+            self.note_browser_crash()
+            raise
+        self.contexts_since_launch += 1
+        context.on("page", lambda page: page.on("crash", self.note_browser_crash))
+        await self.install_network_routes(context)
+        if identity is not None:
+            self.context_sessions[context] = identity
+        return context
+
+    async def new_listing_context(self, endpoint=None):
+        """Returns a listing context, from the warm pool when one is running (pooled contexts have no egress endpoint).
+
+        With sessions, a small sample of listings gets a cold context as the comparison baseline.
+        """
+        cold = self.sessions is not None and self.sessions.use_cold()
+        if self.context_pool is not None and endpoint is None and not cold:
+            return await self.context_pool.acquire()
+        return await self.create_listing_context(endpoint, cold=cold)
+
+    async def close_listing_context(self, context, blocked: bool = False):
+        """Closes a listing context and reports the outcome to its session identity, refreshing it if needed."""
+        identity = self.context_sessions.pop(context, None)
+        await context.close()
+        if identity is None:
+            return
+        reason = self.sessions.report(identity, blocked)
+        if reason is not None:
+            task = asyncio.create_task(self.refresh_session(identity, reason))
+            self._session_refreshes.add(task)
+            task.add_done_callback(self._session_refreshes.discard)
+
+    async def acquire_egress(self):
+        """Waits for an egress endpoint within its rate budget, or returns None when no pool is configured."""
+        if self.egress_pool is None:
+            return None
+        return await self.egress_pool.acquire()
+
+    async def new_search_page(self):
+        """Opens a page for search results, through an egress endpoint when a pool is configured.
+
+        The page holds the browser until it is passed to close_search_page().
+        """
+        await self.acquire_browser()
+        try:
+            endpoint = await self.acquire_egress()
+            if endpoint is None:
+                try:
+                    page = await self.browser.new_page()
+                except Exception:
+                    self.note_browser_crash()
+                    raise
+                self.contexts_since_launch += 1
+                page.on("crash", self.note_browser_crash)
+                await self.install_network_routes(page)
+                return page
+            context = None
+            try:
+                # Cold: a session identity is only picked (and counted as used) for listing contexts, which report back
+                context = await self.create_listing_context(endpoint, cold=True)
+                page = await context.new_page()
+            except Exception:
+                self.egress_pool.report(endpoint, ok=False)
+                if context is not None:
+                    await context.close()
+                raise
+            # The endpoint stays in flight until close_search_page() reports how the pages went
+            egress = self.search_page_egress[page] = {"endpoint": endpoint, "blocked": False}
+
+            def on_response(response):
+                if response.status in BLOCK_STATUSES and response.request.is_navigation_request():
+                    egress["blocked"] = True
+
+            page.on("response", on_response)
+            return page
+        except BaseException:
+            self.release_browser()
+            raise
+
+    async def close_search_page(self, page, ok: bool = True):
+        """Closes a page from new_search_page() and reports its egress outcome (`ok` is False if a page load failed)."""
+        egress = self.search_page_egress.pop(page, None)
+        try:
+            await page.context.close()
+        finally:
+            self.release_browser()
+            if egress is not None:
+                self.egress_pool.report(egress["endpoint"], ok=ok and not egress["blocked"], blocked=egress["blocked"])
+    # --- End listing contexts ---
+
+    # --- Sessions ---
+    async def bootstrap_session(self, identity):
+        """Runs the first-visit bootstrap in a cold context with the identity's headers and saves its storage state."""
+        headers = identity.headers.copy()
+        headers["user-agent"] = identity.user_agent
+        context = await self.browser.new_context(user_agent=identity.user_agent, extra_http_headers=headers, **CONTEXT_OPTIONS)
+        self.contexts_since_launch += 1
+        try:
+            await self.install_network_routes(context)
+            page = await context.new_page()
+            await page.goto(BASE_URL_RENTAL, timeout=20000)
             try:
-                # Parse the path: /a/property/residential/rent|sale/region/city/suburb/listing/...
-                parsed_listing_url = urllib.parse.urlparse(listing_url)
-                path_parts = [p for p in parsed_listing_url.path.split('/') if p] # Remove empty strings
-                # print(f"Debug Path Parts: {path_parts}") # Debug print
-                if len(path_parts) >= 7 and path_parts[3] in ['rent', 'sale']: # Check structure
-                    region = path_parts[4].replace('-', ' ').title() if len(path_parts) > 4 else None
-                    city = path_parts[5].replace('-', ' ').title() if len(path_parts) > 5 else None
-                    suburb = path_parts[6].replace('-', ' ').title() if len(path_parts) > 6 else None
+                consent = page.locator(CONSENT_BUTTON_SELECTOR).first
+                if await consent.count() > 0:
+                    await consent.click(timeout=5000)
             except Exception as e:
-                 print(f"\n⚠️ Error parsing location from URL {listing_url}: {e}")
-                 pass # locations remain None
+                print(f"\n⚠️ Consent click failed while bootstrapping {identity.name}: {e}")
+            try:
+                await page.wait_for_load_state("networkidle", timeout=10000) # Let session-setup requests finish
+            except Exception:
+                pass
+            # Written to a temp file first so contexts opened meanwhile never read a partial state
+            await context.storage_state(path=identity.state_path + ".tmp")
+            os.replace(identity.state_path + ".tmp", identity.state_path)
+        finally:
+            await context.close()
 
-            # --- source_site ---
-            source_site = 'trademe' # Hardcoded as per brief
+    async def refresh_session(self, identity, reason: str):
+        async with self.browser_lease():
+            if await self.sessions.refresh(identity, self.bootstrap_session, reason):
+                print(f"\n🍪 Refreshed session {identity.name} ({reason}).")
+
+    def record_navigation(self, context, seconds: float, requests: int):
+        self.navigation_samples["warm" if context in self.context_sessions else "cold"].append((seconds, requests))
+
+    def navigation_report(self) -> dict:
+        """Time to listing content and requests per listing, warm session contexts vs cold ones."""
+        return {kind: navigation_summary(samples) for kind, samples in self.navigation_samples.items() if samples}
+    # --- End sessions ---
+
+    # --- Progress ---
+    def reset_run_state(self):
+        """Clears per-run collections and counters, so a long-lived daemon doesn't accumulate them across jobs."""
+        self.failed.clear()
+        self.collected_urls.clear()
+        self.search_exhausted.clear()
+        self.search_cards.clear() # Cleared in place: a scheduler holds a reference to it
+        self.search_totals.clear()
+        self.search_timings.clear()
+        self.payload_fallback_types.clear()
+        for samples in self.navigation_samples.values():
+            samples.clear()
+        self.progress = ProgressTracker()
+
+    def forget_urls(self, urls):
+        """Drops per-URL state (failures, collected URLs, search cards) for URLs a finished daemon job handled."""
+        urls = set(urls)
+        if not urls:
+            return
+        self.failed[:] = [url for url in self.failed if url not in urls]
+        for listing_type, collected in self.collected_urls.items():
+            self.collected_urls[listing_type] = [url for url in collected if url not in urls]
+        for url in urls:
+            self.search_cards.pop(url, None)
+
+    async def update_progress(self, listing_type: str, ok: bool):
+        # Only counters here; the status line and endpoint format them on their own schedule
+        self.progress.record(listing_type, ok)
+
+    def status(self) -> dict:
+        """Live progress: per-type counts, rolling rate, ETA, in-flight pages and the concurrency limit."""
+        return self.progress.snapshot(
+            in_flight=self.browser_in_use,
+            max_concurrent=self.max_concurrent,
+            enrichment_queue=self.enrichment_queue.qsize(),
+            browser_recycles=self.browser_recycles,
+        )
+    # --- End progress ---
+
+    # --- Listing scraping ---
+    async def scrape_listing(self, listing_url: str, listing_type: str = None):
+        """Scrapes one listing with retries. Returns the record, or None if every attempt failed."""
+        # Normalize the incoming URL (now also removes query params)
+        listing_url = normalize_trademe_url(listing_url)
+        if listing_type is None:
+            listing_type = listing_type_from_url(listing_url)
+
+        record = None
+        type_limit = self.type_limits.get(listing_type)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.progress.record_retry(listing_type)
+            if type_limit is None:
+                record = await self._scrape_attempt(listing_url, listing_type, attempt)
+            else:
+                async with type_limit: # This type's share of the shared pool
+                    record = await self._scrape_attempt(listing_url, listing_type, attempt)
+            if record is not None:
+                break
+        if record is None:
+            self.failed.append(listing_url)
+        # Update progress counter here, after the listing finishes (success or failure)
+        await self.update_progress(listing_type, record is not None)
+        return record
+
+    async def _scrape_attempt(self, listing_url: str, listing_type: str, attempt: int):
+        """One attempt at a listing in a fresh context. Returns the record, or None on error."""
+        async with self.semaphore, self.browser_lease():
+            endpoint = await self.acquire_egress()
+            context = page = None
+            succeeded = blocked = False
+            load_started = None
+            traced = self.profiler is not None and self.profiler.should_trace()
+            try:
+                # Inside the try, so a context that fails to open counts as a failed attempt (retries, failed list, progress)
+                context = await self.new_listing_context(endpoint)
+                if traced:
+                    await self.profiler.start_trace(context)
+                # Consider adding a slightly longer initial delay if needed
+                await self.polite_sleep(2, 3)
+                page = await context.new_page()
+                requests_made = []
+                page.on("request", requests_made.append)
+                load_started = time.monotonic()
+                response = await page.goto(listing_url, timeout=20000)
+                if response is not None and response.status in BLOCK_STATUSES:
+                    raise BlockedError(f"HTTP {response.status} for {listing_url}")
+                # Wait for a key element that signifies the listing content has loaded
+                # Using a more general selector that should exist on both types
+                await page.wait_for_selector("h1[class*='tm-property-listing-body__location']", timeout=20000)
+                self.record_navigation(context, time.monotonic() - load_started, len(requests_made))
 
-                        # Initialize sale-specific fields
-            cv_nzd = estimate_low_nzd = estimate_high_nzd = None
+                try:
+                    show_more = page.locator("span.tm-property-listing-description__show-more-button-content")
+                    if await show_more.count() > 0:
+                        await show_more.click()
+                        await page.wait_for_timeout(500) # Wait a bit after click
+                except Exception as e:
+                    print(f"\n⚠️ Show More click failed for {listing_url}: {e}")
 
-            if listing_type == "sale":
-                print(f"  -> Attempting to extract data for sale listing ID {listing_id}...")
+                # --- Extract common fields ---
+                address = await page.locator("h1[class*='tm-property-listing-body__location']").text_content(timeout=10000)
+            
+                # --- Extract price based on listing type ---
+                price_text = ""
+                price_locator = page.locator("h2[class*='tm-property-listing-body__price']")
+                if await price_locator.count() > 0:
+                     price_text = await price_locator.text_content(timeout=10000)
+                # print(f"Debug Price Text ({listing_type}): {repr(price_text)}") # Debug print
+
+                weekly_rent = None
+                ask_price_nzd = None
+                sale_type = None # For-sale specific
+            
+                if self.batch_normalize:
+                     pass # Kept as price_raw and parsed for the whole batch by normalize_listings
+                elif listing_type == "rental":
+                     # --- Rental Price Parsing ---
+                     # Basic extraction of numeric part
+                     weekly_rent = parse_rent_price(price_text)
+                     # TODO: Determine rent period if needed (weekly assumed for now based on field name)
+                     # --- End Rental Price Parsing ---
+                elif listing_type == "sale":
+                     # --- Sales Price and Sale Type Parsing ---
+                     sale_type, ask_price_nzd = parse_sale_price(price_text)
+                     # --- End Sales Price and Sale Type Parsing ---
+            
+                bedrooms = bathrooms = parking_spaces = 0 # Using parking_spaces as per schema
+                try:
+                    features = await page.locator("ul.tm-property-listing-attributes__tag-list li").all_inner_texts()
+                    for item in features:
+                        item = item.lower().strip()
+                        num_match = re.search(r"\d+", item)
+                        num = int(num_match.group()) if num_match else 0
+                        if "bed" in item:
+                            bedrooms = num
+                        elif "bath" in item:
+                            bathrooms = num
+                        elif "parking" in item or "car" in item: # Sometimes it's "car space"
+                            parking_spaces += num
+                except Exception as e:
+                    # Optional: Log parsing errors if needed
+                    print(f"\n⚠️ Error parsing features for {listing_url}: {e}")
+                    pass
 
-                # --- Ensure Main Page Load is Complete ---
+                property_type = None if self.batch_normalize else "Other"
+                desc = None
                 try:
-                    await page.wait_for_selector("h1.tm-property-listing-body__location", state='visible', timeout=10000)
-                    print(f"  -> Main listing content loaded for {listing_id}.")
-                except asyncio.TimeoutError:
-                    print(f"  -> Timeout waiting for main listing content for {listing_id}. Proceeding...")
-                # --- End Ensure Load ---
+                    desc_locator = page.locator("div.tm-markdown")
+                    # Check if the description element exists before trying to get text
+                    if await desc_locator.count() > 0:
+                        desc = await desc_locator.text_content(timeout=10000)
+                        if not self.batch_normalize:
+                            property_type = detect_property_type(desc)
+                except Exception as e:
+                    desc = None # Ensure desc is defined even if extraction fails
+                    # Optional: Log parsing errors if needed
+                    print(f"\n⚠️ Error parsing description for {listing_url}: {e}")
+                    pass
+
+                # --- Extract NEW specific fields for Project Brief ---
+            
+                # --- listing_id ---
+                listing_id_match = re.search(r"/listing/(\d+)", listing_url)
+                listing_id = listing_id_match.group(1) if listing_id_match else None
 
-                # --- Scroll to Bottom Gradually to Trigger Dynamic Loading ---
+                # --- list_date ---
+                list_date_raw = None
+                list_date = None
                 try:
-                    print(f"  -> Gradually scrolling to bottom of page for {listing_id}...")
-                    page_height = await page.evaluate("document.body.scrollHeight")
-                    viewport_height = await page.evaluate("window.innerHeight")
-                    scroll_increment = int(viewport_height / 3) # Scroll 1/3 of viewport height each time
-                    scroll_delay_ms = 800 # Wait 0.8 seconds between scrolls
-
-                    current_position = 0
-                    while current_position < page_height:
-                        next_position = min(current_position + scroll_increment, page_height)
-                        await page.evaluate(f"window.scrollTo(0, {next_position});")
-                        current_position = next_position
-                        await page.wait_for_timeout(scroll_delay_ms)
-
-                    print(f"  -> Finished gradual scrolling for {listing_id}.")
-                    # Add a final wait after reaching the bottom to ensure last bits load
-                    await page.wait_for_timeout(2000)
+                    list_date_raw = await page.locator("div[class*='tm-property-listing-body__date']").text_content(timeout=10000)
+                    if list_date_raw and not self.batch_normalize:
+                        list_date = parse_list_date(list_date_raw)
                 except Exception as e:
-                    print(f"  -> Error during gradual scrolling for {listing_id}: {e}. Continuing...")
-                # --- End Gradual Scroll ---
+                     print(f"\n⚠️ Error extracting or parsing list_date for {listing_url}: {e}")
+                     pass # list_date remains None
 
-                # --- Extract Homes Estimate (After Scrolling) ---
+                # --- page_views ---
+                page_views = None
                 try:
-                    print(f"  -> Trying to extract Homes Estimate for listing ID {listing_id} (after scroll)...")
-                    
-                    # --- CORRECTED SELECTOR ---
-                    # Based on user feedback: div.tm-property-homes-pi-banner-homes-estimate__container
-                    # The value is inside a <p class="p-h1"> within this container.
-                    estimate_container_locator = page.locator("div.tm-property-homes-pi-banner-homes-estimate__container-left")
-
-                    if await estimate_container_locator.count() > 0:
-                        print(f"  -> Found Homes Estimate container, waiting for data to populate for {listing_id}...")
-                        # Wait for the container to have text indicating the estimate is loaded (e.g., contains '$')
-                        # Correct way to pass arguments to page.wait_for_function
-                        await page.wait_for_function(
-                            """
-                            (selector) => {
-                                const el = document.querySelector(selector);
-                                return el && el.textContent && (el.textContent.includes('$') || el.textContent.includes('Estimate') || el.textContent.includes('K') || el.textContent.includes('M'));
-                            }
-                            """,
-                            arg="div.tm-property-homes-pi-banner-homes-estimate__container-left", # Pass selector as 'arg'
-                            timeout=15000
-                        )
-                        print(f"  -> Estimate data seems populated for {listing_id}.")
-
-                        # Extract text from the specific <p class="p-h1"> inside the container
-                        # The structure is: div.container > div.left > div.title-updated-group > p.p-h1
-                        # Or simpler: div.container > ... > p.p-h1
-                        # Let's target the P tag directly within the container if possible, or fallback.
-                        estimate_value_locator = page.locator("div.tm-property-homes-pi-banner-homes-estimate__container-left p.p-h1")
-                        estimate_text = ""
-                        if await estimate_value_locator.count() > 0:
-                            estimate_text = await estimate_value_locator.text_content(timeout=5000)
-                        else:
-                            # Fallback to container text if P tag selector fails
-                            print(f"  -> P tag for estimate not found directly, trying container text for {listing_id}...")
-                            estimate_text = await estimate_container_locator.text_content(timeout=5000)
-
-                        estimate_text = estimate_text.strip() if estimate_text else ""
-
-                        if estimate_text:
-                            print(f"  -> Estimate text found: '{estimate_text}' for listing ID {listing_id}")
-                            # Pattern like "$1,425,000 - $1,575,000" or "$325K - $365K" or "$1.03M - $1.16M"
-                            range_match = re.search(r"\$([0-9,.KkMm]+)\s*[-–—]\s*\$([0-9,.KkMm]+)", estimate_text)
-                            if range_match:
-                                low_str, high_str = range_match.groups()
-                                def parse_estimate_value(val_str):
-                                    val_str = val_str.upper().replace(',', '')
-                                    if val_str.endswith('K'):
-                                        return str(int(float(val_str[:-1]) * 1000))
-                                    elif val_str.endswith('M'):
-                                        return str(int(float(val_str[:-1]) * 1000000))
-                                    else:
-                                        return val_str
-                                estimate_low_nzd = parse_estimate_value(low_str)
-                                estimate_high_nzd = parse_estimate_value(high_str)
-                                print(f"  -> Successfully extracted Estimates: Low={estimate_low_nzd}, High={estimate_high_nzd} for listing ID {listing_id}")
-                            else:
-                                print(f"  -> Estimate text found but couldn't parse range for listing ID {listing_id}")
-                        else:
-                            print(f"  -> Estimate container found and waited, but text content is still empty for listing ID {listing_id}")
-                    else:
-                        print(f"  -> Homes Estimate container (div.tm-property-homes-pi-banner-homes-estimate__container) NOT found for listing ID {listing_id}")
-                        # --- Debug: Save HTML if estimate container is not found ---
-                        # try:
-                        #     debug_filename_no_est = f"{OUTPUT_DIR}/debug_sale_no_estimate_corrected_{listing_id}.html"
-                        #     with open(debug_filename_no_est, 'w', encoding='utf-8') as f:
-                        #         f.write(await page.content())
-                        #     print(f"  -> Debug HTML (no estimate corrected) saved to {debug_filename_no_est}")
-                        # except Exception as e:
-                        #     print(f"  -> Failed to save debug HTML (no estimate corrected): {e}")
-                        # --- End Debug ---
-                except asyncio.TimeoutError:
-                    print(f"  -> Timeout (15s) waiting for estimate data to populate for listing ID {listing_id} (after scroll).")
-                    # --- Debug: Save HTML on timeout ---
-                    # try:
-                    #     debug_filename_est_timeout = f"{OUTPUT_DIR}/debug_sale_estimate_timeout_corrected_{listing_id}.html"
-                    #     with open(debug_filename_est_timeout, 'w', encoding='utf-8') as f:
-                    #         f.write(await page.content())
-                    #     print(f"  -> Debug HTML (estimate timeout corrected) saved to {debug_filename_est_timeout}")
-                    # except Exception as e:
-                    #     print(f"  -> Failed to save debug HTML (estimate timeout corrected): {e}")
-                    # --- End Debug ---
+                    page_views_text = await page.locator("div.tm-property-listing__listing-metadata-page-views").text_content(timeout=10000)
+                    if page_views_text:
+                        # Extract the number using regex
+                        views_match = re.search(r"(\d+)", page_views_text)
+                        page_views = int(views_match.group(1)) if views_match else None
                 except Exception as e:
-                    print(f"\n⚠️ Error during Homes Estimate extraction for {listing_url} (after scroll): {e}")
-                    # --- Debug: Save HTML on general error ---
-                    # try:
-                    #     debug_filename_est_error = f"{OUTPUT_DIR}/debug_sale_estimate_error_general_corrected_{listing_id}.html"
-                    #     with open(debug_filename_est_error, 'w', encoding='utf-8') as f:
-                    #         f.write(await page.content())
-                    #     print(f"  -> Debug HTML (estimate general error corrected) saved to {debug_filename_est_error}")
-                    # except Exception as e:
-                    #     print(f"  -> Failed to save debug HTML (estimate general error corrected): {e}")
-                    # --- End Debug ---
-                # --- End Homes Estimate ---
+                     print(f"\n⚠️ Error extracting page_views for {listing_url}: {e}")
+                     pass # page_views remains None
 
-                # --- Extract Capital Value (After Scrolling) ---
+                # --- status ---
+                # A listing being scraped is on the site; with --history the final CSV gets the
+                # status derived from search results (withdrawn / removed) instead.
+                status = "active"
+
+                # --- suburb, city, region from URL ---
+                suburb = city = region = None
                 try:
-                    print(f"  -> Trying to extract Capital Value for listing ID {listing_id} (after scroll)...")
-                    
-                    # 1. Find and click the 'Capital value' tab link
-                    # The tab link text is likely 'Capital value'
-                    cv_tab = page.locator("a.o-tabs__tab-link:has-text('Capital value')")
-
-                    if await cv_tab.count() > 0 and await cv_tab.is_visible():
-                        print(f"  -> Found 'Capital value' tab, clicking for listing ID {listing_id}...")
-                        await cv_tab.click()
-
-                        # 2. Wait a moment for the tab switch animation/content start
-                        await page.wait_for_timeout(1500) # Increased wait slightly
-
-                        # 3. Locate the container for the CV data using the CORRECTED SELECTOR
-                        # Based on user feedback: div.tm-property-homes-pi-banner-capital-value__content
-                        # The value is inside a <p class="p-h1"> within a <div class="title-updated-group"> inside this content div.
-                        cv_content_locator = page.locator("div.tm-property-homes-pi-banner-capital-value__content")
-
-                        if await cv_content_locator.count() > 0:
-                            print(f"  -> Found CV content container, waiting for data to populate for {listing_id}...")
-                            # Wait for the content container to have text indicating the CV is loaded (e.g., contains '$')
-                            # Correct way to pass arguments to page.wait_for_function
-                            await page.wait_for_function(
-                                """
-                                (selector) => {
-                                    const el = document.querySelector(selector);
-                                    return el && el.textContent && (el.textContent.includes('$') || el.textContent.includes('Capital Value'));
-                                }
-                                """,
-                                arg="div.tm-property-homes-pi-banner-capital-value__content", # Pass selector as 'arg'
-                                timeout=15000
-                            )
-                            print(f"  -> CV data seems populated for {listing_id}.")
-
-                            # 4. Extract the text content (from the specific P tag inside the title-updated-group)
-                            # Target: div.content > div.title-updated-group > p.p-h1
-                            cv_value_locator = page.locator("div.tm-property-homes-pi-banner-capital-value__content div.tm-property-homes-pi-banner-capital-value__title-updated-group p.p-h1")
-                            cv_text = ""
-                            if await cv_value_locator.count() > 0:
-                                cv_text = await cv_value_locator.text_content(timeout=5000)
-                            else:
-                                # Fallback to the content div text if specific P tag not found
-                                print(f"  -> Specific P tag for CV not found, trying content div text for {listing_id}...")
-                                cv_text = await cv_content_locator.text_content(timeout=5000)
-
-                            cv_text = cv_text.strip() if cv_text else ""
-
-                            if cv_text:
-                                print(f"  -> CV text found: '{cv_text}' for listing ID {listing_id}")
-                                # Extract numeric part, handling '$' and commas
-                                cv_match = re.search(r"\$([0-9,]+)", cv_text)
-                                if cv_match:
-                                    cv_nzd = cv_match.group(1).replace(",", "")
-                                    print(f"  -> Successfully extracted CV: {cv_nzd} for listing ID {listing_id}")
-                                else:
-                                    print(f"  -> CV text found but couldn't extract numeric value for listing ID {listing_id}")
-                            else:
-                                print(f"  -> CV content container found, clicked, waited, but text is empty for listing ID {listing_id}")
-                        else:
-                            print(f"  -> CV content container (div.tm-property-homes-pi-banner-capital-value__content) NOT found after clicking tab for listing ID {listing_id}")
-                            # --- Debug: Save HTML if CV container is not found after click ---
-                            # try:
-                            #     debug_filename_no_cv_cont = f"{OUTPUT_DIR}/debug_sale_no_cv_container_corrected_{listing_id}.html"
-                            #     with open(debug_filename_no_cv_cont, 'w', encoding='utf-8') as f:
-                            #         f.write(await page.content())
-                            #     print(f"  -> Debug HTML (no CV container corrected) saved to {debug_filename_no_cv_cont}")
-                            # except Exception as e:
-                            #     print(f"  -> Failed to save debug HTML (no CV container corrected): {e}")
-                            # --- End Debug ---
-                    else:
-                        print(f"  -> 'Capital value' tab link NOT found or not visible for listing ID {listing_id}")
-                        # --- Debug: Save HTML if CV tab is not found ---
-                        # try:
-                        #     debug_filename_no_cv_tab = f"{OUTPUT_DIR}/debug_sale_no_cv_tab_corrected_{listing_id}.html"
-                        #     with open(debug_filename_no_cv_tab, 'w', encoding='utf-8') as f:
-                        #         f.write(await page.content())
-                        #     print(f"  -> Debug HTML (no CV tab corrected) saved to {debug_filename_no_cv_tab}")
-                        # except Exception as e:
-                        #     print(f"  -> Failed to save debug HTML (no CV tab corrected): {e}")
-                        # --- End Debug ---
-                except asyncio.TimeoutError:
-                   print(f"  -> Timeout (15s) waiting for CV data to populate for listing ID {listing_id} (after scroll).")
-                   # --- Debug: Save HTML on timeout ---
-                   # try:
-                   #     debug_filename_cv_timeout = f"{OUTPUT_DIR}/debug_sale_cv_timeout_corrected_{listing_id}.html"
-                   #     with open(debug_filename_cv_timeout, 'w', encoding='utf-8') as f:
-                   #         f.write(await page.content())
-                   #     print(f"  -> Debug HTML (CV timeout corrected) saved to {debug_filename_cv_timeout}")
-                   # except Exception as e:
-                   #     print(f"  -> Failed to save debug HTML (CV timeout corrected): {e}")
-                   # --- End Debug ---
+                    # Parse the path: /a/property/residential/rent|sale/region/city/suburb/listing/...
+                    parsed_listing_url = urllib.parse.urlparse(listing_url)
+                    path_parts = [p for p in parsed_listing_url.path.split('/') if p] # Remove empty strings
+                    # print(f"Debug Path Parts: {path_parts}") # Debug print
+                    if len(path_parts) >= 7 and path_parts[3] in ['rent', 'sale']: # Check structure
+                        region = path_parts[4].replace('-', ' ').title() if len(path_parts) > 4 else None
+                        city = path_parts[5].replace('-', ' ').title() if len(path_parts) > 5 else None
+                        suburb = path_parts[6].replace('-', ' ').title() if len(path_parts) > 6 else None
                 except Exception as e:
-                    print(f"\n⚠️ Error during Capital Value extraction for {listing_url} (after scroll): {e}")
-                    # --- Debug: Save HTML on general error ---
-                    # try:
-                    #     debug_filename_cv_error = f"{OUTPUT_DIR}/debug_sale_cv_error_general_corrected_{listing_id}.html"
-                    #     with open(debug_filename_cv_error, 'w', encoding='utf-8') as f:
-                    #         f.write(await page.content())
-                    #     print(f"  -> Debug HTML (CV general error corrected) saved to {debug_filename_cv_error}")
-                    # except Exception as e:
-                    #     print(f"  -> Failed to save debug HTML (CV general error corrected): {e}")
-                    # --- End Debug ---
-                # --- End Capital Value ---
+                     print(f"\n⚠️ Error parsing location from URL {listing_url}: {e}")
+                     pass # locations remain None
 
-                print(f"  -> Finished data extraction attempts for sale listing ID {listing_id}. CV: {cv_nzd}, Estimates: Low={estimate_low_nzd}, High={estimate_high_nzd}")
+                # --- source_site ---
+                source_site = 'trademe' # Hardcoded as per brief
 
-           # --- Specific Adjustments ---
+                            # Initialize sale-specific fields
+                cv_nzd = estimate_low_nzd = estimate_high_nzd = None
 
-            # --- Agent Name(s) ---
-            # For rentals: Keep as single string (agent_name)
-            # For sales: Attempt to find multiple agents if possible
-            agent_name = agency_name = None
-            # --- Extract Agent and Agency Names ---
-            # For rentals: Typically one agent.
-            # For sales: Potentially multiple agents using the same locator.
-            agent_names_list = [] # List to hold agent names, especially for sales
-            try:
-                # Use .all() to get a list of locators for all matching elements
-                agent_name_locators = await page.locator("h3.pt-agent-summary__agent-name").all()
-                # print(f"Debug: Found {len(agent_name_locators)} agent name locators for {listing_url}") # Debug print
-                for locator in agent_name_locators:
-                    name_text = await locator.text_content(timeout=5000)
-                    cleaned_name = name_text.strip() if name_text else None
-                    if cleaned_name:
-                        agent_names_list.append(cleaned_name)
-            except Exception as e:
-                print(f"\n⚠️ Error extracting agent names for {listing_url}: {e}")
-                pass # Ignore if agent names cannot be extracted
+                if listing_type == "sale" and self.sale_enrichment == "inline":
+                    cv_nzd, estimate_low_nzd, estimate_high_nzd = await self._extract_sale_enrichment(page, listing_id, listing_url)
 
-            # Set agent_name (singular) and agent_names_final based on listing type
-            if agent_names_list:
-                if listing_type == "rental":
-                    # For rentals, use the first name found as the single agent_name
-                    agent_name = agent_names_list[0]
-                    agent_names_final = agent_name # String for rentals
-                else: # listing_type == "sale"
-                    # For sales, use the list of names
-                    agent_names_final = agent_names_list # List for sales
-            else:
-                # No agents found
-                agent_name = None
-                agent_names_final = None # None for both types if no agents
+               # --- Specific Adjustments ---
 
-            # Extract Agency Name (typically singular)
-            try:
-                agency_name_text = await page.locator("h3.pt-agency-summary__agency-name").text_content(timeout=10000)
-                agency_name = agency_name_text.strip() if agency_name_text else None
-            except Exception as e:
-                 print(f"\n⚠️ Error extracting agency name for {listing_url}: {e}")
-                 pass # Ignore if agency name not found
-            # --- End Agent/Agency Extraction ---
-
-            # --- Extract NEW specific fields for Project Brief ---
-            # ... (rest of the field extractions like listing_id, list_date, etc.) ...
-
-            # --- Specific Adjustments ---
-            # (The agent_names_final is now correctly set above, so the conditional logic
-            # for adding fields to data_entry can remain as previously discussed)
-            # --- End Specific Adjustments ---
-
-            # --- Rental Specific Fields ---
-            # Define defaults, will be overridden/used only if listing_type is 'rental'
-            rent_nzd = weekly_rent # Use the value extracted for rentals
-            rent_period = "weekly" if rent_nzd else None # Assuming weekly based on field name and typical NZ rental ads
-            # furnished, pets_allowed, available_date, property_id are not scraped, keep as None
-
-            # --- Sales Specific Fields ---
-            # Define defaults, values already extracted above for sales
-            # sale_type, ask_price_nzd, cv_nzd, estimate_low_nzd, estimate_high_nzd are already set
-
-            # --- End Specific Adjustments ---
-
-            # --- Append data to the global list with NEW structure ---
-            # Aligning closely with the Project Brief schema, conditionally including fields
-            data_entry = {
-                # --- Core Fields (Common) ---
-                "listing_id": listing_id,
-                "list_date": list_date, # Formatted dd/mm/yyyy
-                "status": status, # Currently hardcoded 'active'
-                "address": address.strip() if address else None, # Full address/location string
-                "suburb": suburb, # Parsed from URL
-                "city": city, # Parsed from URL
-                "region": region, # Parsed from URL (e.g., Bay Of Plenty)
-                "agency_name": agency_name.strip() if agency_name else None,
-                # "agency_ref": None, # Explicitly omitted as requested
-                # Use the potentially type-specific agent name field
-                # "agent_name": agent_name.strip() if agent_name else None, # Old single agent field
-                # Use the new potentially multi-agent field, name based on schema (agent_names vs agent_name)
-                # The schema suggests 'agent_names' for sales and 'agent_name' for rentals.
-                # We can use a conditional key or a single key that handles both.
-                # Option 1: Conditional key name (more explicit for schema)
-                # **("agent_names" if listing_type == "sale" else "agent_name"): agent_names_final,**
-                # Option 2: Single key name (simpler data handling, relies on value type/list content)
-                "agent_name": agent_names_final, # This will be a string for rental, list or None for sale
-                # --- Property Details (Common) ---
-                "property_type": property_type,
-                "bedrooms": bedrooms,
-                "bathrooms": bathrooms,
-                "parking_spaces": parking_spaces, # Mapped from parking
-                # --- Source (Common) ---
-                "source_site": source_site, # Hardcoded 'trademe'
-                # --- Metadata (Common) ---
-                "URL": listing_url, # Normalized URL
-                "Scraped At": datetime.now(timezone(timedelta(hours=12))).astimezone(timezone.utc).isoformat(), # Updated from utcnow
-                "Full Description": desc, # Full description text
-                "Page Views": page_views, # Extracted number
-            }
+                # --- Agent Name(s) ---
+                # For rentals: Keep as single string (agent_name)
+                # For sales: Attempt to find multiple agents if possible
+                agent_name = agency_name = None
+                # --- Extract Agent and Agency Names ---
+                # For rentals: Typically one agent.
+                # For sales: Potentially multiple agents using the same locator.
+                agent_names_list = [] # List to hold agent names, especially for sales
+                try:
+                    # Use .all() to get a list of locators for all matching elements
+                    agent_name_locators = await page.locator("h3.pt-agent-summary__agent-name").all()
+                    # print(f"Debug: Found {len(agent_name_locators)} agent name locators for {listing_url}") # Debug print
+                    for locator in agent_name_locators:
+                        name_text = await locator.text_content(timeout=5000)
+                        cleaned_name = name_text.strip() if name_text else None
+                        if cleaned_name:
+                            agent_names_list.append(cleaned_name)
+                except Exception as e:
+                    print(f"\n⚠️ Error extracting agent names for {listing_url}: {e}")
+                    pass # Ignore if agent names cannot be extracted
+
+                # Set agent_name (singular) and agent_names_final based on listing type
+                if agent_names_list:
+                    if listing_type == "rental":
+                        # For rentals, use the first name found as the single agent_name
+                        agent_name = agent_names_list[0]
+                        agent_names_final = agent_name # String for rentals
+                    else: # listing_type == "sale"
+                        # For sales, use the list of names
+                        agent_names_final = agent_names_list # List for sales
+                else:
+                    # No agents found
+                    agent_name = None
+                    agent_names_final = None # None for both types if no agents
 
-            # --- Conditionally Add Type-Specific Fields ---
-            if listing_type == "rental":
-                # Add Rental-Specific fields (exclude sales features)
-                data_entry.update({
-                    "rent_nzd": rent_nzd, # Assuming weekly rent for rentals
-                    "rent_period": rent_period, # Inferred or assumed
-                    # Note: As per point 3, features like furnished, pets_allowed, available_date, property_id,
-                    # sale_type, ask_price_nzd, cv_nzd, estimate_low_nzd, estimate_high_nzd are omitted for rentals.
-                    # They are not added to the data_entry dictionary for rentals.
-                })
-            elif listing_type == "sale":
-                 # Add Sales-Specific fields (exclude rental features)
-                 data_entry.update({
-                     # Note: As per point 2, features like rent_nzd, rent_period, furnished, pets_allowed,
-                     # available_date, property_id are omitted for sales.
-                     "sale_type": sale_type, # Parsed (Auction/Tender/Deadline Sale/Price by Negotiation/Fixed Price)
-                     "ask_price_nzd": ask_price_nzd, # Parsed for sales
-                     "cv_nzd": cv_nzd, # Capital Value, requires tab click
-                     "estimate_low_nzd": estimate_low_nzd, # Parsed range low
-                     "estimate_high_nzd": estimate_high_nzd, # Parsed range high
-                 })
-            # --- End Conditionally Adding Fields ---
-
-            DATA.append(data_entry)
-            # --- End appending data ---
-
-            print(f"\n✅ Scraped ({listing_type}): {address[:50]}... (ID: {listing_id})") # Print first 50 chars of address and ID
+                # Extract Agency Name (typically singular)
+                try:
+                    agency_name_text = await page.locator("h3.pt-agency-summary__agency-name").text_content(timeout=10000)
+                    agency_name = agency_name_text.strip() if agency_name_text else None
+                except Exception as e:
+                     print(f"\n⚠️ Error extracting agency name for {listing_url}: {e}")
+                     pass # Ignore if agency name not found
+                # --- End Agent/Agency Extraction ---
+
+                # --- Extract NEW specific fields for Project Brief ---
+                # ... (rest of the field extractions like listing_id, list_date, etc.) ...
+
+                # --- Specific Adjustments ---
+                # (The agent_names_final is now correctly set above, so the conditional logic
+                # for adding fields to data_entry can remain as previously discussed)
+                # --- End Specific Adjustments ---
+
+                # --- Rental Specific Fields ---
+                # Define defaults, will be overridden/used only if listing_type is 'rental'
+                rent_nzd = weekly_rent # Use the value extracted for rentals
+                rent_period = "weekly" if rent_nzd else None # Assuming weekly based on field name and typical NZ rental ads
+                # furnished, pets_allowed, available_date, property_id are not scraped, keep as None
+
+                # --- Sales Specific Fields ---
+                # Define defaults, values already extracted above for sales
+                # sale_type, ask_price_nzd, cv_nzd, estimate_low_nzd, estimate_high_nzd are already set
+
+                # --- End Specific Adjustments ---
+
+                # --- Append data to the global list with NEW structure ---
+                # Aligning closely with the Project Brief schema, conditionally including fields
+                data_entry = {
+                    # --- Core Fields (Common) ---
+                    "listing_id": listing_id,
+                    "list_date": list_date, # Formatted dd/mm/yyyy
+                    "status": status, # 'active' here; trademe_history derives withdrawn/removed
+                    "address": address.strip() if address else None, # Full address/location string
+                    "suburb": suburb, # Parsed from URL
+                    "city": city, # Parsed from URL
+                    "region": region, # Parsed from URL (e.g., Bay Of Plenty)
+                    "agency_name": agency_name.strip() if agency_name else None,
+                    # "agency_ref": None, # Explicitly omitted as requested
+                    # Use the potentially type-specific agent name field
+                    # "agent_name": agent_name.strip() if agent_name else None, # Old single agent field
+                    # Use the new potentially multi-agent field, name based on schema (agent_names vs agent_name)
+                    # The schema suggests 'agent_names' for sales and 'agent_name' for rentals.
+                    # We can use a conditional key or a single key that handles both.
+                    # Option 1: Conditional key name (more explicit for schema)
+                    # **("agent_names" if listing_type == "sale" else "agent_name"): agent_names_final,**
+                    # Option 2: Single key name (simpler data handling, relies on value type/list content)
+                    "agent_name": agent_names_final, # This will be a string for rental, list or None for sale
+                    # --- Property Details (Common) ---
+                    "property_type": property_type,
+                    "bedrooms": bedrooms,
+                    "bathrooms": bathrooms,
+                    "parking_spaces": parking_spaces, # Mapped from parking
+                    # --- Source (Common) ---
+                    "source_site": source_site, # Hardcoded 'trademe'
+                    # --- Metadata (Common) ---
+                    "URL": listing_url, # Normalized URL
+                    "Scraped At": datetime.now(timezone(timedelta(hours=12))).astimezone(timezone.utc).isoformat(), # Updated from utcnow
+                    "Full Description": desc, # Full description text
+                    "Page Views": page_views, # Extracted number
+                }
+
+                if self.batch_normalize:
+                    data_entry.update({"price_raw": price_text, "list_date_raw": list_date_raw})
+
+                # --- Conditionally Add Type-Specific Fields ---
+                if listing_type == "rental":
+                    # Add Rental-Specific fields (exclude sales features)
+                    data_entry.update({
+                        "rent_nzd": rent_nzd, # Assuming weekly rent for rentals
+                        "rent_period": rent_period, # Inferred or assumed
+                        # Note: As per point 3, features like furnished, pets_allowed, available_date, property_id,
+                        # sale_type, ask_price_nzd, cv_nzd, estimate_low_nzd, estimate_high_nzd are omitted for rentals.
+                        # They are not added to the data_entry dictionary for rentals.
+                    })
+                elif listing_type == "sale":
+                     # Add Sales-Specific fields (exclude rental features)
+                     data_entry.update({
+                         # Note: As per point 2, features like rent_nzd, rent_period, furnished, pets_allowed,
+                         # available_date, property_id are omitted for sales.
+                         "sale_type": sale_type, # Parsed (Auction/Tender/Deadline Sale/Price by Negotiation/Fixed Price)
+                         "ask_price_nzd": ask_price_nzd, # Parsed for sales
+                         "cv_nzd": cv_nzd, # Capital Value, requires tab click
+                         "estimate_low_nzd": estimate_low_nzd, # Parsed range low
+                         "estimate_high_nzd": estimate_high_nzd, # Parsed range high
+                     })
+                     if self.sale_enrichment == "deferred":
+                         data_entry["enrichment_status"] = "pending" # Filled in later by the enrichment pass
+                # --- End Conditionally Adding Fields ---
+
+                print(f"\n✅ Scraped ({listing_type}): {address[:50]}... (ID: {listing_id})") # Print first 50 chars of address and ID
+                succeeded = True
+                return data_entry
 
-        except Exception as e:
-            if retry > 0:
-                print(f"\n🔁 Retry {3 - retry} failed for {listing_url}: {e}")
-                await page.close()
-                await context.close()
-                await scrape_listing(browser, listing_url, retry=retry - 1)
-                # Update progress even on retry attempts if you want to count attempts
-                # await update_progress()
-                return
-            else:
+            except Exception as e:
+                blocked = isinstance(e, BlockedError)
+                if attempt < self.retries:
+                    print(f"\n🔁 Retry {attempt + 1} failed for {listing_url}: {e}")
+                    return None
                 print(f"\n❌ Failed after retries: {listing_url} - Error: {e}")
+                if page is None:
+                    return None
                 # --- Enhanced Failure Logging ---
                 try:
                     # Check if the page content indicates a blocking issue
                     content = await page.content()
                     if "requires javascript" in content.lower() or "upgrade your browser" in content.lower():
+                        blocked = True
                         print(f"   -> Reason: Likely blocked by anti-bot measures (JS required/upgrade browser page).")
                     else:
                         print(f"   -> Reason: Other error during scraping.")
                 except:
                     print(f"   -> Reason: Unknown (could not inspect page content).")
                 # --- End Enhanced Failure Logging ---
-                FAILED.append(listing_url)
                 timestamp = datetime.now(timezone(timedelta(hours=12))).astimezone(timezone.utc).strftime("%Y%m%d_%H%M%S")
                 safe_id = re.sub(r"[^a-zA-Z0-9]", "_", listing_url.split("/")[-1])
                 try:
@@ -716,21 +1034,615 @@ async def scrape_listing(browser, listing_url: str, retry: int = 2):
                         f.write(html)
                 except Exception as screenshot_error:
                      print(f"\n⚠️ Failed to save failure artifacts for {listing_url}: {screenshot_error}")
+                return None
+
+            finally:
+                if page is not None:
+                    await page.close()
+                if context is not None:
+                    if traced:
+                        await self.profiler.stop_trace(context, f"{listing_type}_{listing_url.rstrip('/').rsplit('/', 1)[-1]}_attempt{attempt + 1}")
+                    await self.close_listing_context(context, blocked)
+                if endpoint is not None:
+                    latency = time.monotonic() - load_started if load_started is not None else None
+                    self.egress_pool.report(endpoint, ok=succeeded, latency=latency, blocked=blocked)
+
+    # --- Sale enrichment (scroll, Homes Estimate, Capital Value) ---
+    async def _extract_sale_enrichment(self, page, listing_id, listing_url: str):
+        """Scrolls a loaded sale listing and reads the lazy-loaded estimate and CV. Returns (cv, estimate_low, estimate_high)."""
+        cv_nzd = estimate_low_nzd = estimate_high_nzd = None
+        print(f"  -> Attempting to extract data for sale listing ID {listing_id}...")
+
+        # --- Ensure Main Page Load is Complete ---
+        try:
+            await page.wait_for_selector("h1.tm-property-listing-body__location", state='visible', timeout=10000)
+            print(f"  -> Main listing content loaded for {listing_id}.")
+        except asyncio.TimeoutError:
+            print(f"  -> Timeout waiting for main listing content for {listing_id}. Proceeding...")
+        # --- End Ensure Load ---
+
+        # --- Scroll to Bottom Gradually to Trigger Dynamic Loading ---
+        try:
+            print(f"  -> Gradually scrolling to bottom of page for {listing_id}...")
+            page_height = await page.evaluate("document.body.scrollHeight")
+            viewport_height = await page.evaluate("window.innerHeight")
+            scroll_increment = int(viewport_height / 3) # Scroll 1/3 of viewport height each time
+            scroll_delay_ms = 800 # Wait 0.8 seconds between scrolls
+
+            current_position = 0
+            while current_position < page_height:
+                next_position = min(current_position + scroll_increment, page_height)
+                await page.evaluate(f"window.scrollTo(0, {next_position});")
+                current_position = next_position
+                await page.wait_for_timeout(scroll_delay_ms)
+
+            print(f"  -> Finished gradual scrolling for {listing_id}.")
+            # Add a final wait after reaching the bottom to ensure last bits load
+            await page.wait_for_timeout(2000)
+        except Exception as e:
+            print(f"  -> Error during gradual scrolling for {listing_id}: {e}. Continuing...")
+        # --- End Gradual Scroll ---
 
+        # --- Extract Homes Estimate (After Scrolling) ---
+        try:
+            print(f"  -> Trying to extract Homes Estimate for listing ID {listing_id} (after scroll)...")
+
+            # --- CORRECTED SELECTOR ---
+            # Based on user feedback: div.tm-property-homes-pi-banner-homes-estimate__container
+            # The value is inside a <p class="p-h1"> within this container.
+            estimate_container_locator = page.locator("div.tm-property-homes-pi-banner-homes-estimate__container-left")
+
+            if await estimate_container_locator.count() > 0:
+                print(f"  -> Found Homes Estimate container, waiting for data to populate for {listing_id}...")
+                # Wait for the container to have text indicating the estimate is loaded (e.g., contains '$')
+                # Correct way to pass arguments to page.wait_for_function
+                await page.wait_for_function(
+                    """
+                    (selector) => {
+                        const el = document.querySelector(selector);
+                        return el && el.textContent && (el.textContent.includes('$') || el.textContent.includes('Estimate') || el.textContent.includes('K') || el.textContent.includes('M'));
+                    }
+                    """,
+                    arg="div.tm-property-homes-pi-banner-homes-estimate__container-left", # Pass selector as 'arg'
+                    timeout=15000
+                )
+                print(f"  -> Estimate data seems populated for {listing_id}.")
+
+                # Extract text from the specific <p class="p-h1"> inside the container
+                # The structure is: div.container > div.left > div.title-updated-group > p.p-h1
+                # Or simpler: div.container > ... > p.p-h1
+                # Let's target the P tag directly within the container if possible, or fallback.
+                estimate_value_locator = page.locator("div.tm-property-homes-pi-banner-homes-estimate__container-left p.p-h1")
+                estimate_text = ""
+                if await estimate_value_locator.count() > 0:
+                    estimate_text = await estimate_value_locator.text_content(timeout=5000)
+                else:
+                    # Fallback to container text if P tag selector fails
+                    print(f"  -> P tag for estimate not found directly, trying container text for {listing_id}...")
+                    estimate_text = await estimate_container_locator.text_content(timeout=5000)
+
+                estimate_text = estimate_text.strip() if estimate_text else ""
+
+                if estimate_text:
+                    print(f"  -> Estimate text found: '{estimate_text}' for listing ID {listing_id}")
+                    # Pattern like "$1,425,000 - $1,575,000" or "$325K - $365K" or "$1.03M - $1.16M"
+                    estimate_low_nzd, estimate_high_nzd = parse_estimate_range(estimate_text)
+                    if estimate_low_nzd is not None:
+                        print(f"  -> Successfully extracted Estimates: Low={estimate_low_nzd}, High={estimate_high_nzd} for listing ID {listing_id}")
+                    else:
+                        print(f"  -> Estimate text found but couldn't parse range for listing ID {listing_id}")
+                else:
+                    print(f"  -> Estimate container found and waited, but text content is still empty for listing ID {listing_id}")
+            else:
+                print(f"  -> Homes Estimate container (div.tm-property-homes-pi-banner-homes-estimate__container) NOT found for listing ID {listing_id}")
+                # --- Debug: Save HTML if estimate container is not found ---
+                # try:
+                #     debug_filename_no_est = f"{OUTPUT_DIR}/debug_sale_no_estimate_corrected_{listing_id}.html"
+                #     with open(debug_filename_no_est, 'w', encoding='utf-8') as f:
+                #         f.write(await page.content())
+                #     print(f"  -> Debug HTML (no estimate corrected) saved to {debug_filename_no_est}")
+                # except Exception as e:
+                #     print(f"  -> Failed to save debug HTML (no estimate corrected): {e}")
+                # --- End Debug ---
+        except asyncio.TimeoutError:
+            print(f"  -> Timeout (15s) waiting for estimate data to populate for listing ID {listing_id} (after scroll).")
+            # --- Debug: Save HTML on timeout ---
+            # try:
+            #     debug_filename_est_timeout = f"{OUTPUT_DIR}/debug_sale_estimate_timeout_corrected_{listing_id}.html"
+            #     with open(debug_filename_est_timeout, 'w', encoding='utf-8') as f:
+            #         f.write(await page.content())
+            #     print(f"  -> Debug HTML (estimate timeout corrected) saved to {debug_filename_est_timeout}")
+            # except Exception as e:
+            #     print(f"  -> Failed to save debug HTML (estimate timeout corrected): {e}")
+            # --- End Debug ---
+        except Exception as e:
+            print(f"\n⚠️ Error during Homes Estimate extraction for {listing_url} (after scroll): {e}")
+            # --- Debug: Save HTML on general error ---
+            # try:
+            #     debug_filename_est_error = f"{OUTPUT_DIR}/debug_sale_estimate_error_general_corrected_{listing_id}.html"
+            #     with open(debug_filename_est_error, 'w', encoding='utf-8') as f:
+            #         f.write(await page.content())
+            #     print(f"  -> Debug HTML (estimate general error corrected) saved to {debug_filename_est_error}")
+            # except Exception as e:
+            #     print(f"  -> Failed to save debug HTML (estimate general error corrected): {e}")
+            # --- End Debug ---
+        # --- End Homes Estimate ---
+
+        # --- Extract Capital Value (After Scrolling) ---
+        try:
+            print(f"  -> Trying to extract Capital Value for listing ID {listing_id} (after scroll)...")
+
+            # 1. Find and click the 'Capital value' tab link
+            # The tab link text is likely 'Capital value'
+            cv_tab = page.locator("a.o-tabs__tab-link:has-text('Capital value')")
+
+            if await cv_tab.count() > 0 and await cv_tab.is_visible():
+                print(f"  -> Found 'Capital value' tab, clicking for listing ID {listing_id}...")
+                await cv_tab.click()
+
+                # 2. Wait a moment for the tab switch animation/content start
+                await page.wait_for_timeout(1500) # Increased wait slightly
+
+                # 3. Locate the container for the CV data using the CORRECTED SELECTOR
+                # Based on user feedback: div.tm-property-homes-pi-banner-capital-value__content
+                # The value is inside a <p class="p-h1"> within a <div class="title-updated-group"> inside this content div.
+                cv_content_locator = page.locator("div.tm-property-homes-pi-banner-capital-value__content")
+
+                if await cv_content_locator.count() > 0:
+                    print(f"  -> Found CV content container, waiting for data to populate for {listing_id}...")
+                    # Wait for the content container to have text indicating the CV is loaded (e.g., contains '$')
+                    # Correct way to pass arguments to page.wait_for_function
+                    await page.wait_for_function(
+                        """
+                        (selector) => {
+                            const el = document.querySelector(selector);
+                            return el && el.textContent && (el.textContent.includes('$') || el.textContent.includes('Capital Value'));
+                        }
+                        """,
+                        arg="div.tm-property-homes-pi-banner-capital-value__content", # Pass selector as 'arg'
+                        timeout=15000
+                    )
+                    print(f"  -> CV data seems populated for {listing_id}.")
+
+                    # 4. Extract the text content (from the specific P tag inside the title-updated-group)
+                    # Target: div.content > div.title-updated-group > p.p-h1
+                    cv_value_locator = page.locator("div.tm-property-homes-pi-banner-capital-value__content div.tm-property-homes-pi-banner-capital-value__title-updated-group p.p-h1")
+                    cv_text = ""
+                    if await cv_value_locator.count() > 0:
+                        cv_text = await cv_value_locator.text_content(timeout=5000)
+                    else:
+                        # Fallback to the content div text if specific P tag not found
+                        print(f"  -> Specific P tag for CV not found, trying content div text for {listing_id}...")
+                        cv_text = await cv_content_locator.text_content(timeout=5000)
+
+                    cv_text = cv_text.strip() if cv_text else ""
+
+                    if cv_text:
+                        print(f"  -> CV text found: '{cv_text}' for listing ID {listing_id}")
+                        # Extract numeric part, handling '$' and commas
+                        cv_match = re.search(r"\$([0-9,]+)", cv_text)
+                        if cv_match:
+                            cv_nzd = cv_match.group(1).replace(",", "")
+                            print(f"  -> Successfully extracted CV: {cv_nzd} for listing ID {listing_id}")
+                        else:
+                            print(f"  -> CV text found but couldn't extract numeric value for listing ID {listing_id}")
+                    else:
+                        print(f"  -> CV content container found, clicked, waited, but text is empty for listing ID {listing_id}")
+                else:
+                    print(f"  -> CV content container (div.tm-property-homes-pi-banner-capital-value__content) NOT found after clicking tab for listing ID {listing_id}")
+                    # --- Debug: Save HTML if CV container is not found after click ---
+                    # try:
+                    #     debug_filename_no_cv_cont = f"{OUTPUT_DIR}/debug_sale_no_cv_container_corrected_{listing_id}.html"
+                    #     with open(debug_filename_no_cv_cont, 'w', encoding='utf-8') as f:
+                    #         f.write(await page.content())
+                    #     print(f"  -> Debug HTML (no CV container corrected) saved to {debug_filename_no_cv_cont}")
+                    # except Exception as e:
+                    #     print(f"  -> Failed to save debug HTML (no CV container corrected): {e}")
+                    # --- End Debug ---
+            else:
+                print(f"  -> 'Capital value' tab link NOT found or not visible for listing ID {listing_id}")
+                # --- Debug: Save HTML if CV tab is not found ---
+                # try:
+                #     debug_filename_no_cv_tab = f"{OUTPUT_DIR}/debug_sale_no_cv_tab_corrected_{listing_id}.html"
+                #     with open(debug_filename_no_cv_tab, 'w', encoding='utf-8') as f:
+                #         f.write(await page.content())
+                #     print(f"  -> Debug HTML (no CV tab corrected) saved to {debug_filename_no_cv_tab}")
+                # except Exception as e:
+                #     print(f"  -> Failed to save debug HTML (no CV tab corrected): {e}")
+                # --- End Debug ---
+        except asyncio.TimeoutError:
+           print(f"  -> Timeout (15s) waiting for CV data to populate for listing ID {listing_id} (after scroll).")
+           # --- Debug: Save HTML on timeout ---
+           # try:
+           #     debug_filename_cv_timeout = f"{OUTPUT_DIR}/debug_sale_cv_timeout_corrected_{listing_id}.html"
+           #     with open(debug_filename_cv_timeout, 'w', encoding='utf-8') as f:
+           #         f.write(await page.content())
+           #     print(f"  -> Debug HTML (CV timeout corrected) saved to {debug_filename_cv_timeout}")
+           # except Exception as e:
+           #     print(f"  -> Failed to save debug HTML (CV timeout corrected): {e}")
+           # --- End Debug ---
+        except Exception as e:
+            print(f"\n⚠️ Error during Capital Value extraction for {listing_url} (after scroll): {e}")
+            # --- Debug: Save HTML on general error ---
+            # try:
+            #     debug_filename_cv_error = f"{OUTPUT_DIR}/debug_sale_cv_error_general_corrected_{listing_id}.html"
+            #     with open(debug_filename_cv_error, 'w', encoding='utf-8') as f:
+            #         f.write(await page.content())
+            #     print(f"  -> Debug HTML (CV general error corrected) saved to {debug_filename_cv_error}")
+            # except Exception as e:
+            #     print(f"  -> Failed to save debug HTML (CV general error corrected): {e}")
+            # --- End Debug ---
+        # --- End Capital Value ---
+
+        print(f"  -> Finished data extraction attempts for sale listing ID {listing_id}. CV: {cv_nzd}, Estimates: Low={estimate_low_nzd}, High={estimate_high_nzd}")
+        return cv_nzd, estimate_low_nzd, estimate_high_nzd
+
+    def enqueue_enrichment(self, record, on_enriched=None):
+        """Queues a sale record for the deferred estimate/CV pass. Returns a future resolved when it is done."""
+        if not self._enrichment_workers:
+            self._enrichment_workers = [asyncio.create_task(self._enrichment_worker()) for _ in range(self.enrichment_concurrency)]
+        future = asyncio.get_running_loop().create_future()
+        record["enrichment_status"] = "pending"
+        self.enrichment_queue.put_nowait((record, future, on_enriched))
+        return future
+
+    async def wait_for_enrichment(self):
+        """Waits until every queued sale record has been enriched (or given up on)."""
+        await self.enrichment_queue.join()
+
+    async def _enrichment_rate_limit(self):
+        """Spaces enrichment page loads at least enrichment_interval apart, independently of the core pass."""
+        if self.network_mode == "replay":
+            return
+        loop = asyncio.get_running_loop()
+        async with self._enrichment_rate_lock:
+            wait = self._next_enrichment_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_enrichment_at = loop.time() + self.enrichment_interval
+
+    async def _enrichment_worker(self):
+        while True:
+            record, future, on_enriched = await self.enrichment_queue.get()
+            try:
+                await self._enrich_sale_record(record)
+                if on_enriched is not None:
+                    await on_enriched(record)
+            except Exception as e:
+                print(f"\n⚠️ Unexpected error enriching {record.get('URL')}: {e}")
+            finally:
+                if not future.done():
+                    future.set_result(record)
+                self.enrichment_queue.task_done()
+
+    async def _enrich_sale_record(self, record):
+        """Reloads a sale listing and upserts cv_nzd / estimate_low_nzd / estimate_high_nzd into the record in place."""
+        for attempt in range(ENRICHMENT_RETRIES + 1):
+            await self._enrichment_rate_limit()
+            async with self.browser_lease():
+                if await self._enrich_attempt(record, attempt):
+                    return
+        record["enrichment_status"] = "failed"
+
+    async def _enrich_attempt(self, record, attempt: int) -> bool:
+        """One enrichment attempt in a fresh context. Returns True once the record is updated."""
+        listing_url = record["URL"]
+        listing_id = record.get("listing_id")
+        endpoint = await self.acquire_egress()
+        context = None
+        succeeded = blocked = False
+        load_started = time.monotonic()
+        try:
+            context = await self.new_listing_context(endpoint) # A failure here is a failed attempt, not an escaped error
+            page = await context.new_page()
+            response = await page.goto(listing_url, timeout=20000)
+            if response is not None and response.status in BLOCK_STATUSES:
+                raise BlockedError(f"HTTP {response.status} for {listing_url}")
+            await page.wait_for_selector("h1[class*='tm-property-listing-body__location']", timeout=20000)
+            cv_nzd, estimate_low_nzd, estimate_high_nzd = await self._extract_sale_enrichment(page, listing_id, listing_url)
+            record.update({
+                "cv_nzd": cv_nzd,
+                "estimate_low_nzd": estimate_low_nzd,
+                "estimate_high_nzd": estimate_high_nzd,
+                "enrichment_status": "done",
+            })
+            succeeded = True
+            return True
+        except Exception as e:
+            blocked = isinstance(e, BlockedError)
+            print(f"\n🔁 Enrichment attempt {attempt + 1} failed for {listing_url}: {e}")
+            return False
         finally:
-            await page.close()
-            await context.close()
-            # Update progress counter here, after the task finishes (success or failure)
-            await update_progress()
-# --- End updated scrape_listing function ---
-
-# --- New function for progress update ---
-async def update_progress():
-    global PROCESSED_COUNT
-    async with PROGRESS_LOCK:
-        PROCESSED_COUNT += 1
-        print(f"\rProgress: {PROCESSED_COUNT}/{TOTAL_LISTINGS_TO_SCRAPE}", end="", flush=True)
-# --- End new function ---
+            if context is not None:
+                await self.close_listing_context(context, blocked)
+            if endpoint is not None:
+                self.egress_pool.report(endpoint, ok=succeeded, latency=time.monotonic() - load_started, blocked=blocked)
+    # --- End sale enrichment ---
+
+    async def iter_listings(self, urls, listing_type: str = None, on_failure=None, on_enriched=None, enrichment_futures=None):
+        """Scrapes `urls` concurrently and yields each record as soon as it is complete.
+
+        Failed URLs are added to self.failed and, if given, passed to the async `on_failure(url)`.
+        With deferred sale enrichment, sale records are yielded after the fast core pass and
+        their estimate/CV fields are filled in place later (`on_enriched(record)` is awaited then).
+        The generator finishes once those are done, unless the caller collects the futures itself
+        by passing an `enrichment_futures` list.
+        """
+        urls = list(urls)
+        if not urls:
+            return
+        if listing_type is not None:
+            self.progress.add_total(listing_type, len(urls))
+        else:
+            for url in urls:
+                self.progress.add_total(listing_type_from_url(normalize_trademe_url(url)), 1)
+        results = asyncio.Queue()
+        tasks = []
+        wait_for_enrichment = enrichment_futures is None
+        if wait_for_enrichment:
+            enrichment_futures = []
+
+        async def run(url):
+            try:
+                record = await self.scrape_listing(url, listing_type)
+            except Exception as e:
+                print(f"\n⚠️ Unexpected error scraping {url}: {e}")
+                record = None
+            if record is not None and record.get("enrichment_status") == "pending":
+                enrichment_futures.append(self.enqueue_enrichment(record, on_enriched))
+            await results.put((url, record))
+
+        async def launch():
+            for i, url in enumerate(urls):
+                # Add a small delay before starting each task (except the first one)
+                if i > 0:
+                    await self.task_start_pause()
+                tasks.append(asyncio.create_task(run(url)))
+
+        launcher = asyncio.create_task(launch())
+        try:
+            for _ in range(len(urls)):
+                url, record = await results.get()
+                if record is not None:
+                    yield record
+                elif on_failure is not None:
+                    await on_failure(url)
+            if wait_for_enrichment and enrichment_futures:
+                print(f"\n⏳ Waiting for {len(enrichment_futures)} sale listings in the enrichment pass...")
+                await asyncio.gather(*enrichment_futures)
+        finally:
+            # The consumer may stop early; don't leave listings running in the background
+            launcher.cancel()
+            for task in tasks:
+                task.cancel()
+    # --- End listing scraping ---
+
+    # --- Search page collection ---
+    async def collect_search_page(self, page, listing_type: str, page_num: int):
+        """Loads one search results page and returns (normalized listing URLs, has_next_page).
+
+        Reads the frontend's search JSON when search_source is "payload", falling back to the card links.
+        """
+        search_url = f"{LISTING_BASE_URLS[listing_type]}?page={page_num}"
+        started = time.perf_counter()
+        source = "dom"
+        if self.search_source == "payload" and listing_type not in self.payload_fallback_types:
+            result = await self._collect_search_payload(page, listing_type, search_url, page_num)
+            if result is not None:
+                self.search_timings.setdefault("payload", deque(maxlen=MAX_TIMING_SAMPLES)).append(time.perf_counter() - started)
+                return result
+            # Selectors that miss once will miss on every page, each time after the full XHR wait
+            print(f"\n⚠️ No usable search payload on {listing_type} page {page_num}; reading {listing_type} card links for the rest of the run.")
+            self.payload_fallback_types.add(listing_type)
+            source = "dom_fallback" # Page is already loaded
+        else:
+            await page.goto(search_url, timeout=20000)
+        # Wait for listings to appear on the search page
+        await page.wait_for_selector(SEARCH_CARD_SELECTOR, timeout=20000)
+
+        premium = await page.locator("a.tm-property-premium-listing-card__link").all()
+        standard = await page.locator("a.tm-property-search-card__link").all()
+
+        page_urls = []
+        for index, el in enumerate(premium + standard):
+            href = await el.get_attribute("href")
+            if href:
+                # Use urljoin for correct URL construction
+                full_url = urljoin("https://www.trademe.co.nz", href) # Use urljoin for robustness
+                page_urls.append(normalize_trademe_url(full_url)) # Apply normalization
+                if index < len(premium): # Premium cards rank above the long tail in the crawl scheduler
+                    self.search_cards.setdefault(page_urls[-1], {})["is_featured"] = True
+
+        next_btn = page.locator(NEXT_BUTTON_SELECTOR)
+        has_next = await next_btn.count() > 0 and await next_btn.is_enabled()
+        self.search_timings.setdefault(source, deque(maxlen=MAX_TIMING_SAMPLES)).append(time.perf_counter() - started)
+        return page_urls, has_next
+
+    async def _collect_search_payload(self, page, listing_type: str, search_url: str, page_num: int):
+        """Loads a search page and reads its results from the embedded state or the search XHR.
+
+        Returns (urls, has_next), or None when neither holds a result set.
+        """
+        api_responses = []
+
+        def on_response(response):
+            if SEARCH_API_URL_PATTERN.search(response.url):
+                api_responses.append(response)
+
+        page.on("response", on_response)
+        try:
+            await page.goto(search_url, timeout=20000)
+            payloads = []
+            state = await page.evaluate("selector => document.querySelector(selector)?.textContent || null", SERVER_STATE_SELECTOR)
+            if state:
+                try:
+                    payloads.append(parse_server_state(state))
+                except ValueError as e:
+                    print(f"\n⚠️ Unreadable search state on {listing_type} page {page_num}: {e}")
+            results = extract_search_results(payloads, page_num)
+            if not results["cards"]:
+                if not api_responses: # Client-rendered page: the search XHR may still be in flight
+                    try:
+                        await page.wait_for_event("response", predicate=lambda r: SEARCH_API_URL_PATTERN.search(r.url) is not None,
+                                                  timeout=SEARCH_PAYLOAD_WAIT * 1000)
+                    except Exception:
+                        pass
+                for response in api_responses:
+                    try:
+                        payloads.append(await response.json())
+                    except Exception:
+                        pass # Not JSON (e.g. a redirect) or body no longer available
+                results = extract_search_results(payloads, page_num)
+        finally:
+            page.remove_listener("response", on_response)
+        if not results["cards"] or any(card["url"] is None for card in results["cards"]):
+            return None # Nothing found, or cards without their own URL: the card links have them all
+
+        page_urls = []
+        for card in results["cards"]:
+            url = normalize_trademe_url(card["url"])
+            self.search_cards[url] = card
+            page_urls.append(url)
+        if results["total_count"] is not None and listing_type not in self.search_totals:
+            self.search_totals[listing_type] = results["total_count"]
+            print(f"\n🔢 Trade Me reports {self.search_totals[listing_type]} {listing_type} listings for this search.")
+        return page_urls, has_next_page(results, page_num)
+
+    def search_timing_summary(self) -> dict:
+        """Per-page search collection latency by source, for comparing payload and DOM harvesting."""
+        summary = {}
+        for source, timings in self.search_timings.items():
+            ordered = sorted(timings)
+            summary[source] = {
+                "pages": len(ordered),
+                "mean_ms": round(1000 * sum(ordered) / len(ordered)),
+                "p50_ms": round(1000 * ordered[len(ordered) // 2]),
+                "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]),
+            }
+        return summary
+
+    async def collect_listing_urls(self, listing_type: str, start_page: int = 1, max_pages: int = 1000):
+        """Collects listing URLs from search pages start_page..max_pages (0 = no limit) without scraping them.
+
+        Like iter_search, a fresh search page is taken per PAGES_PER_BATCH pages, so a browser recycle
+        never has to close a page held for the whole collection. A page that fails is retried once on a fresh page.
+        """
+        urls = {}
+        page_num = start_page  # Initialize with the provided start page, or 1 if not provided
+        self.search_exhausted[listing_type] = False
+        retried_page = None
+        done = False
+        while not done:
+            page = await self.new_search_page()
+            page_ok = True
+            try:
+                for _ in range(PAGES_PER_BATCH):
+                    if max_pages and page_num > max_pages:
+                        print(f"\n📛 Reached max-pages limit ({max_pages}).")
+                        done = True
+                        break
+                    print(f"\n🌐 Fetching {listing_type} search page {page_num}")
+                    await self.polite_sleep(1, 2)
+                    try:
+                        page_urls, has_next = await self.collect_search_page(page, listing_type, page_num)
+                    except Exception as e:
+                        page_ok = False
+                        if retried_page == page_num:
+                            print(f"\n❌ Pagination error on page {page_num} again: {e}. Stopping {listing_type} collection here.")
+                            done = True
+                        else:
+                            print(f"\n⚠️ Pagination error on page {page_num}: {e}. Retrying it on a fresh page.")
+                            retried_page = page_num
+                        break
+                    urls.update(dict.fromkeys(page_urls))
+                    self.collected_urls.setdefault(listing_type, []).extend(page_urls)
+                    if not has_next:
+                        print("\n🏁 No more pages found.")
+                        self.search_exhausted[listing_type] = start_page == 1
+                        done = True
+                        break
+                    page_num += 1
+            finally:
+                await self.close_search_page(page, page_ok)
+        return list(urls)
+
+    async def iter_search(self, listing_type: str, start_page: int = 1, max_pages: int = 1000, skip_urls=None, on_failure=None, on_enriched=None):
+        """Collects search pages in batches of PAGES_PER_BATCH and yields listings as they are scraped.
+
+        `max_pages` is the last page number to fetch (0 = no limit). URLs in `skip_urls`
+        (e.g. already scraped ones from a resume file) are collected but not scraped.
+        Deferred sale enrichment runs alongside collection and is awaited before returning.
+        """
+        scraped_urls = set(skip_urls or ())
+        page_num = start_page
+        batch_number = 1
+        has_next = True
+        enrichment_futures = []
+        self.search_exhausted[listing_type] = False
+        while has_next:
+            if max_pages and page_num > max_pages:
+                print(f"\n📛 Reached --max-pages limit ({max_pages}) for {listing_type}.")
+                break
+
+            # --- Collect URLs for the current batch ---
+            # A fresh search page per batch, so it doesn't hold the browser while the batch is scraped
+            print(f"\n🌐 Collecting {listing_type} URL batch {batch_number} (from page {page_num})...")
+            batch_urls = {} # Ordered set to avoid internal duplicates
+            pages_fetched_in_batch = 0
+            page = await self.new_search_page()
+            page_ok = True
+            try:
+                while pages_fetched_in_batch < PAGES_PER_BATCH and has_next and not (max_pages and page_num > max_pages):
+                    print(f"\n🌐 Fetching {listing_type} search page {page_num} for batch {batch_number}")
+                    await self.polite_sleep(1, 2)
+                    try:
+                        page_urls, has_next = await self.collect_search_page(page, listing_type, page_num)
+                    except Exception as e:
+                        page_ok = False
+                        print(f"\n⚠️ Pagination error on page {page_num} in batch {batch_number} for {listing_type}: {e}")
+                        break # End the batch early; the next batch retries this page
+                    batch_urls.update(dict.fromkeys(page_urls))
+                    self.collected_urls.setdefault(listing_type, []).extend(page_urls)
+                    if not has_next:
+                        print("\n🏁 No more pages found.")
+                        self.search_exhausted[listing_type] = start_page == 1
+                    page_num += 1
+                    pages_fetched_in_batch += 1
+            finally:
+                await self.close_search_page(page, page_ok)
+
+            print(f"\n🔗 Collected {len(batch_urls)} unique {listing_type} URLs in batch {batch_number}.")
+            if not batch_urls:
+                print(f"\nℹ️ No {listing_type} URLs collected in batch {batch_number}. Ending collection.")
+                break # No point continuing if no URLs
+
+            # --- Filter batch URLs against already scraped URLs ---
+            batch_urls_to_scrape = [url for url in batch_urls if url not in scraped_urls]
+            scraped_urls.update(batch_urls_to_scrape)
+            if self.scheduler is not None:
+                batch_urls_to_scrape = self.scheduler.order(batch_urls_to_scrape)
+            print(f"\n🎯 {len(batch_urls_to_scrape)} new {listing_type} URLs in batch {batch_number} to scrape.")
+
+            # --- Scrape the URLs collected in this batch ---
+            async for record in self.iter_listings(batch_urls_to_scrape, listing_type, on_failure=on_failure,
+                                                   on_enriched=on_enriched, enrichment_futures=enrichment_futures):
+                yield record
+            print(f"\n🏁 Completed {listing_type} batch {batch_number}.")
+            batch_number += 1
+        if enrichment_futures:
+            print(f"\n⏳ Waiting for {len(enrichment_futures)} {listing_type} listings in the enrichment pass...")
+            await asyncio.gather(*enrichment_futures)
+    # --- End search page collection ---
+# --- End scraper ---
+
+# --- Search page selectors ---
+SEARCH_CARD_SELECTOR = "a.tm-property-search-card__link, a.tm-property-premium-listing-card__link"
+NEXT_BUTTON_SELECTOR = "a[title='Next'], a.ng-star-inserted:has-text('Next')"
+SERVER_STATE_SELECTOR = "script#frontend-serverState" # Angular transfer state with the server-rendered search results
+SEARCH_API_URL_PATTERN = re.compile(r"/v\d+/search/property/", re.IGNORECASE)
+SEARCH_PAYLOAD_WAIT = 5.0 # Seconds to wait for the search XHR when the page has no embedded results
+SEARCH_SOURCES = ["payload", "dom"]
+# --- End search page selectors ---
 
 # --- New function to save collected URLs ---
 def save_collected_urls(urls_list, listing_type):
@@ -760,93 +1672,457 @@ def load_collected_urls(listing_type):
         print(f"\nℹ️ Collected {listing_type} URLs file {specific_collected_urls_file} not found.")
         return None # Indicate file not found
 
+# --- Record files (csv module; the hot path does not need pandas) ---
+def write_records_csv(path, records):
+    """Writes records as CSV with the columns in first-seen order, like pandas.DataFrame(records).to_csv.
 
-async def collect_listing_urls(page, start_page: int = 1, max_pages: int = 1000): # Default to 1000 or args.max_pages if preferred    urls = set()
-    urls = set()
-    # --- Use the start_page argument and CURRENT_BASE_URL ---
-    page_num = start_page  # Initialize with the provided start page, or 1 if not provided
-    local_base_url = CURRENT_BASE_URL # Use the global current base URL
-    # --- End modification ---
-    while True:
-        if max_pages and page_num > max_pages:
-            print(f"\n📛 Reached max-pages limit ({max_pages}).")
-            break
-        print(f"\n🌐 Fetching search page {page_num} for {local_base_url}")
-        await asyncio.sleep(random.uniform(1, 2))
-        try:
-            search_url = f"{local_base_url}?page={page_num}"
-            await page.goto(search_url, timeout=20000)
-            # Wait for listings to appear on the search page
-            await page.wait_for_selector("a.tm-property-search-card__link, a.tm-property-premium-listing-card__link", timeout=20000)
-
-            premium = await page.locator("a.tm-property-premium-listing-card__link").all()
-            standard = await page.locator("a.tm-property-search-card__link").all()
-
-            for el in premium + standard:
-                href = await el.get_attribute("href")
-                if href:
-                    # Use urljoin for correct URL construction
-                    full_url = urljoin("https://www.trademe.co.nz", href) # Use urljoin for robustness
-                    normalized_url = normalize_trademe_url(full_url) # Apply normalization
-                    urls.add(normalized_url) # Add the normalized URL to the set
-
-            next_btn = page.locator("a[title='Next'], a.ng-star-inserted:has-text('Next')")
-            if await next_btn.count() == 0 or not await next_btn.is_enabled():
-                print("\n🏁 No more pages found.")
-                break
-
-            page_num += 1
-        except Exception as e:
-            print(f"\n⚠️ Pagination error on page {page_num}: {e}")
-            # Decide whether to break or continue based on error type if needed
-            break # For now, break on any pagination error
-
-    return list(urls)
+    Missing values (None) are written as empty cells. Rows are streamed to a temp file that
+    replaces `path` at the end, so a crash mid-save keeps the previous file.
+    """
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(records)
+    os.replace(temp_path, path)
+
+def read_records_csv(path):
+    """Reads a CSV written by write_records_csv (or pandas) back into records; empty cells become None."""
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return [{key: value if value != "" else None for key, value in row.items()} for row in csv.DictReader(f)]
+
+def scraped_last_seen(listing_type):
+    """{listing_id: epoch seconds} for rows earlier runs scraped (final CSV and resume file), from 'Scraped At'.
+
+    The scheduler's fallback when there is no --history: only scraped rows count as seen, not the collected frontier.
+    """
+    last_seen = {}
+    for name in (f"trademe_{listing_type}_listings_final.csv", f"temp_scraped_{listing_type}_data.csv"):
+        path = os.path.join(OUTPUT_DIR, name)
+        if not os.path.exists(path):
+            continue
+        file_time = os.path.getmtime(path)
+        for record in read_records_csv(path):
+            listing_id = listing_id_of(record)
+            if listing_id is None:
+                continue
+            try:
+                seen_at = datetime.fromisoformat(record.get("Scraped At")).timestamp()
+            except (TypeError, ValueError):
+                seen_at = file_time
+            last_seen[listing_id] = max(last_seen.get(listing_id, 0), seen_at)
+    return last_seen
+# --- End record files ---
 
 # --- New function to save data periodically ---
 async def save_chunk(data_chunk, chunk_number, listing_type):
     if not data_chunk:
         print(f"\nℹ️ No data to save for chunk {chunk_number} ({listing_type}).")
         return
-    df_chunk = pd.DataFrame(data_chunk)
     chunk_file = os.path.join(OUTPUT_DIR, f"scraped_{listing_type}_data_chunk_{chunk_number}.csv")
-    df_chunk.to_csv(chunk_file, index=False)
+    write_records_csv(chunk_file, data_chunk)
     print(f"\n💾 Saved chunk {chunk_number} ({listing_type}, {len(data_chunk)} listings) to {chunk_file}")
 
 async def save_temp_data(data_list, listing_type):
     if not data_list:
         print(f"\nℹ️ No temporary {listing_type} data to save.")
         return
-    df_temp = pd.DataFrame(data_list)
     temp_file_for_type = os.path.join(OUTPUT_DIR, f"temp_scraped_{listing_type}_data.csv")
-    df_temp.to_csv(temp_file_for_type, index=False)
+    write_records_csv(temp_file_for_type, data_list)
     print(f"\n💾 Saved temporary {listing_type} data ({len(data_list)} listings) to {temp_file_for_type}")
 # --- End new function ---
 
 # --- New function to load previously saved data ---
 def load_resume_data(listing_type):
-    global DATA
+    """Loads the temp file of a previous run. Returns (records, set of already scraped URLs).
+
+    Values come back as text (None for empty cells); the CSV outputs are written from the same text.
+    """
     resume_file_for_type = os.path.join(OUTPUT_DIR, f"temp_scraped_{listing_type}_data.csv")
     if os.path.exists(resume_file_for_type):
         try:
-            df_resume = pd.read_csv(resume_file_for_type)
-            # Filter data for the current listing type if resuming from a mixed file isn't intended
-            # For now, assuming separate resume files per type
-            DATA = df_resume.to_dict('records')
-            print(f"\n🔄 Resumed from {len(DATA)} previously scraped {listing_type} listings in {resume_file_for_type}.")
-            return set(item['URL'] for item in DATA if item.get('source_site') == 'trademe') # Return URLs already scraped, filter by source if mixed
-            # Or simpler, if files are type-specific: return set(item['URL'] for item in DATA)
+            records = read_records_csv(resume_file_for_type)
+            print(f"\n🔄 Resumed from {len(records)} previously scraped {listing_type} listings in {resume_file_for_type}.")
+            return records, set(item['URL'] for item in records if item.get('source_site') == 'trademe') # Return URLs already scraped, filter by source if mixed
         except Exception as e:
              print(f"\n⚠️ Could not load resume data from {resume_file_for_type}: {e}. Starting fresh.")
-             return set()
+             return [], set()
     else:
         print(f"\n🆕 No previous {listing_type} data found. Starting fresh.")
-        return set()
+        return [], set()
 # --- End new function ---
 
+# --- Listing history ---
+def apply_history(history, records, listing_type, seen_ids, complete):
+    """Records a run's rows in the history, updates statuses, and writes the derived status into the records.
+
+    `seen_ids` are the listing ids found in this run's search results; `complete` says whether
+    the search covered every page, so that missing listings can be marked withdrawn/removed.
+    """
+    counts = history.record_run(records, listing_type)
+    counts.update(history.finish_run(listing_type, seen_ids, complete))
+    if any("status" in record for record in records):
+        statuses = history.statuses(listing_id_of(record) for record in records)
+        for record in records:
+            if "status" in record:
+                record["status"] = statuses.get(listing_id_of(record), record["status"])
+    print(f"\n📈 History ({listing_type}): {counts['changes']} changed fields, {counts['new_listings']} new listings, "
+          f"{counts['withdrawn']} withdrawn, {counts['removed']} removed, {counts['reactivated']} back"
+          + ("" if counts["complete"] else " (partial crawl: missing listings left as they were)"))
+    return counts
+# --- End listing history ---
+
+# --- Agent dimensions ---
+def typed_dimension_ids(final_df):
+    """Agency / agent id columns as nullable integers (pandas would write ids with NaNs as '3.0')."""
+    import pandas as pd # Only the --batch-normalize export builds a DataFrame
+    for column in DIMENSION_ID_COLUMNS:
+        if column in final_df.columns and final_df[column].dtype != "Int64":
+            final_df[column] = pd.to_numeric(final_df[column], errors="coerce").round().astype("Int64")
+    return final_df
+# --- End agent dimensions ---
+
+# --- Final export ---
+def export_final(scraper, records, listing_type, description_store=None, history=None, seen_ids=None, complete=False,
+                 dimensions=None):
+    """Writes trademe_<type>_listings_final.csv and returns (path, summary fields).
+
+    Records are streamed through the csv module. pandas (and NumPy) are imported only for
+    --batch-normalize, which types the whole dataset at once.
+    """
+    summary = {}
+    final_output_file = os.path.join(OUTPUT_DIR, f"trademe_{listing_type}_listings_final.csv")
+    if not scraper.batch_normalize:
+        if history is not None:
+            summary["history"] = apply_history(history, records, listing_type, seen_ids, complete)
+        write_records_csv(final_output_file, records)
+        return final_output_file, summary
+
+    import pandas as pd
+    from trademe_normalize import normalize_listings
+    normalize_started = time.monotonic()
+    final_df = normalize_listings(records, listing_type, description_store)
+    summary["normalize_s"] = round(time.monotonic() - normalize_started, 3)
+    print(f"\n🧮 Normalized {len(final_df)} {listing_type} rows in {summary['normalize_s']}s")
+    if dimensions is not None:
+        typed_dimension_ids(final_df)
+    if history is not None:
+        rows = final_df.to_dict("records") # History compares the typed prices
+        summary["history"] = apply_history(history, rows, listing_type, seen_ids, complete)
+        if "status" in final_df.columns:
+            status = pd.Series([row["status"] for row in rows], index=final_df.index)
+            final_df["status"] = status.astype("category") if isinstance(final_df["status"].dtype, pd.CategoricalDtype) else status
+    final_df.to_csv(final_output_file, index=False)
+    return final_output_file, summary
+# --- End final export ---
+
+# --- Daemon job runner ---
+async def run_daemon_job(scraper, job: dict, emit):
+    """Runs one daemon job and emits an event per finished listing.
+
+    Job spec: {"urls": [...], "listing_type": optional} or
+    {"listing_type": "rental"|"sale", "start_page": 1, "end_page": 3}.
+    A job starting on an idle daemon resets the scraper's per-run state, and every job
+    forgets the URLs it handled when it ends, so the daemon's memory doesn't grow with each job.
+    """
+    listing_type = job.get("listing_type")
+    if listing_type is not None and listing_type not in LISTING_BASE_URLS:
+        raise ValueError(f"unknown listing_type {listing_type!r}")
+    job_urls = set() # Everything this job touched
+
+    async def on_failure(url):
+        job_urls.add(url)
+        await emit({"event": "failed", "url": url})
+
+    async def on_enriched(record):
+        await emit({"event": "enriched", "listing_id": record.get("listing_id"),
+                    **{field: record.get(field) for field in ("cv_nzd", "estimate_low_nzd", "estimate_high_nzd", "enrichment_status")}})
+
+    if job.get("urls"):
+        urls = list(dict.fromkeys(normalize_trademe_url(url) for url in job["urls"]))
+        job_urls.update(urls)
+        stream = scraper.iter_listings(urls, listing_type, on_failure=on_failure, on_enriched=on_enriched)
+    elif listing_type:
+        start_page = int(job.get("start_page", 1))
+        end_page = int(job.get("end_page", start_page))
+        stream = scraper.iter_search(listing_type, start_page, end_page, on_failure=on_failure, on_enriched=on_enriched)
+    else:
+        raise ValueError("job needs 'urls' or 'listing_type' with a page range")
+
+    if scraper.daemon_jobs_active == 0: # /status and the run collections cover the jobs since the daemon was last idle
+        scraper.reset_run_state()
+    scraper.daemon_jobs_active += 1
+    try:
+        async for record in stream:
+            job_urls.add(record["URL"])
+            await emit({"event": "listing", "data": record})
+    finally:
+        await stream.aclose()
+        scraper.daemon_jobs_active -= 1
+        scraper.forget_urls(job_urls)
+# --- End daemon job runner ---
+
+# --- Distributed crawl (coordinator / workers over a shared queue) ---
+async def run_coordinator(scraper, queue, listing_types, args, description_store=None, history=None, dimensions=None):
+    """Seeds the shared queue with collected URLs, waits for workers to drain it, then exports the results.
+
+    The export goes through the same description store, history and dimension tables as a local run.
+    """
+    for listing_type in listing_types:
+        if args.skip_url_collection:
+            urls = load_collected_urls(listing_type) or []
+        else:
+            urls = await scraper.collect_listing_urls(listing_type, args.start_page, args.max_pages)
+            save_collected_urls(urls, listing_type)
+        urls = list(dict.fromkeys(normalize_trademe_url(url) for url in urls))
+        added = await asyncio.to_thread(queue.enqueue, urls, listing_type)
+        print(f"\n📥 Queued {added} new {listing_type} URLs ({len(urls) - added} already in the queue) in {queue.path}")
+
+    print("\n⏳ Waiting for workers to drain the queue (start them with --worker)...")
+    while True:
+        stats = await asyncio.to_thread(queue.stats)
+        print(f"\r📊 Queue: pending={stats['pending']} leased={stats['leased']} done={stats['done']} "
+              f"failed={stats['failed']} results={stats['results']} workers={len(stats['workers'])}", end="", flush=True)
+        if stats["pending"] == 0 and stats["leased"] == 0:
+            break
+        await asyncio.sleep(args.coordinator_poll)
+
+    for listing_type in listing_types:
+        records = await asyncio.to_thread(queue.export_results, listing_type)
+        if description_store is not None:
+            for record in records:
+                description_store.externalize(record)
+            description_store.flush() # Commit descriptions before the CSV refers to their hashes
+        if dimensions is not None:
+            for record in records:
+                dimensions.intern_record(record)
+            dimensions.flush()
+        seen_ids = {listing_id_for(url) for url in scraper.collected_urls.get(listing_type, [])}
+        final_output_file, _ = export_final(scraper, records, listing_type, description_store, history, seen_ids,
+                                            complete=not args.skip_url_collection and scraper.search_exhausted.get(listing_type, False),
+                                            dimensions=dimensions)
+        print(f"\n✅ Exported {len(records)} {listing_type} listings from the queue to {final_output_file}")
+        failed = await asyncio.to_thread(queue.failed_urls, listing_type)
+        if failed:
+            failed_file = os.path.join(OUTPUT_DIR, f"failed_{listing_type}_listings.txt")
+            with open(failed_file, "w") as f:
+                f.write("\n".join(failed))
+            print(f"\n⚠️ {len(failed)} failed {listing_type} listings saved to {failed_file}")
+    if description_store is not None:
+        print(f"\n🗜️ Description store: {description_store.summary()}")
+
+async def run_worker(scraper, queue, args):
+    """Claims leased batches from the shared queue, scrapes them and commits the results until the queue is drained."""
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    lease_seconds = args.lease_seconds
+    print(f"\n👷 Worker {worker_id} consuming {queue.path} (batches of {args.lease_batch}, {lease_seconds}s leases)")
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                await asyncio.to_thread(queue.heartbeat, worker_id, lease_seconds)
+            except Exception as e:
+                print(f"\n⚠️ Heartbeat failed for {worker_id}: {e}")
+
+    async def on_failure(url):
+        await asyncio.to_thread(queue.fail, worker_id, url, "failed after retries", args.max_attempts)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    committed = duplicates = 0
+    try:
+        while True:
+            batch = await asyncio.to_thread(queue.claim, worker_id, args.lease_batch, lease_seconds, args.max_attempts)
+            if not batch:
+                if await asyncio.to_thread(queue.is_drained):
+                    break
+                await asyncio.sleep(5) # Other workers still hold leases that may expire
+                continue
+            urls_by_type = {}
+            for url, listing_type in batch:
+                urls_by_type.setdefault(listing_type, []).append(url)
+            for listing_type, urls in urls_by_type.items():
+                # Records are committed once the batch (including deferred sale enrichment) is finished
+                records = [record async for record in scraper.iter_listings(urls, listing_type, on_failure=on_failure)]
+                for record in records:
+                    if await asyncio.to_thread(queue.complete, worker_id, record["URL"], listing_type, record):
+                        committed += 1
+                    else:
+                        duplicates += 1
+    finally:
+        heartbeat_task.cancel()
+        released = await asyncio.to_thread(queue.release, worker_id)
+        print(f"\n👷 Worker {worker_id} done: {committed} committed, {duplicates} already committed elsewhere, {released} leases released.")
+# --- End distributed crawl ---
+
+# --- Per-type run used by the CLI ---
+async def run_listing_type(scraper, listing_type, args, description_store=None, history=None, dimensions=None):
+    """Scrapes one listing type end to end: resume, collect/scrape, periodic temp saves and final outputs.
+
+    With a DescriptionStore, rows keep only description_sha and the text goes to the store.
+    With a ListingHistory, changed fields and derived statuses are recorded before the final save.
+    With DimensionTables, agency/agent names are interned as records arrive and rows keep integer ids.
+    Returns a summary dict for the run report. Safe to run for several types at once on one scraper.
+    """
+    print(f"\n{'='*20} Starting scrape for {listing_type.upper()} listings {'='*20}")
+    started = time.monotonic()
+    summary = {"listing_type": listing_type, "scraped": 0, "failed": 0, "wall_s": 0.0}
+
+    # --- Load previously scraped data (Resume) for this type ---
+    data, scraped_urls_set = load_resume_data(listing_type)
+    if description_store is not None:
+        for record in data: # Temp files from runs without the store still carry the text
+            description_store.externalize(record)
+    if dimensions is not None:
+        for record in data: # Rows resumed from runs without --dimensions still carry the names
+            dimensions.intern_record(record)
+    failed = []
+    resumed_enrichment = []
+
+    # --- Re-queue resumed sale listings whose deferred enrichment never finished ---
+    if listing_type == "sale" and scraper.sale_enrichment == "deferred":
+        unfinished = [record for record in data if record.get("enrichment_status") == "pending"]
+        resumed_enrichment = [scraper.enqueue_enrichment(record) for record in unfinished]
+        if unfinished:
+            print(f"\n🔄 Re-queued {len(unfinished)} resumed sale listings for enrichment.")
+
+    scheduler = scraper.scheduler
+
+    async def on_failure(url):
+        failed.append(url)
+        if scheduler is not None:
+            scheduler.mark_done(url, ok=False)
+
+    if args.skip_url_collection:
+        print(f"\n⏭️ Skipping {listing_type} URL collection, attempting to load from file...")
+        loaded_urls = load_collected_urls(listing_type) # Load URLs specific to this type
+        if loaded_urls is None:
+            print(f"\n❌ Failed to load {listing_type} URLs from file. Cannot proceed with --skip-url-collection for this type.")
+            return summary
+        listing_urls_to_scrape = [url for url in loaded_urls if url not in scraped_urls_set]
+        print(f"\n✅ Loaded {len(loaded_urls)} {listing_type} URLs, {len(listing_urls_to_scrape)} new URLs to scrape.")
+        if not listing_urls_to_scrape:
+            print(f"\n✅ No new {listing_type} listings to scrape based on loaded URLs and resume data.")
+            return summary
+        print(f"\n🚀 Starting scraping of loaded {listing_type} URLs...")
+        if scheduler is not None:
+            listing_urls_to_scrape = scheduler.order(listing_urls_to_scrape)
+        stream = scraper.iter_listings(listing_urls_to_scrape, listing_type, on_failure=on_failure)
+    elif args.collect_first:
+        # Whole frontier first, so the scheduler orders every listing rather than one batch at a time
+        print(f"\n🌐 Collecting every {listing_type} search page before scraping...")
+        collected_before = len(scraper.collected_urls.get(listing_type, []))
+        collected = await scraper.collect_listing_urls(listing_type, args.start_page, args.max_pages)
+        listing_urls_to_scrape = [url for url in collected if url not in scraped_urls_set]
+        print(f"\n🔗 Collected {len(collected)} {listing_type} URLs, {len(listing_urls_to_scrape)} new to scrape.")
+        if scheduler is not None:
+            listing_urls_to_scrape = scheduler.order(listing_urls_to_scrape)
+        stream = scraper.iter_listings(listing_urls_to_scrape, listing_type, on_failure=on_failure)
+    else:
+        print(f"\n🌐 Starting streaming collection and scraping for {listing_type}...")
+        collected_before = len(scraper.collected_urls.get(listing_type, []))
+        stream = scraper.iter_search(listing_type, args.start_page, args.max_pages, skip_urls=scraped_urls_set, on_failure=on_failure)
+
+    new_count = 0
+    async for record in stream:
+        if description_store is not None:
+            description_store.externalize(record)
+        if dimensions is not None:
+            dimensions.intern_record(record)
+        data.append(record)
+        new_count += 1
+        if scheduler is not None:
+            scheduler.mark_done(record["URL"], ok=True)
+        if new_count % SAVE_INTERVAL == 0:
+            if description_store is not None:
+                description_store.flush() # Commit descriptions before any CSV refers to their hashes
+            if dimensions is not None:
+                dimensions.flush() # Same for agency / agent ids
+            await save_temp_data(data, listing_type) # Save periodically, specific to type
+        if args.deadline_stop and scheduler is not None and scheduler.past_deadline():
+            print(f"\n⏰ Deadline reached; stopping {listing_type} here. The rest is picked up by the next (resumed) run.")
+            scheduler.stopped_at_deadline = True
+            break
+    await stream.aclose() # Cancels in-flight listings if the deadline stopped the loop early
+    if resumed_enrichment:
+        await asyncio.gather(*resumed_enrichment) # Resumed records re-queued above
+    if description_store is not None:
+        description_store.flush()
+    if dimensions is not None:
+        dimensions.flush()
+    await save_temp_data(data, listing_type)
+
+    # --- Save all collected URLs at the end for this type ---
+    all_collected_urls = []
+    if not args.skip_url_collection:
+        all_collected_urls = scraper.collected_urls.get(listing_type, [])[collected_before:]
+        if all_collected_urls:
+            save_collected_urls(list(dict.fromkeys(all_collected_urls)), listing_type) # Remove potential duplicates before saving
+
+    # --- Final steps for this listing type ---
+    # Final save to the main output file for this type
+    if args.skip_url_collection: # No search this run; only the listings we have rows for are known to exist
+        seen_ids = {listing_id_of(record) for record in data}
+    else:
+        seen_ids = {listing_id_for(url) for url in all_collected_urls}
+    final_output_file, export_summary = export_final(
+        scraper, data, listing_type, description_store, history, seen_ids,
+        complete=not args.skip_url_collection and scraper.search_exhausted.get(listing_type, False), dimensions=dimensions)
+    summary.update(export_summary)
+    print(f"\n✅ Done with {listing_type}. {len(data)} total {listing_type} listings saved to {final_output_file}")
+
+    if failed:
+        failed_file = os.path.join(OUTPUT_DIR, f"failed_{listing_type}_listings.txt")
+        with open(failed_file, "w") as f:
+            f.write("\n".join(failed))
+        print(f"\n⚠️ {len(failed)} failed {listing_type} listings saved to {failed_file}")
+    else:
+         print(f"\n🎉 No failed {listing_type} listings!")
+
+    summary.update({"scraped": new_count, "failed": len(failed), "total_rows": len(data),
+                    "wall_s": round(time.monotonic() - started, 1)})
+    return summary
+# --- End per-type run ---
+
+# --- Run report ---
+def load_run_reports():
+    """Returns every previous run report (oldest first)."""
+    if not os.path.exists(RUN_REPORTS_FILE):
+        return []
+    reports = []
+    with open(RUN_REPORTS_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    reports.append(json.loads(line))
+                except ValueError:
+                    pass
+    return reports
+
+def write_run_report(report):
+    """Appends this run's report to RUN_REPORTS_FILE."""
+    try:
+        with open(RUN_REPORTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, default=str) + "\n")
+        print(f"\n📝 Run report appended to {RUN_REPORTS_FILE}")
+    except Exception as e:
+        print(f"\n⚠️ Failed to write run report: {e}")
+
+def compare_with_other_mode(report):
+    """Prints the wall-time ratio against the latest run of the other crawl mode with the same listing types."""
+    other_mode = "sequential" if report["mode"] == "concurrent" else "concurrent"
+    for previous in reversed(load_run_reports()):
+        if previous.get("mode") == other_mode and previous.get("listing_types") == report["listing_types"] \
+                and previous.get("args") == report["args"]:
+            ratio = previous["wall_s"] / report["wall_s"] if report["wall_s"] else float("inf")
+            print(f"\n⏱️ {report['mode']} run: {report['wall_s']}s vs last {other_mode} run: {previous['wall_s']}s ({ratio:.2f}x)")
+            return
+    print(f"\n⏱️ {report['mode']} run took {report['wall_s']}s (no {other_mode} run with the same arguments to compare against)")
+# --- End run report ---
+
 # --- Modified main function ---
 async def main():
-    global DATA, TOTAL_LISTINGS_TO_SCRAPE, CURRENT_BASE_URL, TEMP_SAVE_FILE, COLLECTED_URLS_FILE, RESUME_FILE
     # --- Setup argument parser ---
     parser = argparse.ArgumentParser(description="Scrape Trade Me property listings.")
     parser.add_argument(
@@ -878,241 +2154,480 @@ async def main():
         help="Maximum number of search result pages to scrape per listing type (default: 1000). Set to 0 for no limit.",
     )
     # --- End max-pages argument ---
+    # --- Add record/replay arguments ---
+    network_group = parser.add_mutually_exclusive_group()
+    network_group.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Save every response the browser receives to DIR (content-addressed) for later --replay.",
+    )
+    network_group.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="Serve responses recorded with --record from DIR instead of the network. Unrecorded requests are aborted.",
+    )
+    # --- End record/replay arguments ---
+    # --- Add asset cache arguments ---
+    parser.add_argument(
+        "--asset-cache-dir",
+        default=os.path.join(OUTPUT_DIR, "asset_cache"),
+        help="Directory for the shared static asset cache (default: scraping_output/asset_cache).",
+    )
+    parser.add_argument(
+        "--asset-cache-mb",
+        type=int,
+        default=ASSET_CACHE_MB,
+        help=f"Size bound of the static asset cache in MiB; least recently used assets are evicted (default: {ASSET_CACHE_MB}).",
+    )
+    parser.add_argument(
+        "--no-asset-cache",
+        action="store_true",
+        help="Disable the shared static asset cache.",
+    )
+    # --- End asset cache arguments ---
+    # --- Add daemon arguments ---
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep the browser warm and accept jobs over a local HTTP API (POST /jobs, GET /status) instead of running one scrape.",
+    )
+    parser.add_argument("--daemon-host", default="127.0.0.1", help="Address for the daemon API (default: 127.0.0.1).")
+    parser.add_argument("--daemon-port", type=int, default=8765, help="Port for the daemon API (default: 8765).")
+    parser.add_argument("--daemon-workers", type=int, default=2, help="Jobs the daemon runs at the same time (default: 2).")
+    parser.add_argument(
+        "--context-pool-size",
+        type=int,
+        default=CONTEXT_POOL_SIZE,
+        help=f"Pre-created browser contexts kept warm in daemon mode (default: {CONTEXT_POOL_SIZE}).",
+    )
+    # --- End daemon arguments ---
+    # --- Add sale enrichment arguments ---
+    parser.add_argument(
+        "--sale-enrichment",
+        choices=SALE_ENRICHMENT_MODES,
+        default="deferred",
+        help="How to fill estimate_low_nzd/estimate_high_nzd/cv_nzd for sales: 'deferred' writes the core record right away "
+             "and fills them in a separate, rate-limited pass; 'inline' waits on each listing page; 'off' skips them (default: deferred).",
+    )
+    parser.add_argument(
+        "--enrichment-concurrency",
+        type=int,
+        default=ENRICHMENT_CONCURRENCY,
+        help=f"Pages the deferred enrichment pass may hold at once (default: {ENRICHMENT_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--enrichment-interval",
+        type=float,
+        default=ENRICHMENT_INTERVAL,
+        help=f"Minimum seconds between enrichment page loads (default: {ENRICHMENT_INTERVAL}).",
+    )
+    # --- End sale enrichment arguments ---
+    # --- Add concurrent crawl arguments ---
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="With --listing-type all, scrape rentals and then sales one after the other instead of at the same time.",
+    )
+    parser.add_argument(
+        "--rental-share",
+        type=float,
+        default=0.5,
+        help="With --listing-type all, the fraction of the concurrent page limit rentals may use; sales get the rest (default: 0.5).",
+    )
+    # --- End concurrent crawl arguments ---
+    # --- Add distributed crawl arguments ---
+    queue_group = parser.add_mutually_exclusive_group()
+    queue_group.add_argument(
+        "--coordinator",
+        metavar="QUEUE_DB",
+        help="Collect URLs into the shared SQLite queue QUEUE_DB, wait for --worker nodes to drain it and export the results.",
+    )
+    queue_group.add_argument(
+        "--worker",
+        metavar="QUEUE_DB",
+        help="Claim leased batches of URLs from the shared SQLite queue QUEUE_DB and commit the scraped records to it.",
+    )
+    parser.add_argument("--worker-id", help="Worker name in the queue (default: <hostname>-<pid>).")
+    parser.add_argument("--lease-batch", type=int, default=10, help="URLs a worker claims per lease (default: 10).")
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help=f"Lease length; workers renew it every third of this while scraping (default: {DEFAULT_LEASE_SECONDS}).",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help=f"Leases a URL may use before it is marked failed (default: {DEFAULT_MAX_ATTEMPTS}).",
+    )
+    parser.add_argument("--coordinator-poll", type=float, default=10.0, help="Seconds between coordinator progress checks (default: 10).")
+    parser.add_argument("--queue-wal", action="store_true", help="Use SQLite WAL mode for the queue (only when it is on local disk).")
+    # --- End distributed crawl arguments ---
+    # --- Add egress arguments ---
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=MAX_CONCURRENT,
+        help=f"Listing pages open at the same time (default: {MAX_CONCURRENT}). Raise it along with the number of egress endpoints.",
+    )
+    parser.add_argument(
+        "--proxy-file",
+        help="File of egress endpoints ('<proxy url> [contexts/sec]' or 'direct' per line); each browser context is routed through one of them.",
+    )
+    parser.add_argument(
+        "--proxy-rate",
+        type=float,
+        default=DEFAULT_EGRESS_RATE,
+        help=f"Default budget per egress endpoint, in new browser contexts (listings or search page batches) per second (default: {DEFAULT_EGRESS_RATE}).",
+    )
+    # --- End egress arguments ---
+    # --- Add browser watchdog arguments ---
+    parser.add_argument(
+        "--recycle-rss-mb",
+        type=float,
+        default=DEFAULT_MAX_BROWSER_RSS_MB,
+        help=f"Restart the browser once its process tree uses more than this much RSS (default: {DEFAULT_MAX_BROWSER_RSS_MB}; 0 = no limit).",
+    )
+    parser.add_argument(
+        "--recycle-after-contexts",
+        type=int,
+        default=DEFAULT_MAX_CONTEXTS,
+        help=f"Restart the browser after this many contexts (default: {DEFAULT_MAX_CONTEXTS}; 0 = no limit).",
+    )
+    parser.add_argument(
+        "--recycle-after-crashes",
+        type=int,
+        default=DEFAULT_MAX_CRASHES,
+        help=f"Restart the browser after this many page crashes or failed context creations (default: {DEFAULT_MAX_CRASHES}; 0 = no limit).",
+    )
+    parser.add_argument(
+        "--no-watchdog",
+        action="store_true",
+        help="Don't sample resources or recycle the browser.",
+    )
+    # --- End browser watchdog arguments ---
+    # --- Add status arguments ---
+    parser.add_argument(
+        "--status-interval",
+        type=float,
+        default=None,
+        help=f"Seconds between terminal status-line updates (default: {STATUS_INTERVAL} when stdout is a terminal, "
+             "otherwise off so logs and cron mail don't fill with redraws; 0 = off).",
+    )
+    parser.add_argument(
+        "--status-port",
+        type=int,
+        help="Serve live progress as JSON on http://127.0.0.1:<port>/status.",
+    )
+    # --- End status arguments ---
+    # --- Add profiling arguments ---
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record a CPU profile, event-loop lag and blocking call sites into scraping_output/profiles/<timestamp>/.",
+    )
+    parser.add_argument(
+        "--profile-trace-sample",
+        type=float,
+        default=0.0,
+        help="With --profile, fraction of listing attempts to record a Playwright trace for (e.g. 0.02).",
+    )
+    # --- End profiling arguments ---
+    parser.add_argument(
+        "--description-store",
+        help="SQLite file for compressed, deduplicated descriptions (e.g. scraping_output/descriptions.db). "
+             "CSV rows then carry description_sha instead of the full text.",
+    )
+    parser.add_argument(
+        "--history",
+        help="SQLite file for per-listing price/status history (e.g. scraping_output/history.db). "
+             "Records changed fields each run and derives withdrawn/removed statuses.",
+    )
+    parser.add_argument(
+        "--dimensions",
+        action="store_true",
+        help="Intern agency and agent names into agencies.csv / agents.csv / listing_agents.csv in the output "
+             "directory. Listing rows carry agency_id, primary_agent_id and agent_count instead of the names.",
+    )
+    parser.add_argument(
+        "--batch-normalize",
+        action="store_true",
+        help="Capture raw price/date text while scraping and normalize the whole dataset at the end "
+             "(typed prices, year-correct list dates, categoricals). Daemon jobs stream the raw records.",
+    )
+    parser.add_argument(
+        "--search-source",
+        choices=SEARCH_SOURCES,
+        default="dom",
+        help="How search pages are read: 'dom' reads the card links (default); 'payload' parses the frontend's "
+             "search JSON and switches to the card links for the rest of the run after the first page without it. "
+             "The run report compares per-page latency.",
+    )
+    parser.add_argument(
+        "--session-dir",
+        help="Directory of reusable browser identities (storage_state files), e.g. scraping_output/sessions. "
+             "Listing contexts start from a warm session instead of cold.",
+    )
+    parser.add_argument(
+        "--session-pool",
+        type=int,
+        default=DEFAULT_SESSION_POOL,
+        help=f"Number of identities to keep warm with --session-dir (default: {DEFAULT_SESSION_POOL}).",
+    )
+    parser.add_argument(
+        "--session-max-age",
+        type=float,
+        default=DEFAULT_SESSION_MAX_AGE_S / 3600,
+        help=f"Hours before an identity is bootstrapped again (default: {DEFAULT_SESSION_MAX_AGE_S / 3600:g}).",
+    )
+    parser.add_argument(
+        "--session-cold-sample",
+        type=float,
+        default=DEFAULT_COLD_SAMPLE,
+        help=f"Share of listings scraped in cold contexts to compare against (default: {DEFAULT_COLD_SAMPLE}).",
+    )
+    parser.add_argument(
+        "--priority",
+        help="Scrape in priority order, e.g. 'new,refresh,premium' (tiers: new, refresh, premium; the rest come last). "
+             "'new' uses --history (or the previous run's collected URLs) to know which listings were seen before.",
+    )
+    parser.add_argument(
+        "--refresh-after-hours",
+        type=float,
+        default=DEFAULT_REFRESH_AFTER_S / 3600,
+        help=f"Known listings not scraped for this long are in the 'refresh' tier (default: {DEFAULT_REFRESH_AFTER_S / 3600:g}).",
+    )
+    parser.add_argument(
+        "--collect-first",
+        action="store_true",
+        help="Collect every search page before scraping, so the priority order covers the whole frontier "
+             "instead of one batch of pages at a time.",
+    )
+    parser.add_argument(
+        "--deadline-minutes",
+        type=float,
+        help="Time budget for the high-priority listings; the run report shows coverage by then. Implies --priority.",
+    )
+    parser.add_argument(
+        "--deadline-top",
+        type=int,
+        help="Report whether the N highest-priority listings were done by the deadline.",
+    )
+    parser.add_argument(
+        "--deadline-stop",
+        action="store_true",
+        help="Stop scraping when the deadline passes (the rest stays for a resumed run).",
+    )
     args = parser.parse_args()
     # --- End argument parser ---
-
-    # --- Constants for streaming ---
-    PAGES_PER_BATCH = 5 # Collect and scrape in batches of 5 pages
-    # --- End streaming constants ---
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if args.status_interval is None: # The status line redraws with carriage returns; only useful on a terminal
+        args.status_interval = STATUS_INTERVAL if sys.stdout.isatty() else 0
+    # --- Configure record/replay ---
+    network_mode = response_store = None
+    if args.record:
+        network_mode = "record"
+        response_store = ResponseStore(args.record)
+        print(f"\n📼 Recording responses to {args.record}")
+    elif args.replay:
+        network_mode = "replay"
+        response_store = ResponseStore(args.replay).load()
+    # --- End record/replay configuration ---
+
+    # --- Configure the asset cache (not used while recording/replaying so recordings stay complete) ---
+    asset_cache = None
+    if not args.no_asset_cache and network_mode is None:
+        asset_cache = AssetCache(args.asset_cache_dir, args.asset_cache_mb * 1024 * 1024).load()
+    # --- End asset cache configuration ---
 
     # --- Determine listing types to scrape ---
-    listing_types_to_scrape = []
     if args.listing_type == 'all':
         listing_types_to_scrape = ['rental', 'sale']
     else:
         listing_types_to_scrape = [args.listing_type]
     # --- End determination ---
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True) # Set to False for debugging if needed
-
-        # --- Loop through each listing type ---
-        for listing_type in listing_types_to_scrape:
-            print(f"\n{'='*20} Starting scrape for {listing_type.upper()} listings {'='*20}")
-            
-            # --- Update global variables based on listing type ---
-            if listing_type == 'rental':
-                CURRENT_BASE_URL = BASE_URL_RENTAL
-            elif listing_type == 'sale':
-                CURRENT_BASE_URL = BASE_URL_SALE
-            
-            # Update file paths for this listing type
-            TEMP_SAVE_FILE = os.path.join(OUTPUT_DIR, f"temp_scraped_{listing_type}_data.csv")
-            RESUME_FILE = TEMP_SAVE_FILE
-            COLLECTED_URLS_FILE = os.path.join(OUTPUT_DIR, f"collected_{listing_type}_listing_urls.txt")
-            # --- End updating globals/files ---
-            
-            # --- Reset global data structures for this type ---
-            # Note: If scraping 'all', you might want to accumulate data or handle separately.
-            # For now, we'll process one type at a time, resetting DATA/FAILED for clarity per type.
-            # If you want to accumulate, move DATA and FAILED outside this loop.
-            global DATA, FAILED, TOTAL_LISTINGS_TO_SCRAPE # Declare globals to reset inside loop
-            DATA = [] # Reset DATA for this listing type
-            FAILED = [] # Reset FAILED for this listing type
-            TOTAL_LISTINGS_TO_SCRAPE = 0 # Reset counter
-            
-             # --- Load previously scraped data (Resume) for this type ---
-            scraped_urls_set = load_resume_data(listing_type) # Load resume data specific to this type
-            # --- End loading scraped data ---
-
-            if args.skip_url_collection:
-                # --- Existing logic for --skip-url-collection ---
-                print(f"\n⏭️ Skipping {listing_type} URL collection, attempting to load from file...")
-                loaded_urls = load_collected_urls(listing_type) # Load URLs specific to this type
-                if loaded_urls is not None:
-                    listing_urls_to_scrape = [url for url in loaded_urls if url not in scraped_urls_set]
-                    TOTAL_LISTINGS_TO_SCRAPE = len(listing_urls_to_scrape) # Update global count for progress
-                    print(f"\n✅ Loaded {len(loaded_urls)} {listing_type} URLs, {len(listing_urls_to_scrape)} new URLs to scrape.")
-
-                    if not listing_urls_to_scrape:
-                        print(f"\n✅ No new {listing_type} listings to scrape based on loaded URLs and resume data.")
-                        # Continue to next listing type if any
-                        continue 
-
-                    # --- Process ALL loaded URLs in chunks ---
-                    print(f"\n🚀 Starting scraping of loaded {listing_type} URLs...")
-                    chunk_number = 1
-                    for i in range(0, len(listing_urls_to_scrape), SAVE_INTERVAL):
-                        chunk_urls = listing_urls_to_scrape[i:i + SAVE_INTERVAL]
-                        print(f"\n🚀 Starting scraping chunk {chunk_number} ({len(chunk_urls)} {listing_type} listings)...")
-                        #tasks = [asyncio.create_task(scrape_listing(browser, url)) for url in chunk_urls]
-                        tasks = []
-                        for i, url in enumerate(chunk_urls):
-                            # Add a small delay before starting each task (except the first one)
-                            # This staggers the initial requests to be more human-like
-                            if i > 0: # Don't delay before the very first task in the chunk
-                                await asyncio.sleep(TASK_START_DELAY)
-                            task = asyncio.create_task(scrape_listing(browser, url))
-                            tasks.append(task)
-                        await asyncio.gather(*tasks)
-                        await save_temp_data(DATA, listing_type) # Save periodically, specific to type
-                        print(f"\n🏁 Completed scraping chunk {chunk_number} ({listing_type}).")
-                        chunk_number += 1
-                    # --- End processing loaded URLs ---
+    # --- Configure the egress pool ---
+    egress_pool = EgressPool.from_file(args.proxy_file, args.proxy_rate) if args.proxy_file else None
+    # --- End egress configuration ---
+
+    # --- Start the profiler before anything else runs on the loop ---
+    profiler = None
+    if args.profile:
+        profile_dir = os.path.join(OUTPUT_DIR, "profiles", datetime.now().strftime("%Y%m%d_%H%M%S"))
+        profiler = await RunProfiler(profile_dir, trace_sample=args.profile_trace_sample).start()
+    # --- End profiler start ---
+
+    description_store = DescriptionStore(args.description_store) if args.description_store else None
+    history = ListingHistory(args.history) if args.history else None
+    dimensions = DimensionTables(OUTPUT_DIR).load() if args.dimensions else None
+    sessions = None
+    if args.session_dir:
+        sessions = SessionManager(args.session_dir, USER_AGENTS, HEADERS_LIST, size=args.session_pool,
+                                  max_age_s=args.session_max_age * 3600, cold_sample=args.session_cold_sample).load()
+
+    # --- Priority scheduler ---
+    scheduler = None
+    if args.priority or args.deadline_minutes:
+        if history is not None:
+            last_seen = history.last_seen_times()
+        else: # Without a history, listings with scraped rows count as seen (collected-but-unscraped ones stay new)
+            last_seen = {}
+            for listing_type in listing_types_to_scrape:
+                last_seen.update(scraped_last_seen(listing_type))
+        try:
+            tiers = parse_priority(args.priority or ",".join(PRIORITY_TIERS))
+        except ValueError as e:
+            parser.error(str(e))
+        scheduler = CrawlScheduler(tiers, last_seen,
+                                   refresh_after_s=args.refresh_after_hours * 3600,
+                                   deadline_s=args.deadline_minutes * 60 if args.deadline_minutes else None,
+                                   top_n=args.deadline_top)
+        print(f"\n🗂️ Priority order: {' > '.join(scheduler.tiers)} ({len(last_seen)} listings seen before)")
+    # --- End priority scheduler ---
+
+    # --- Per-type shares of the page pool when crawling both types at once ---
+    concurrent_types = len(listing_types_to_scrape) > 1 and not args.sequential
+    type_shares = None
+    if concurrent_types:
+        rental_share = min(max(args.rental_share, 0.0), 1.0)
+        type_shares = {"rental": rental_share, "sale": 1.0 - rental_share}
+    # --- End per-type shares ---
+
+    scraper = TradeMeScraper(
+        network_mode=network_mode,
+        response_store=response_store,
+        asset_cache=asset_cache,
+        context_pool_size=args.context_pool_size if args.daemon else 0,
+        sale_enrichment=args.sale_enrichment,
+        enrichment_concurrency=args.enrichment_concurrency,
+        enrichment_interval=args.enrichment_interval,
+        type_shares=type_shares,
+        egress_pool=egress_pool,
+        max_concurrent=args.max_concurrent,
+        watchdog_limits=None if args.no_watchdog else {
+            "max_browser_rss_mb": args.recycle_rss_mb,
+            "max_contexts": args.recycle_after_contexts,
+            "max_crashes": args.recycle_after_crashes,
+        },
+        status_interval=0 if args.daemon else args.status_interval, # The daemon has its own /status
+        status_port=None if args.daemon else args.status_port,
+        profiler=profiler,
+        batch_normalize=args.batch_normalize,
+        search_source=args.search_source,
+        sessions=sessions,
+        scheduler=scheduler,
+    )
+    profile_summary = None
+    description_stats = description_summary = history_summary = dimension_stats = dimension_summary = None
+    try:
+        async with scraper:
+            # --- Distributed crawl modes ---
+            if args.coordinator or args.worker:
+                queue = SQLiteWorkQueue(args.coordinator or args.worker, wal=args.queue_wal)
+                if args.coordinator:
+                    await run_coordinator(scraper, queue, listing_types_to_scrape, args, description_store, history, dimensions)
                 else:
-                    print(f"\n❌ Failed to load {listing_type} URLs from file. Cannot proceed with --skip-url-collection for this type.")
-                    # Continue to next listing type if any
-                    continue
-                # --- End existing logic for --skip-url-collection ---
-            else:
-                # --- New streaming logic ---
-                print(f"\n🌐 Starting streaming collection and scraping for {listing_type}...")
-                page = await browser.new_page()
-
-                all_collected_urls = [] # Keep track of all URLs collected so far for final save
-                # Use the start-page argument for the initial page number
-                page_num = args.start_page # This correctly uses the --start-page argument now
-                batch_number = 1
-
-                while True:
-                    # Determine the range of pages for this batch
-                    start_page = page_num
-                    # Collect up to PAGES_PER_BATCH pages, or until MAX_PAGES is reached
-                    effective_max_pages = args.max_pages if args.max_pages > 0 else float('inf')
-                    end_page = min(page_num + PAGES_PER_BATCH - 1, effective_max_pages)
-                    if args.max_pages > 0 and start_page > args.max_pages:
-                         print(f"\n📛 Reached --max-pages limit ({args.max_pages}) for {listing_type}.")
-                         break
-
-                    print(f"\n🌐 Collecting {listing_type} URL batch {batch_number} (pages {start_page} to {end_page})...")
-
-                    # --- Collect URLs for the current batch ---
-                    batch_urls_set = set() # Use a set for this batch to avoid internal duplicates
-                    current_page_to_fetch = start_page
-                    pages_fetched_in_batch = 0
-
-                    while pages_fetched_in_batch < PAGES_PER_BATCH and (args.max_pages == 0 or current_page_to_fetch <= args.max_pages):
-                        print(f"\n🌐 Fetching {listing_type} search page {current_page_to_fetch} for batch {batch_number}")
-                        await asyncio.sleep(random.uniform(1, 2))
-                        try:
-                            search_url = f"{CURRENT_BASE_URL}?page={current_page_to_fetch}" # Use CURRENT_BASE_URL
-                            await page.goto(search_url, timeout=20000)
-                            await page.wait_for_selector("a.tm-property-search-card__link, a.tm-property-premium-listing-card__link", timeout=20000)
-
-                            premium = await page.locator("a.tm-property-premium-listing-card__link").all()
-                            standard = await page.locator("a.tm-property-search-card__link").all()
-
-                            for el in premium + standard:
-                                href = await el.get_attribute("href")
-                                if href:
-                                    full_url = urljoin("https://www.trademe.co.nz", href)
-                                    normalized_url = normalize_trademe_url(full_url)
-                                    batch_urls_set.add(normalized_url) # Add to current batch set
-                                    all_collected_urls.append(normalized_url) # Add to overall list
-
-                            next_btn = page.locator("a[title='Next'], a.ng-star-inserted:has-text('Next')")
-                            if await next_btn.count() == 0 or not await next_btn.is_enabled():
-                                print("\n🏁 No more pages found.")
-                                current_page_to_fetch = MAX_PAGES + 1 if MAX_PAGES else float('inf') # Signal to break outer loop
-                                break
-
-                            current_page_to_fetch += 1
-                            pages_fetched_in_batch += 1
-                        except Exception as e:
-                            print(f"\n⚠️ Pagination error on page {current_page_to_fetch} in batch {batch_number} for {listing_type}: {e}")
-                            # Decide: break this batch or try next page? For now, break batch.
-                            break # Break the inner loop, might end the batch early
-
-                    # Convert batch set to list for processing
-                    batch_urls_list = list(batch_urls_set)
-                    print(f"\n🔗 Collected {len(batch_urls_list)} unique {listing_type} URLs in batch {batch_number}.")
-
-                    if not batch_urls_list:
-                        print(f"\nℹ️ No {listing_type} URLs collected in batch {batch_number}. Ending collection.")
-                        break # No point continuing if no URLs
-
-                    # --- Filter batch URLs against already scraped URLs ---
-                    # Important: We filter against the global scraped_urls_set which might grow
-                    batch_urls_to_scrape = [url for url in batch_urls_list if url not in scraped_urls_set]
-                    print(f"\n🎯 {len(batch_urls_to_scrape)} new {listing_type} URLs in batch {batch_number} to scrape.")
-
-                    if batch_urls_to_scrape:
-                        # Update TOTAL_LISTINGS_TO_SCRAPE for progress display (approximation, gets better each batch)
-                        # A more accurate way would be to keep a running total, but this is simpler for display
-                        # TOTAL_LISTINGS_TO_SCRAPE is now less critical for the overall count as progress is per batch item
-                        # Let's keep it as the size of the current batch to scrape for the progress bar relevance
-                        current_total_for_progress = len(batch_urls_to_scrape)
-                        original_total_to_scrape = TOTAL_LISTINGS_TO_SCRAPE
-                        TOTAL_LISTINGS_TO_SCRAPE = current_total_for_progress
-                        print(f"\n📈 Progress target for this {listing_type} batch: {current_total_for_progress}")
-
-                        # --- Scrape the URLs collected in this batch ---
-                        print(f"\n🚀 Starting scraping batch {batch_number} ({len(batch_urls_to_scrape)} new {listing_type} listings)...")
-                        chunk_number = 1
-                        # Process the current batch's URLs in smaller SAVE_INTERVAL chunks
-                        for i in range(0, len(batch_urls_to_scrape), SAVE_INTERVAL):
-                            chunk_urls = batch_urls_to_scrape[i:i + SAVE_INTERVAL]
-                            print(f"\n🚀 Starting scraping sub-chunk {chunk_number} of batch {batch_number} ({len(chunk_urls)} {listing_type} listings)...")
-
-                            tasks = []
-                            for i, url in enumerate(chunk_urls):
-                                if i > 0:
-                                    await asyncio.sleep(TASK_START_DELAY)
-                                task = asyncio.create_task(scrape_listing(browser, url))
-                                tasks.append(task)
-                            await asyncio.gather(*tasks)
-                            await save_temp_data(DATA, listing_type) # Save periodically, specific to type
-
-                            print(f"\n🏁 Completed scraping sub-chunk {chunk_number} of batch {batch_number} ({listing_type}).")
-                            chunk_number += 1
-
-                        # After scraping this batch, update scraped_urls_set with the URLs we just processed
-                        # This ensures they won't be scraped again if they appear in a later batch (unlikely but safe)
-                        for url in batch_urls_to_scrape:
-                             scraped_urls_set.add(url)
-
-                        # Reset TOTAL_LISTINGS_TO_SCRAPE if needed for global context, though progress is now batch-centric
-                        # For a global progress, you'd need a different mechanism, perhaps counting scraped items
-                        # Let's leave it as is for now, focusing on batch progress.
-                        # TOTAL_LISTINGS_TO_SCRAPE = original_total_to_scrape # Restore if needed globally later
-                    else:
-                        print(f"\nℹ️ No new {listing_type} listings to scrape in batch {batch_number}.")
-
-                    batch_number += 1
-                    page_num = current_page_to_fetch # Move to the next page after the current batch
+                    await run_worker(scraper, queue, args)
+                if asset_cache is not None:
+                    asset_cache.save()
+                return
+            # --- End distributed crawl modes ---
 
-                    # Check if we've reached the end condition
-                    if args.max_pages and page_num > args.max_pages: # Assuming 0 means no limit
-                        print(f"\n📛 Reached --max-pages limit ({args.max_pages}) during {listing_type} batch collection.")
-                        break
+            if args.daemon:
+                # --- Daemon mode: serve jobs until interrupted ---
+                await scraper.warm_up()
 
-                # --- End new streaming logic ---
-                await page.close()
+                async def run_job(job, emit):
+                    await run_daemon_job(scraper, job, emit)
 
-                # --- Save all collected URLs at the end for this type ---
-                if all_collected_urls:
-                    save_collected_urls(list(dict.fromkeys(all_collected_urls)), listing_type) # Remove potential duplicates before saving
-                # --- End saving collected URLs ---
-            
-            # --- Final steps for this listing type ---
-            # Final save to the main output file for this type
-            final_df = pd.DataFrame(DATA)
-            final_output_file = os.path.join(OUTPUT_DIR, f"trademe_{listing_type}_listings_final.csv")
-            final_df.to_csv(final_output_file, index=False)
-            print(f"\n✅ Done with {listing_type}. {len(DATA)} total {listing_type} listings saved to {final_output_file}")
-
-            if FAILED:
-                failed_file = os.path.join(OUTPUT_DIR, f"failed_{listing_type}_listings.txt")
-                with open(failed_file, "w") as f:
-                    f.write("\n".join(FAILED))
-                print(f"\n⚠️ {len(FAILED)} failed {listing_type} listings saved to {failed_file}")
-                FAILED = [] # Reset FAILED for next type
+                daemon = JobDaemon(run_job, args.daemon_host, args.daemon_port, args.daemon_workers,
+                                   status_extra=lambda: {"warm_contexts": scraper.context_pool.ready.qsize() if scraper.context_pool else 0, "max_concurrent": scraper.max_concurrent,
+                                                         "progress": scraper.status(),
+                                                         "resources": scraper.watchdog.timeline[-1] if scraper.watchdog else None})
+                try:
+                    await daemon.serve_forever()
+                finally:
+                    if asset_cache is not None:
+                        asset_cache.save()
+                return
+                # --- End daemon mode ---
+
+            # --- Run each listing type (at the same time unless --sequential) ---
+            run_started = time.monotonic()
+            if scheduler is not None:
+                scheduler.start()
+            if concurrent_types:
+                summaries = await asyncio.gather(*(run_listing_type(scraper, listing_type, args, description_store, history, dimensions) for listing_type in listing_types_to_scrape))
             else:
-                 print(f"\n🎉 No failed {listing_type} listings!")
-            # --- End final steps for this type ---
-            
-        # --- End loop through listing types ---
-        await browser.close()
+                summaries = [await run_listing_type(scraper, listing_type, args, description_store, history, dimensions) for listing_type in listing_types_to_scrape]
+            # --- End listing type runs ---
+    finally:
+        if profiler is not None:
+            profile_summary = await profiler.stop()
+        if description_store is not None:
+            description_store.flush()
+            description_stats, description_summary = description_store.stats(), description_store.summary()
+            description_store.close()
+        if history is not None:
+            history_summary = history.summary()
+            history.close()
+        if dimensions is not None:
+            dimensions.close()
+            dimension_stats, dimension_summary = dimensions.stats(), dimensions.summary()
+
+    report = {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "mode": "concurrent" if concurrent_types else "sequential",
+        "listing_types": listing_types_to_scrape,
+        "args": {key: getattr(args, key) for key in ("skip_url_collection", "start_page", "max_pages", "sale_enrichment", "replay", "search_source")},
+        "type_shares": type_shares,
+        "max_concurrent": scraper.max_concurrent,
+        "wall_s": round(time.monotonic() - run_started, 1),
+        "per_type": list(summaries),
+        "egress": egress_pool.snapshot() if egress_pool is not None else None,
+        "resources": scraper.watchdog.report() if scraper.watchdog is not None else None,
+        "profile": profile_summary,
+        "descriptions": description_stats,
+        "dimensions": dimension_stats,
+        "search_collection": scraper.search_timing_summary(),
+        "navigation": scraper.navigation_report(),
+        "sessions": sessions.snapshot() if sessions is not None else None,
+        "schedule": scheduler.report() if scheduler is not None else None,
+    }
+    if len(listing_types_to_scrape) > 1:
+        compare_with_other_mode(report)
+    write_run_report(report)
+
+    if response_store is not None:
+        print(f"\n📼 Record/replay summary: {response_store.summary()}")
+    if asset_cache is not None:
+        asset_cache.save()
+        print(f"\n🗄️ Asset cache summary: {asset_cache.summary()}")
+    if egress_pool is not None:
+        print(f"\n🌍 Egress summary: {egress_pool.summary()}")
+    if scraper.watchdog is not None:
+        print(f"\n🩺 Browser watchdog: {scraper.watchdog.summary()}")
+    if scheduler is not None:
+        print(f"\n🗂️ Priority coverage: {scheduler.summary()}")
+    navigation = scraper.navigation_report()
+    if navigation:
+        print("\n🍪 Listing navigation: " + ", ".join(
+            f"{kind} {item['listings']} listings, mean {item['nav_mean_ms']} ms, {item['requests_mean']} requests"
+            for kind, item in navigation.items()))
+    if sessions is not None:
+        print(f"\n🍪 Sessions: {sessions.summary()}")
+    search_timings = scraper.search_timing_summary()
+    if search_timings:
+        print("\n🔎 Search page collection: " + ", ".join(
+            f"{source} {item['pages']} pages, mean {item['mean_ms']} ms, p95 {item['p95_ms']} ms" for source, item in search_timings.items()))
+    if description_summary is not None:
+        print(f"\n🗜️ Description store: {description_summary}")
+    if history_summary is not None:
+        print(f"\n📈 Listing history: {history_summary}")
+    if dimension_summary is not None:
+        print(f"\n🏢 Agent dimensions: {dimension_summary}")
 
 # ... (Include your existing helper functions like update_progress, scrape_listing, collect_listing_urls,
 # save_chunk, save_temp_data, load_resume_data, save_collected_urls, load_collected_urls, normalize_trademe_url) ...
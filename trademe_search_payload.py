@@ -0,0 +1,167 @@
+"""
+Search results from the JSON the Trade Me frontend renders from (--search-source payload).
+
+A search page is an Angular app. Its results arrive as JSON, either embedded in
+the server-rendered page as transfer state (`<script id="frontend-serverState">`)
+or from a search API XHR (`/v1/search/property/...`). Reading that JSON gives
+every card on the page in one pass: listing ids, URLs, the total result count
+and card fields (price text, bedrooms, suburb, agency, listing date, ...).
+The DOM path needs a `get_attribute` round trip per card instead.
+
+This module only parses JSON. It walks any payload looking for result sets
+shaped like the Trade Me API:
+
+    {"TotalCount": 1234, "Page": 2, "PageSize": 22, "List": [{"ListingId": ..., ...}, ...]}
+
+Key lookups ignore case, so the camelCase frontend variant also parses.
+"""
+import html
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+TRADEME_ROOT = "https://www.trademe.co.nz"
+NZ_OFFSET = timezone(timedelta(hours=12)) # Same fixed offset the scraper stamps 'Scraped At' with
+TRANSFER_STATE_ESCAPES = {"&q;": '"', "&a;": "&", "&s;": "'", "&l;": "<", "&g;": ">"} # Older Angular TransferState escaping
+MAX_NESTED_JSON = 5_000_000 # Longest string value that is tried as embedded JSON
+
+# --- JSON helpers ---
+def lookup(item: dict, *keys):
+    """First present value among keys, ignoring key case."""
+    lowered = {str(key).lower(): value for key, value in item.items()}
+    for key in keys:
+        value = lowered.get(key.lower())
+        if value is not None:
+            return value
+    return None
+
+def parse_server_state(text: str):
+    """Parses the transfer-state script text, undoing Angular's older &q; style escaping if needed."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        for escaped, plain in TRANSFER_STATE_ESCAPES.items():
+            text = text.replace(escaped, plain)
+        return json.loads(html.unescape(text))
+
+def iter_result_sets(payload):
+    """Yields every dict in a JSON tree that holds a list of listing items under 'List'."""
+    pending = [payload]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            items = lookup(node, "List")
+            if isinstance(items, list) and any(isinstance(item, dict) and lookup(item, "ListingId") for item in items):
+                yield node
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, str) and node[:2] in ('{"', '[{') and len(node) < MAX_NESTED_JSON:
+            try: # Some state caches keep response bodies as JSON strings
+                pending.append(json.loads(node))
+            except ValueError:
+                pass
+
+def as_int(value):
+    """Integer from a JSON number or numeric string, or None when it is not one."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        return int(number) if number.is_integer() else None
+# --- End JSON helpers ---
+
+# --- Card fields ---
+def listing_url(canonical):
+    """Absolute listing URL from an item's own path, or None when it has none.
+
+    No URL is made up from the listing id: the scraper parses region / city / suburb from
+    the real path, and resume matches rows by URL.
+    """
+    canonical = str(canonical or "")
+    if canonical.startswith("/property/"):
+        return TRADEME_ROOT + "/a" + canonical
+    if canonical.startswith("/a/"):
+        return TRADEME_ROOT + canonical
+    if canonical.startswith(TRADEME_ROOT + "/"):
+        return canonical
+    return None
+
+def parse_listing_date(value):
+    """'/Date(1691100000000)/' (API) or an ISO timestamp (frontend) as dd/mm/yyyy in NZ time."""
+    if value is None:
+        return None
+    match = re.search(r"/Date\((-?\d+)", str(value))
+    try:
+        if match:
+            moment = datetime.fromtimestamp(int(match.group(1)) / 1000, tz=timezone.utc)
+        else:
+            moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+    except (ValueError, OverflowError):
+        return None
+    return moment.astimezone(NZ_OFFSET).strftime("%d/%m/%Y")
+
+def card_from_item(item: dict) -> dict:
+    """Card-level fields of one search result item."""
+    listing_id = str(lookup(item, "ListingId"))
+    region, district, suburb = lookup(item, "Region"), lookup(item, "District"), lookup(item, "Suburb")
+    agency = lookup(item, "Agency") or {}
+    agents = lookup(agency, "Agents") if isinstance(agency, dict) else None
+    location = lookup(item, "GeographicLocation") or {}
+    return {
+        "listing_id": listing_id,
+        "url": listing_url(lookup(item, "CanonicalPath", "Url")), # None: the card is read from the DOM instead
+        "title": lookup(item, "Title"),
+        "price_display": lookup(item, "PriceDisplay"),
+        "rent_per_week": lookup(item, "RentPerWeek"),
+        "bedrooms": lookup(item, "Bedrooms"),
+        "bathrooms": lookup(item, "Bathrooms"),
+        "parking": lookup(item, "TotalParking", "Parking"),
+        "property_type": lookup(item, "PropertyType"),
+        "address": lookup(item, "Address"),
+        "suburb": suburb,
+        "city": district,
+        "region": region,
+        "agency_name": lookup(agency, "Name") if isinstance(agency, dict) else None,
+        "agent_names": [lookup(agent, "FullName") for agent in agents if isinstance(agent, dict)] if isinstance(agents, list) else None,
+        "list_date": parse_listing_date(lookup(item, "StartDate", "ListedDate")),
+        "latitude": lookup(location, "Latitude") if isinstance(location, dict) else None,
+        "longitude": lookup(location, "Longitude") if isinstance(location, dict) else None,
+        "is_featured": bool(lookup(item, "IsFeatured") or lookup(item, "IsSuperFeatured")),
+    }
+# --- End card fields ---
+
+def extract_search_results(payloads, page_num: int = None) -> dict:
+    """Merges the result sets found in payloads: {"cards": [...], "total_count", "page_size"}.
+
+    Cards keep payload order and are deduplicated by listing id. When a payload holds
+    result sets for several pages (e.g. a cached first page), only `page_num`'s are used;
+    a set whose page number does not parse is skipped. Counts that do not parse are None.
+    """
+    cards = {}
+    total_count = page_size = None
+    for payload in payloads:
+        for result_set in iter_result_sets(payload):
+            set_page = lookup(result_set, "Page")
+            if set_page is not None and (as_int(set_page) is None or page_num is not None and as_int(set_page) != page_num):
+                continue
+            total_count = as_int(lookup(result_set, "TotalCount")) if total_count is None else total_count
+            page_size = as_int(lookup(result_set, "PageSize")) if page_size is None else page_size
+            for item in lookup(result_set, "List"):
+                if isinstance(item, dict) and lookup(item, "ListingId"):
+                    card = card_from_item(item)
+                    cards.setdefault(card["listing_id"], card)
+    return {"cards": list(cards.values()), "total_count": total_count, "page_size": page_size}
+
+def has_next_page(results: dict, page_num: int) -> bool:
+    """More pages after page_num: from the total count when known, else while pages are non-empty."""
+    if results["total_count"] is not None and results["page_size"]:
+        return page_num * results["page_size"] < results["total_count"]
+    return bool(results["cards"])
@@ -0,0 +1,202 @@
+"""
+Reusable browser identities for listing contexts (--session-dir).
+
+A fresh context starts with no cookies or local storage, so every listing
+repeats Trade Me's first-visit bootstrap: consent handling, redirects, and the
+requests that set up an anonymous session. The session manager warms a small
+set of identities once. An identity is a user agent, a header set and a
+Playwright `storage_state` file. Listing contexts are then created from them.
+
+    <session dir>/identities.json     name, user agent, headers, age and use counters
+    <session dir>/<name>.json         storage_state (cookies + local storage)
+
+Identities persist across runs. One is refreshed (bootstrapped again) when:
+
+    it is older than max_age_s or has been used max_uses times
+    its stored cookies have all expired
+    max_blocks listings in a row were blocked with it; it then also gets a new user agent
+
+Like the watchdog, this module does not import Playwright. The scraper passes
+an async `bootstrap(identity)` that loads a page and saves the state file.
+"""
+import json
+import os
+import random
+import time
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_AGE_S = 6 * 3600
+DEFAULT_MAX_USES = 300
+DEFAULT_MAX_BLOCKS = 2
+DEFAULT_COLD_SAMPLE = 0.05 # Share of listings scraped in cold contexts, as the baseline for the comparison
+INDEX_FILE = "identities.json"
+
+class SessionIdentity:
+    """One reusable identity: user agent, headers and the path of its storage_state file."""
+
+    def __init__(self, name: str, user_agent: str, headers: dict, state_path: str, created_at: float = 0.0,
+                 uses: int = 0, consecutive_blocks: int = 0):
+        self.name = name
+        self.user_agent = user_agent
+        self.headers = headers
+        self.state_path = state_path
+        self.created_at = created_at # When the storage state was last bootstrapped (0 = never)
+        self.uses = uses # Contexts created since then
+        self.consecutive_blocks = consecutive_blocks
+        self.refreshing = False
+
+    def to_json(self) -> dict:
+        return {"name": self.name, "user_agent": self.user_agent, "headers": self.headers,
+                "created_at": self.created_at, "uses": self.uses, "consecutive_blocks": self.consecutive_blocks}
+
+def state_expired(state_path: str, now: float = None) -> bool:
+    """True when the storage_state file is missing, unreadable, or every cookie with an expiry has expired."""
+    now = time.time() if now is None else now
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            cookies = json.load(f).get("cookies", [])
+    except (OSError, ValueError):
+        return True
+    expiring = [cookie.get("expires", -1) for cookie in cookies if cookie.get("expires", -1) > 0]
+    return bool(expiring) and max(expiring) < now
+
+def navigation_summary(samples) -> dict:
+    """Mean / p50 / p95 navigation seconds and mean requests from (seconds, requests) samples."""
+    if not samples:
+        return {"listings": 0}
+    seconds = sorted(s for s, _ in samples)
+    return {
+        "listings": len(samples),
+        "nav_mean_ms": round(1000 * sum(seconds) / len(seconds)),
+        "nav_p50_ms": round(1000 * seconds[len(seconds) // 2]),
+        "nav_p95_ms": round(1000 * seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))]),
+        "requests_mean": round(sum(r for _, r in samples) / len(samples), 1),
+    }
+
+class SessionManager:
+    """Warm identities shared by listing contexts, with rotation on expiry and block signals."""
+
+    def __init__(self, directory: str, user_agents, headers_list, size: int = DEFAULT_POOL_SIZE,
+                 max_age_s: float = DEFAULT_MAX_AGE_S, max_uses: int = DEFAULT_MAX_USES,
+                 max_blocks: int = DEFAULT_MAX_BLOCKS, cold_sample: float = DEFAULT_COLD_SAMPLE):
+        self.directory = directory
+        self.user_agents = list(user_agents)
+        self.headers_list = list(headers_list)
+        self.size = size
+        self.max_age_s = max_age_s
+        self.max_uses = max_uses
+        self.max_blocks = max_blocks
+        self.cold_sample = cold_sample
+        self.identities = []
+        self.refreshes = {"bootstrap": 0, "expired": 0, "blocked": 0, "failed": 0}
+        self._next = 0
+
+    # --- Persistence ---
+    def load(self):
+        """Reads the identity index, creating identities up to `size` (without state until warmed)."""
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        entries = []
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"\n⚠️ Could not read {index_path} ({e}); starting with new identities.")
+        for entry in entries[:self.size]:
+            self.identities.append(SessionIdentity(state_path=os.path.join(self.directory, f"{entry['name']}.json"), **entry))
+        while len(self.identities) < self.size:
+            name = f"identity{len(self.identities) + 1}"
+            self.identities.append(SessionIdentity(name, random.choice(self.user_agents), self._new_headers(),
+                                                   os.path.join(self.directory, f"{name}.json")))
+        return self
+
+    def save(self):
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump([identity.to_json() for identity in self.identities], f, indent=2)
+        os.replace(index_path + ".tmp", index_path)
+
+    def _new_headers(self) -> dict:
+        return random.choice(self.headers_list).copy() if self.headers_list else {}
+    # --- End persistence ---
+
+    # --- Warming and refresh ---
+    def refresh_reason(self, identity: SessionIdentity, now: float = None):
+        """Why an identity needs bootstrapping before use, or None."""
+        now = time.time() if now is None else now
+        if not identity.created_at or not os.path.exists(identity.state_path):
+            return "bootstrap"
+        if identity.consecutive_blocks >= self.max_blocks:
+            return "blocked"
+        if now - identity.created_at > self.max_age_s or identity.uses >= self.max_uses or state_expired(identity.state_path, now):
+            return "expired"
+        return None
+
+    async def refresh(self, identity: SessionIdentity, bootstrap, reason: str):
+        """Bootstraps one identity again via `await bootstrap(identity)`; a blocked one gets a new user agent first.
+
+        Returns True when the identity was refreshed.
+        """
+        if identity.refreshing:
+            return False
+        identity.refreshing = True
+        try:
+            if reason == "blocked":
+                identity.user_agent = random.choice(self.user_agents)
+                identity.headers = self._new_headers()
+            await bootstrap(identity)
+            identity.created_at = time.time()
+            identity.uses = 0
+            identity.consecutive_blocks = 0
+            self.refreshes[reason] += 1
+            return True
+        except Exception as e:
+            self.refreshes["failed"] += 1
+            print(f"\n⚠️ Refreshing session {identity.name} ({reason}) failed: {e}")
+            return False
+        finally:
+            identity.refreshing = False
+            self.save()
+
+    async def warm(self, bootstrap):
+        """Bootstraps every identity that has no usable state. Returns how many were warmed."""
+        stale = [(identity, self.refresh_reason(identity)) for identity in self.identities]
+        stale = [(identity, reason) for identity, reason in stale if reason is not None]
+        for identity, reason in stale:
+            await self.refresh(identity, bootstrap, reason)
+        self.save()
+        return len(stale)
+    # --- End warming and refresh ---
+
+    # --- Use ---
+    def pick(self):
+        """Next ready identity (round robin), or None if every identity is being refreshed or unusable."""
+        for _ in range(len(self.identities)):
+            identity = self.identities[self._next % len(self.identities)]
+            self._next += 1
+            if not identity.refreshing and identity.created_at and os.path.exists(identity.state_path):
+                identity.uses += 1
+                return identity
+        return None
+
+    def use_cold(self) -> bool:
+        """Whether this listing should get a cold context for the warm/cold comparison."""
+        return self.cold_sample > 0 and random.random() < self.cold_sample
+
+    def report(self, identity: SessionIdentity, blocked: bool):
+        """Records a listing outcome. Returns a refresh reason when the identity should be bootstrapped again."""
+        identity.consecutive_blocks = identity.consecutive_blocks + 1 if blocked else 0
+        return None if identity.refreshing else self.refresh_reason(identity)
+    # --- End use ---
+
+    def snapshot(self) -> dict:
+        return {
+            "identities": [{key: value for key, value in identity.to_json().items() if key != "headers"} for identity in self.identities],
+            "refreshes": dict(self.refreshes),
+        }
+
+    def summary(self) -> str:
+        ready = sum(1 for identity in self.identities if identity.created_at)
+        return (f"{ready}/{len(self.identities)} identities ready, refreshes: "
+                + ", ".join(f"{reason} {count}" for reason, count in self.refreshes.items()))
@@ -0,0 +1,165 @@
+"""
+Live progress for long runs: a local JSON status endpoint and a terminal status line.
+
+The scraper's hot path only bumps counters and appends a timestamp in
+`ProgressTracker.record()`. Rates, ETAs and formatting are computed when a
+snapshot is read: on each status-line tick or on each GET request.
+
+    GET /status    processed/total per listing type, rolling listings/sec, ETA,
+                   in-flight pages, retries, failures and the concurrency limit
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+
+from trademe_daemon import read_http_request, write_json_response
+
+RATE_WINDOW = 60.0 # Seconds of completions used for the rolling rate
+MAX_RATE_SAMPLES = 10000 # Completion timestamps kept per listing type
+MIN_RATE_ELAPSED = 1.0 # Shortest span a rate is computed over, so the first completions don't read as a burst
+STATUS_INTERVAL = 2.0 # Seconds between terminal status-line refreshes
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+class ProgressTracker:
+    """Per-listing-type counters plus a rolling completion rate."""
+
+    def __init__(self, rate_window: float = RATE_WINDOW):
+        self.rate_window = rate_window
+        self.started_at = time.monotonic()
+        self.types = {} # listing_type -> counters
+
+    def _counters(self, listing_type: str) -> dict:
+        counters = self.types.get(listing_type)
+        if counters is None:
+            counters = self.types[listing_type] = {
+                "total": 0, "processed": 0, "failed": 0, "retries": 0,
+                "completions": deque(maxlen=MAX_RATE_SAMPLES),
+            }
+        return counters
+
+    # --- Hot path ---
+    def add_total(self, listing_type: str, count: int):
+        self._counters(listing_type)["total"] += count
+
+    def record(self, listing_type: str, ok: bool):
+        counters = self._counters(listing_type)
+        counters["processed"] += 1
+        if not ok:
+            counters["failed"] += 1
+        counters["completions"].append(time.monotonic())
+
+    def record_retry(self, listing_type: str):
+        self._counters(listing_type)["retries"] += 1
+    # --- End hot path ---
+
+    def _rate(self, completions, now: float) -> float:
+        """Listings/sec over the last rate_window seconds, or since the oldest kept completion if that is sooner.
+
+        Time before the first completion (startup, search page collection) is not counted.
+        """
+        cutoff = now - self.rate_window
+        recent = sum(1 for _ in itertools.takewhile(lambda t: t >= cutoff, reversed(completions)))
+        if not recent:
+            return 0.0
+        if recent < len(completions): # Older completions exist, so the whole window was spent completing
+            elapsed = self.rate_window
+        else:
+            elapsed = max(MIN_RATE_ELAPSED, min(self.rate_window, now - completions[0]))
+        return recent / elapsed
+
+    def snapshot(self, **extra) -> dict:
+        """Counters, rates and ETAs per listing type and overall; `extra` fields are added at the top level."""
+        now = time.monotonic()
+        per_type = {}
+        for listing_type, counters in self.types.items():
+            rate = self._rate(counters["completions"], now)
+            remaining = max(0, counters["total"] - counters["processed"])
+            per_type[listing_type] = {
+                "processed": counters["processed"],
+                "total": counters["total"],
+                "failed": counters["failed"],
+                "retries": counters["retries"],
+                "rate_per_s": round(rate, 3),
+                "eta_s": round(remaining / rate) if rate and remaining else (0 if not remaining else None),
+            }
+        rate = sum(item["rate_per_s"] for item in per_type.values())
+        remaining = sum(max(0, item["total"] - item["processed"]) for item in per_type.values())
+        return {
+            "elapsed_s": round(now - self.started_at, 1),
+            "processed": sum(item["processed"] for item in per_type.values()),
+            "total": sum(item["total"] for item in per_type.values()),
+            "failed": sum(item["failed"] for item in per_type.values()),
+            "retries": sum(item["retries"] for item in per_type.values()),
+            "rate_per_s": round(rate, 3),
+            "eta_s": round(remaining / rate) if rate and remaining else (0 if not remaining else None),
+            "per_type": per_type,
+            **extra,
+        }
+
+def status_line(snapshot: dict) -> str:
+    """One compact terminal line, e.g. 'rental 120/400 sale 80/300 | 1.9/s ETA 4m12s | 8/10 pages | 3 retries 1 failed'."""
+    types = " ".join(f"{listing_type} {item['processed']}/{item['total']}" for listing_type, item in snapshot["per_type"].items())
+    return (f"{types or 'waiting'} | {snapshot['rate_per_s']:.2f}/s ETA {format_duration(snapshot['eta_s'])} | "
+            f"{snapshot.get('in_flight', 0)}/{snapshot.get('max_concurrent', '?')} pages | "
+            f"{snapshot['retries']} retries {snapshot['failed']} failed")
+
+class StatusReporter:
+    """Refreshes the terminal status line and (optionally) serves GET /status on the loopback interface."""
+
+    def __init__(self, snapshot, interval: float = STATUS_INTERVAL, host: str = "127.0.0.1", port: int = None):
+        self.snapshot = snapshot # Callable returning the current status dict
+        self.interval = interval # 0 disables the terminal line
+        self.host = host
+        self.port = port # None disables the HTTP endpoint
+        self._tasks = []
+        self._server = None
+
+    async def _print_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            print(f"\r📊 {status_line(self.snapshot())}\033[K", end="", flush=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, _ = await read_http_request(reader)
+            if method == "GET" and path in ("/", "/status"):
+                await write_json_response(writer, "200 OK", self.snapshot())
+            else:
+                await write_json_response(writer, "404 Not Found", {"error": f"no route for {method} {path}"})
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await write_json_response(writer, "400 Bad Request", {"error": str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def start(self):
+        if self.interval:
+            self._tasks.append(asyncio.create_task(self._print_loop()))
+        if self.port is not None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            print(f"\n📡 Status endpoint on http://{self.host}:{self.port}/status")
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.interval:
+            print(f"\r📊 {status_line(self.snapshot())}\033[K") # Final line, ending the \r updates
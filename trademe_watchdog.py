@@ -0,0 +1,198 @@
+"""
+Resource watchdog for long runs on one Chromium browser.
+
+A multi-hour crawl creates and closes thousands of contexts on the same
+browser. Renderer memory creeps up, and once the browser crashes every later
+`new_context` fails. The watchdog samples RSS and CPU of this Python process
+and of the Chromium processes below it. It asks the scraper to recycle the
+browser (drain in-flight pages, relaunch) when one of these limits is hit:
+
+    browser RSS        total resident memory of the Chromium process tree
+    contexts           contexts/pages created since the browser was launched
+    crashes            page crashes or failed new_context calls since launch
+
+Samples are kept as a timeline for the run report. Process sampling reads
+/proc, so on other platforms only the context and crash limits apply.
+
+The scraper is supplied as two callables, so this module knows nothing about
+Playwright:
+
+    counters()              -> {"contexts": int, "crashes": int, "in_flight": int}
+    await recycle(reason)   drains and relaunches the browser
+"""
+import asyncio
+import os
+import time
+
+SAMPLE_INTERVAL = 15.0 # Seconds between samples
+DEFAULT_MAX_BROWSER_RSS_MB = 2048
+DEFAULT_MAX_CONTEXTS = 1500
+DEFAULT_MAX_CRASHES = 3
+TIMELINE_LIMIT = 2000 # Samples kept; older ones are thinned out
+CHROMIUM_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+PROC_DIR = "/proc"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# --- Process sampling ---
+def read_process_stat(pid: int):
+    """Returns (ppid, name, cpu seconds, rss bytes) for a process from /proc, or None if it is gone."""
+    try:
+        with open(f"{PROC_DIR}/{pid}/stat", "r", encoding="latin-1") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The name is in parentheses and may contain spaces, so split on the last ')'
+    name = stat[stat.index("(") + 1:stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2:].split()
+    ppid = int(fields[1])
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS # utime + stime
+    rss_bytes = int(fields[21]) * PAGE_SIZE
+    return ppid, name, cpu_seconds, rss_bytes
+
+def sample_process_tree(root_pid: int):
+    """Sums CPU seconds and RSS for root_pid and for the Chromium processes among its descendants.
+
+    Returns None when /proc is not available.
+    """
+    if not os.path.isdir(PROC_DIR):
+        return None
+    stats = {}
+    for entry in os.listdir(PROC_DIR):
+        if entry.isdigit():
+            stat = read_process_stat(int(entry))
+            if stat is not None:
+                stats[int(entry)] = stat
+    children = {}
+    for pid, (ppid, _, _, _) in stats.items():
+        children.setdefault(ppid, []).append(pid)
+
+    sample = {"python_rss": 0, "python_cpu_s": 0.0, "browser_rss": 0, "browser_cpu_s": 0.0, "browser_processes": 0}
+    if root_pid in stats:
+        sample["python_rss"] = stats[root_pid][3]
+        sample["python_cpu_s"] = stats[root_pid][2]
+    pending = list(children.get(root_pid, ()))
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, ()))
+        _, name, cpu_seconds, rss_bytes = stats[pid]
+        if any(browser_name in name.lower() for browser_name in CHROMIUM_PROCESS_NAMES):
+            sample["browser_rss"] += rss_bytes
+            sample["browser_cpu_s"] += cpu_seconds
+            sample["browser_processes"] += 1
+    return sample
+# --- End process sampling ---
+
+class BrowserWatchdog:
+    """Samples resource use on an interval and recycles the browser when a limit is exceeded."""
+
+    def __init__(self, counters, recycle, max_browser_rss_mb: float = DEFAULT_MAX_BROWSER_RSS_MB,
+                 max_contexts: int = DEFAULT_MAX_CONTEXTS, max_crashes: int = DEFAULT_MAX_CRASHES,
+                 interval: float = SAMPLE_INTERVAL, root_pid: int = None):
+        self.counters = counters
+        self.recycle = recycle
+        self.max_browser_rss = max_browser_rss_mb * 1048576 if max_browser_rss_mb else 0 # 0 disables a limit
+        self.max_contexts = max_contexts
+        self.max_crashes = max_crashes
+        self.interval = interval
+        self.root_pid = root_pid or os.getpid()
+        self.timeline = []
+        self.recycles = [] # {"at_s", "reason"} per browser restart
+        self.started_at = time.monotonic()
+        self._last = None # (monotonic time, sample) for CPU percentages
+        self._task = None
+
+    def sample(self) -> dict:
+        """Takes one resource sample and appends it to the timeline."""
+        now = time.monotonic()
+        counters = self.counters()
+        entry = {
+            "t_s": round(now - self.started_at, 1),
+            "contexts": counters["contexts"],
+            "crashes": counters["crashes"],
+            "in_flight": counters["in_flight"],
+        }
+        processes = sample_process_tree(self.root_pid)
+        if processes is not None:
+            entry["python_rss_mb"] = round(processes["python_rss"] / 1048576, 1)
+            entry["browser_rss_mb"] = round(processes["browser_rss"] / 1048576, 1)
+            entry["browser_processes"] = processes["browser_processes"]
+            if self._last is not None:
+                last_time, last = self._last
+                elapsed = now - last_time
+                # A relaunched browser restarts its CPU counters, so clamp at 0
+                entry["python_cpu_pct"] = round(100 * max(0.0, processes["python_cpu_s"] - last["python_cpu_s"]) / elapsed, 1)
+                entry["browser_cpu_pct"] = round(100 * max(0.0, processes["browser_cpu_s"] - last["browser_cpu_s"]) / elapsed, 1)
+            self._last = (now, processes)
+        self.timeline.append(entry)
+        if len(self.timeline) > TIMELINE_LIMIT:
+            # Keep the first sample and every other older one so a long run still fits
+            self.timeline = self.timeline[:1] + self.timeline[1:-TIMELINE_LIMIT // 2:2] + self.timeline[-TIMELINE_LIMIT // 2:]
+        return entry
+
+    def recycle_reason(self, entry: dict):
+        """Returns why the browser should be recycled after this sample, or None."""
+        if self.max_browser_rss and entry.get("browser_rss_mb", 0) * 1048576 > self.max_browser_rss:
+            return f"browser RSS {entry['browser_rss_mb']:.0f} MiB > {self.max_browser_rss / 1048576:.0f} MiB"
+        if self.max_contexts and entry["contexts"] >= self.max_contexts:
+            return f"{entry['contexts']} contexts since launch"
+        if self.max_crashes and entry["crashes"] >= self.max_crashes:
+            return f"{entry['crashes']} crashes since launch"
+        return None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                entry = self.sample()
+            except Exception as e:
+                print(f"\n⚠️ Watchdog sample failed: {e}")
+                continue
+            reason = self.recycle_reason(entry)
+            if reason is None:
+                continue
+            started = time.monotonic()
+            try:
+                await self.recycle(reason)
+            except Exception as e:
+                print(f"\n⚠️ Browser recycle failed ({reason}): {e}")
+            self.recycles.append({"at_s": entry["t_s"], "reason": reason, "took_s": round(time.monotonic() - started, 1)})
+            self._last = None # CPU counters restart with the new browser
+
+    def start(self):
+        self.sample() # Baseline
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.sample() # Final reading
+
+    def report(self) -> dict:
+        """Resource timeline and recycle history for the run report."""
+        rss = [entry["browser_rss_mb"] for entry in self.timeline if "browser_rss_mb" in entry]
+        python_rss = [entry["python_rss_mb"] for entry in self.timeline if "python_rss_mb" in entry]
+        return {
+            "interval_s": self.interval,
+            "limits": {
+                "max_browser_rss_mb": round(self.max_browser_rss / 1048576) if self.max_browser_rss else None,
+                "max_contexts": self.max_contexts or None,
+                "max_crashes": self.max_crashes or None,
+            },
+            "peak_browser_rss_mb": max(rss) if rss else None,
+            "peak_python_rss_mb": max(python_rss) if python_rss else None,
+            "recycles": self.recycles,
+            "timeline": self.timeline,
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        return (f"{len(self.recycles)} browser recycles, peak browser RSS {report['peak_browser_rss_mb']} MiB, "
+                f"peak Python RSS {report['peak_python_rss_mb']} MiB, {len(self.timeline)} samples")
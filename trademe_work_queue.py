@@ -0,0 +1,211 @@
+"""
+Lease-based shared work queue for distributed crawls.
+
+The URL frontier lives in a SQLite file that every node can open (local disk
+for several processes on one host, or shared storage for several hosts).
+Workers claim batches under a time-limited lease, extend it with heartbeats
+while scraping, and report each URL as completed or failed. Leases that are
+not renewed expire and their URLs go back to the queue. Records are committed
+exactly once per listing_id, so a URL scraped twice after a lease expiry
+still produces a single result row.
+
+All methods are synchronous and open a short-lived connection, so they are
+safe to call from several threads (e.g. via asyncio.to_thread).
+"""
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    listing_id TEXT NOT NULL,
+    listing_type TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending', -- pending, leased, done, failed
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    enqueued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frontier_claim ON frontier (state, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    listing_id TEXT PRIMARY KEY,
+    listing_type TEXT NOT NULL,
+    url TEXT NOT NULL,
+    record TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    committed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    last_heartbeat REAL NOT NULL,
+    claimed INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def listing_id_for(url: str) -> str:
+    """The exactly-once key for a listing URL (its numeric listing id, or the URL itself)."""
+    match = re.search(r"/listing/(\d+)", url)
+    return match.group(1) if match else url
+
+class SQLiteWorkQueue:
+    """URL frontier with work leases, heartbeats and exactly-once result commits."""
+
+    def __init__(self, path: str, wal: bool = False, busy_timeout: float = 30.0):
+        # WAL is faster but needs shared memory, so leave it off when the file is on network storage
+        self.path = path
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+        with self._connect() as conn:
+            if wal:
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """An IMMEDIATE transaction, so concurrent claimers serialize instead of deadlocking."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # --- Coordinator side ---
+    def enqueue(self, urls, listing_type: str) -> int:
+        """Adds URLs to the frontier (already known URLs are ignored). Returns how many were new."""
+        now = time.time()
+        rows = [(url, listing_id_for(url), listing_type, now) for url in urls]
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url, listing_id, listing_type, enqueued_at) VALUES (?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def stats(self) -> dict:
+        """Counts per frontier state (expired leases counted as pending), results and live workers."""
+        now = time.time()
+        with self._connect() as conn:
+            counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+            for row in conn.execute(
+                    "SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'pending' ELSE state END AS s, COUNT(*) "
+                    "FROM frontier GROUP BY s", (now,)):
+                counts[row[0]] = row[1]
+            counts["results"] = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            counts["workers"] = [dict(row) for row in conn.execute("SELECT * FROM workers ORDER BY worker_id")]
+        return counts
+
+    def is_drained(self) -> bool:
+        stats = self.stats()
+        return stats["pending"] == 0 and stats["leased"] == 0
+
+    def export_results(self, listing_type: str = None):
+        """Returns the committed records, optionally for one listing type."""
+        query, params = "SELECT record FROM results", ()
+        if listing_type:
+            query, params = query + " WHERE listing_type = ?", (listing_type,)
+        with self._connect() as conn:
+            return [json.loads(row[0]) for row in conn.execute(query + " ORDER BY committed_at", params)]
+
+    def failed_urls(self, listing_type: str = None):
+        query, params = "SELECT url FROM frontier WHERE state = 'failed'", ()
+        if listing_type:
+            query, params = query + " AND listing_type = ?", (listing_type,)
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(query, params)]
+    # --- End coordinator side ---
+
+    # --- Worker side ---
+    def claim(self, worker_id: str, batch_size: int, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """Leases up to batch_size pending (or expired) URLs to worker_id. Returns [(url, listing_type)].
+
+        Every claim counts an attempt. An expired lease that has already used max_attempts is marked
+        failed instead of reclaimed, so a URL whose workers keep crashing cannot cycle forever.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE frontier SET state = 'failed', lease_owner = NULL, lease_expires = NULL, "
+                "last_error = 'lease expired after ' || attempts || ' attempts' "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?", (now, max_attempts))
+            rows = conn.execute(
+                "SELECT url, listing_type FROM frontier "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY enqueued_at LIMIT ?", (now, batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE frontier SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE url = ?",
+                [(worker_id, now + lease_seconds, row["url"]) for row in rows])
+            self._touch_worker(conn, worker_id, now, claimed=len(rows))
+        return [(row["url"], row["listing_type"]) for row in rows]
+
+    def heartbeat(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> int:
+        """Extends every lease held by worker_id. Returns how many leases were extended."""
+        now = time.time()
+        with self._transaction() as conn:
+            extended = conn.execute(
+                "UPDATE frontier SET lease_expires = ? WHERE state = 'leased' AND lease_owner = ?",
+                (now + lease_seconds, worker_id)).rowcount
+            self._touch_worker(conn, worker_id, now)
+        return extended
+
+    def complete(self, worker_id: str, url: str, listing_type: str, record: dict) -> bool:
+        """Commits a record and marks its URL done. Returns False if the listing was already committed."""
+        now = time.time()
+        listing_id = str(record.get("listing_id") or listing_id_for(url))
+        with self._transaction() as conn:
+            committed = conn.execute(
+                "INSERT OR IGNORE INTO results (listing_id, listing_type, url, record, worker_id, committed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (listing_id, listing_type, url, json.dumps(record, default=str), worker_id, now)).rowcount == 1
+            conn.execute(
+                "UPDATE frontier SET state = 'done', lease_owner = NULL, lease_expires = NULL, last_error = NULL WHERE url = ?",
+                (url,))
+            self._touch_worker(conn, worker_id, now, completed=1)
+        return committed
+
+    def fail(self, worker_id: str, url: str, error: str = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        """Returns a URL to the queue, or marks it failed once it has used max_attempts leases."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE frontier SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = ? "
+                "WHERE url = ? AND state = 'leased' AND lease_owner = ?",
+                (max_attempts, error, url, worker_id))
+            self._touch_worker(conn, worker_id, now, failed=1)
+
+    def release(self, worker_id: str) -> int:
+        """Gives back every lease held by worker_id (e.g. on shutdown) without counting an attempt."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE frontier SET state = 'pending', lease_owner = NULL, lease_expires = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE state = 'leased' AND lease_owner = ?", (worker_id,)).rowcount
+
+    @staticmethod
+    def _touch_worker(conn, worker_id, now, claimed=0, completed=0, failed=0):
+        conn.execute(
+            "INSERT INTO workers (worker_id, last_heartbeat, claimed, completed, failed) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET last_heartbeat = excluded.last_heartbeat, "
+            "claimed = claimed + excluded.claimed, completed = completed + excluded.completed, failed = failed + excluded.failed",
+            (worker_id, now, claimed, completed, failed))
+    # --- End worker side ---